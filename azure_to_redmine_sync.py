@@ -1,17 +1,31 @@
 import base64
 import datetime
+import functools
+import hashlib
 import json
+import queue
+import atexit
 import os
 import re
 import signal
+import sqlite3
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
 import pytz
 from urllib.request import HTTPBasicAuthHandler
 from unidecode import unidecode
 import requests
+from requests.adapters import HTTPAdapter
 from redminelib import Redmine
+from redminelib.engines.sync import SyncEngine
 import math
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 import sys
 from dotenv import load_dotenv
 import argparse
@@ -23,15 +37,58 @@ from email.mime.application import MIMEApplication
 
 zona_horaria_local = pytz.timezone('Europe/Madrid')
 
+# Antes de los argumentos, porque algunos toman su valor por defecto de las variables de entorno
+load_dotenv()
+
+MODOS_CONSOLA = ['silencioso', 'progreso', 'detallado']
+
 # Configurar el analizador de argumentos
 parser = argparse.ArgumentParser(description='Sincroniza tareas entre Azure y Redmine.')
-parser.add_argument('sprint_number', type=int, help='Número del sprint que se desea sincronizar')
+parser.add_argument('sprint_number', type=int, nargs='*', help='Número o números de los sprints que se desean sincronizar')
+parser.add_argument('--objetivo', action='append', default=[], metavar='AREA|ITERACION|VERSION', help='Sincroniza un área e iteración de Azure con una versión de Redmine (se puede repetir)')
+parser.add_argument('--incremental', action='store_true', help='Obtiene de Azure solo las revisiones posteriores a la última ejecución correcta (feed de revisiones con continuation token)')
+parser.add_argument('--daemon', action='store_true', help='Mantiene el proceso activo y sincroniza periódicamente')
+parser.add_argument('--intervalo', type=int, default=None, help='Segundos entre ciclos de sincronización en modo daemon (0 desactiva el polling con --webhook)')
+parser.add_argument('--webhook', action='store_true', help='Recibe los service hooks workitem.created/workitem.updated de Azure DevOps (implica --daemon)')
+parser.add_argument('--webhook-puerto', type=int, default=os.getenv('WEBHOOK_PUERTO', '8085'), help='Puerto del receptor de service hooks')
+parser.add_argument('--forzar', action='store_true', help='Ignora el estado guardado y revisa todas las tareas en Redmine')
+parser.add_argument('--consola', choices=MODOS_CONSOLA, default=os.getenv('LOG_CONSOLA', 'detallado'), help='Mensajes por consola: solo errores, avance por fases o detalle de cada tarea')
+parser.add_argument('--streaming', action='store_true', help='Obtiene, planifica y aplica las tareas por lotes a medida que llegan de Azure DevOps')
+parser.add_argument('--plan-only', action='store_true', help='Calcula el plan de cambios y lo guarda en SYNC_PLAN_FILE sin escribir en Redmine')
+parser.add_argument('--inversa', action='store_true', help='Envía a Azure DevOps los cambios de estado hechos en Redmine desde la última ejecución')
+parser.add_argument('--imputaciones', action='store_true', help='Imputa en Redmine las horas completadas en Azure DevOps (Completed Work) de las tareas sincronizadas')
 
 # Leer los argumentos de la línea de comandos
 args = parser.parse_args()
-sprint_number = args.sprint_number
+if not args.sprint_number and not args.objetivo:
+    parser.error('Indica al menos un número de sprint o un --objetivo')
+if args.plan_only and (args.daemon or args.webhook):
+    parser.error('--plan-only no se puede combinar con --daemon ni con --webhook')
+if args.streaming and args.incremental:
+    parser.error('--streaming no se puede combinar con --incremental')
+# argparse no comprueba 'choices' en el valor por defecto, que viene de LOG_CONSOLA
+if args.consola not in MODOS_CONSOLA:
+    parser.error(f"LOG_CONSOLA debe ser {', '.join(MODOS_CONSOLA)} (valor actual: '{args.consola}')")
+sprint_numbers = args.sprint_number
+objetivos_cli = args.objetivo
+forzar_sincronizacion = args.forzar
+modo_incremental = args.incremental
+modo_plan = args.plan_only
+modo_streaming = args.streaming
+modo_imputaciones = args.imputaciones
+modo_inverso = args.inversa
+modo_consola = args.consola
+modo_webhook = args.webhook
+modo_daemon = args.daemon or modo_webhook
+# Con los service hooks el polling queda como red de seguridad de baja frecuencia
+if args.intervalo is not None:
+    intervalo_daemon = args.intervalo
+elif modo_webhook:
+    intervalo_daemon = int(os.getenv('WEBHOOK_INTERVALO_POLLING', 900))
+else:
+    intervalo_daemon = int(os.getenv('DAEMON_INTERVALO', 60))
+webhook_puerto = args.webhook_puerto
 
-load_dotenv()
 wkhtmltopdf_path = os.getenv('WKHTMLTOPDF_PATH')
 # Constants Azure
 AZURE_DEVOPS_PROJECT_BASE = os.getenv('AZURE_DEVOPS_PROJECT_BASE')
@@ -40,6 +97,22 @@ AZURE_DEVOPS_URL = f"{os.getenv('AZURE_DEVOPS_PROJECT_BASE')}{os.getenv('AZURE_T
 AZURE_TOKEN = os.getenv('AZURE_TOKEN')
 AREA_PATH = os.getenv('AREA_PATH')
 ITERATION_PATH = os.getenv('ITERATION_PATH')
+AZURE_MAX_WORKERS = int(os.getenv('AZURE_MAX_WORKERS', 4)) # Peticiones simultáneas a Azure DevOps
+AZURE_MAX_REINTENTOS = int(os.getenv('AZURE_MAX_REINTENTOS', 5))
+TAMANO_LOTE_AZURE = min(int(os.getenv('AZURE_TAMANO_LOTE', 200)), 200) # workitemsbatch admite como máximo 200 IDs
+CAMPOS_WORK_ITEM_SINCRONIZACION = [
+    'System.Id',
+    'System.WorkItemType',
+    'System.Parent',
+    'System.State',
+    'System.Title',
+    'System.AssignedTo',
+    'Microsoft.VSTS.Scheduling.OriginalEstimate',
+    'Microsoft.VSTS.Scheduling.RemainingWork',
+    'Microsoft.VSTS.Scheduling.CompletedWork'
+]
+TIPOS_WORK_ITEM_SINCRONIZADOS = ['Bug', 'Task', 'User Story']
+TAMANO_LOTE_BATCH_AZURE = 200 # Peticiones por llamada a _apis/wit/$batch
 
 # Constants Redmine
 REDMINE_URL = os.getenv('REDMINE_URL')
@@ -47,15 +120,81 @@ REDMINE_TOKEN = os.getenv('REDMINE_TOKEN')
 PROJECT_ID = os.getenv('PROJECT_ID')
 ID_CAMPO_HORAS_RESTANTES = os.getenv('ID_CAMPO_HORAS_RESTANTES')
 ID_CAMPO_IBER_IDCLIENTE = os.getenv('ID_CAMPO_IBER_IDCLIENTE')
+REDMINE_MAX_WORKERS = int(os.getenv('REDMINE_MAX_WORKERS', 4)) # Peticiones simultáneas a Redmine
+REDMINE_MAX_ESCRITURAS = int(os.getenv('REDMINE_MAX_ESCRITURAS', REDMINE_MAX_WORKERS)) # Creaciones/actualizaciones simultáneas en Redmine
+STREAMING_TAMANO_COLA = int(os.getenv('STREAMING_TAMANO_COLA', 4)) # Lotes de Azure en espera de planificarse con --streaming
+ID_CAMPO_VERSION_SOLICITADA = 34
+TAMANO_MAXIMO_DESCRIPCION = 65000 # Caracteres de la descripción que se envían a Redmine
+INDICE_ISSUES_RECONSTRUCCION = int(os.getenv('INDICE_ISSUES_RECONSTRUCCION', 7 * 24 * 3600)) # Segundos entre reconstrucciones completas del índice de issues
+MARGEN_INDICE_ISSUES = 300 # Segundos que se solapan las actualizaciones del índice, por la diferencia de reloj con Redmine
+TAMANO_FILTRO_IDS_REDMINE = 50 # IDs de Azure por consulta filtrada, para no superar la longitud máxima de URL
+IMPUTACIONES_API_KEYS_FILE = os.getenv('IMPUTACIONES_API_KEYS_FILE', 'redmine_api_keys.json') # uniqueName de Azure -> API key de Redmine
+ID_ACTIVIDAD_IMPUTACION = os.getenv('ID_ACTIVIDAD_IMPUTACION') # Actividad de las entradas de tiempo; si no se indica, la actividad por defecto de Redmine
+PATRON_COMENTARIO_IMPUTACION = re.compile(r'\(tarea (\d+), revisión (\d+)\)') # Clave de la imputación en el comentario de la entrada de tiempo
+
+# Constants cliente HTTP
+HTTP_TIMEOUT_CONEXION = float(os.getenv('HTTP_TIMEOUT_CONEXION', 5)) # Segundos
+HTTP_TIMEOUT_LECTURA = float(os.getenv('HTTP_TIMEOUT_LECTURA', 60)) # Segundos
+HTTP_MAX_REINTENTOS = int(os.getenv('HTTP_MAX_REINTENTOS', 3))
+HTTP_TAMANO_POOL = int(os.getenv('HTTP_TAMANO_POOL', 10)) # Conexiones keep-alive por host
+METODOS_IDEMPOTENTES = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+# Estado persistente de la sincronización (junto a last_run.txt)
+SYNC_STATE_FILE = os.getenv('SYNC_STATE_FILE', 'sync_state.db')
+CONTINUATION_TOKEN_FILE = os.getenv('AZURE_CONTINUATION_TOKEN_FILE', 'continuation_token.txt')
+SYNC_PLAN_FILE = os.getenv('SYNC_PLAN_FILE', 'sync_plan.json')
+PROMETHEUS_TEXTFILE = os.getenv('PROMETHEUS_TEXTFILE') # Archivo .prom para el textfile collector de node_exporter (opcional)
+
+# Historial de ejecuciones y feeds de docs/index.html
+HISTORIAL_EJECUCIONES_FILE = os.getenv('HISTORIAL_EJECUCIONES_FILE', 'docs/historial.jsonl') # Una ejecución JSON por línea, solo se añaden líneas
+HISTORIAL_RETENCION_DIAS = int(os.getenv('HISTORIAL_RETENCION_DIAS', 90)) # Días que se conservan en el historial y en los totales diarios
+HISTORIAL_TAMANO_MAXIMO = int(os.getenv('HISTORIAL_TAMANO_MAXIMO', 5 * 1024 * 1024)) # Bytes a partir de los que se compacta el historial
+DIRECTORIO_RESULTADOS = 'docs/resultados'
+FEED_ULTIMAS_EJECUCIONES = 'docs/data.json'
+FEED_TOTALES_DIARIOS = 'docs/totales_diarios.json'
+FEED_TOTALES_HORARIOS = 'docs/totales_horarios.json'
+ULTIMAS_EJECUCIONES = 50
+HORAS_TOTALES_HORARIOS = 7 * 24
+
+# Segundos que se reutiliza la correspondencia usuario de Azure > usuario de Redmine guardada en SYNC_STATE_FILE
+USUARIOS_TTL = int(os.getenv('USUARIOS_TTL', 7 * 24 * 3600))
+ID_USUARIO_REDMINE_POR_DEFECTO = 2666 # eaymerich
+
+# Segundos que se reutilizan los datos de referencia (miembros, estados, versión e índice de issues) en modo daemon
+REFERENCIA_TTL = int(os.getenv('REFERENCIA_TTL', 3600))
+
+# Receptor de service hooks de Azure DevOps
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '127.0.0.1')
+WEBHOOK_SECRETO = os.getenv('WEBHOOK_SECRETO') # Contraseña de la autenticación básica configurada en el service hook
+WEBHOOK_DEBOUNCE = float(os.getenv('WEBHOOK_DEBOUNCE', 5)) # Segundos sin recibir hooks antes de procesar la cola
+
+# Notificaciones por correo
+NOTIFICACIONES_FILE = os.getenv('NOTIFICACIONES_FILE', 'notificaciones_pendientes.json') # Correos sin entregar y último envío de cada aviso
+NOTIFICACIONES_VENTANA_DIGEST = int(os.getenv('NOTIFICACIONES_VENTANA_DIGEST', 3600)) # Segundos en los que los avisos repetidos se agrupan en un resumen
+NOTIFICACIONES_ESPERA_REINTENTO = int(os.getenv('NOTIFICACIONES_ESPERA_REINTENTO', 60)) # Segundos tras un fallo del servidor SMTP
+NOTIFICACIONES_TIMEOUT_CIERRE = float(os.getenv('NOTIFICACIONES_TIMEOUT_CIERRE', 30)) # Segundos que se espera a los envíos al terminar el proceso
+SMTP_TIMEOUT = float(os.getenv('SMTP_TIMEOUT', 30))
+SMTP_INACTIVIDAD = 60 # Segundos sin envíos tras los que se cierra la conexión SMTP
 
 # Instancia del logging
 logger = logging.getLogger('logger_sync_azure_redmine')
+LOG_EVENTOS_FILE = os.getenv('LOG_EVENTOS_FILE', 'synchronization.jsonl') # Un evento JSON por línea
+EVENTO_PROGRESO = {'progreso': True} # Mensajes que se muestran por consola en el modo 'progreso'
+CAMPOS_EVENTO = ('objetivo', 'fase', 'azure_id', 'redmine_id', 'accion', 'duracion_ms')
 tiempo_inicio = datetime.datetime.now(zona_horaria_local)
 last_run_timestamp = None
+continuation_token_pendiente = None # Token del feed de revisiones que se guardará al terminar la ejecución
+datos_referencia_cargados_en = None # Instante (time.monotonic) de la última carga de los datos de referencia
+evento_parada = threading.Event()
+bloqueo_sincronizacion = threading.Lock() # Evita que un ciclo de polling y la cola de hooks escriban a la vez
+cola_hooks = {} # ID de Azure -> último work item recibido por service hook
+ultimo_hook_recibido = 0.0
+condicion_hooks = threading.Condition()
 
 #variables globales
-version_sprint = None #Sprint
-redmine = Redmine(REDMINE_URL, key=REDMINE_TOKEN)
+objetivos = [] # Área, iteración y versión de Redmine de cada objetivo a sincronizar, con sus resultados
+contexto_objetivo = threading.local() # Objetivo que está procesando el hilo actual
+redmine = None # Se crea en configurar_clientes_http
 issues_por_campo_personalizado = {}
 mapeo_estados = {}
 redmine_tipo_issue = {
@@ -63,12 +202,36 @@ redmine_tipo_issue = {
     2 : 'Evolutivo'
 }
 project_memberships = []
+miembros_cargados = False # Los miembros solo se descargan cuando hay que resolver un usuario no conocido
+indice_miembros_por_token = {} # Palabra del nombre normalizado -> [(posición, miembro, palabras del nombre)]
+nombres_usuarios_redmine = {} # ID de usuario de Redmine -> nombre
+bloqueo_miembros = threading.Lock()
 azure_redmine_user_map = {}
-
-created_issues = []
-failed_tasks = []
-modified_tasks = [] 
-none_modified_tasks = []
+azure_pausa_hasta = 0.0 # Instante (time.monotonic) hasta el que Azure DevOps ha pedido no enviar peticiones
+bloqueo_throttling_azure = threading.Lock()
+conexion_estado = None
+clientes_redmine_usuarios = {} # API key de Redmine -> cliente de python-redmine del usuario
+api_keys_imputacion = None # uniqueName de Azure -> API key de Redmine, se carga al imputar por primera vez
+bloqueo_clientes_redmine = threading.Lock()
+cola_notificaciones = queue.Queue() # Correos pendientes de pasar al hilo de notificaciones
+notificaciones = {'pendientes': [], 'ultimos_envios': {}} # Estado del hilo de notificaciones, se guarda en NOTIFICACIONES_FILE
+bloqueo_notificaciones = threading.Lock()
+parada_notificaciones = threading.Event()
+hilo_notificaciones = None
+bloqueo_estado = threading.Lock()
+sesiones_http = {} # Una sesión con pool de conexiones por host
+cabeceras_http = {} # Cabeceras de autenticación por host, calculadas una sola vez
+metricas_http = {} # Llamadas, errores, reintentos, latencias y bytes por endpoint
+tiempos_fases = {} # Segundos de cada fase de la ejecución
+contexto_fases = threading.local() # Fases anidadas del hilo actual, para medir el tiempo propio de cada una
+bloqueo_fases = threading.Lock()
+bloqueo_http = threading.Lock()
+bloqueo_resultados = threading.Lock() # Listas de resultados de los objetivos
+bloqueo_indice = threading.Lock() # Índice de issues de Redmine durante la aplicación del plan
+ids_en_creacion = set() # IDs de Azure cuya issue se está creando en este momento
+indice_issues_al_dia = False # Si el índice persistente de issues ya se ha actualizado en este ciclo
+reconstruccion_indice_pendiente = forzar_sincronizacion # Con --forzar el índice se reconstruye una vez al arrancar
+bloqueo_indice_issues = threading.Lock()
 
 # region Configuracion Aplicacion
 
@@ -85,24 +248,74 @@ def cargar_ultimo_timestamp():
 def actualizar_ultimo_timestamp():
     global last_run_timestamp
     last_run_file = 'last_run.txt'
-    with open(last_run_file, 'w') as f:
-        f.write(datetime.datetime.now(zona_horaria_local).isoformat())
+    escribir_archivo_atomico(last_run_file, datetime.datetime.now(zona_horaria_local).isoformat())
     last_run_timestamp = datetime.datetime.now(zona_horaria_local)
 
+def cargar_continuation_token():
+    if os.path.exists(CONTINUATION_TOKEN_FILE):
+        with open(CONTINUATION_TOKEN_FILE, 'r') as f:
+            return f.read().strip() or None
+    return None
+
+def actualizar_continuation_token():
+    if continuation_token_pendiente:
+        escribir_archivo_atomico(CONTINUATION_TOKEN_FILE, continuation_token_pendiente)
+
+def escribir_archivo_atomico(ruta, contenido):
+    # Se escribe en un temporal y se renombra, para no dejar nunca el archivo a medias
+    ruta_temporal = f"{ruta}.tmp"
+    with open(ruta_temporal, 'w', encoding='utf-8') as f:
+        f.write(contenido)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(ruta_temporal, ruta)
+
 def signal_handler(sig, frame):
     logger.info('Señal de cierre detectada. Cerrando la aplicación...')
-    logger.info('--------------- Final del proceso de sincronizacion Azure <> Redmine ---------------')
+    if modo_daemon:
+        # El ciclo en curso termina y el bucle del daemon sale antes de empezar el siguiente
+        logger.warning('Señal de cierre detectada. Se cerrará al terminar el ciclo en curso...', extra=EVENTO_PROGRESO)
+        evento_parada.set()
+        return
+    logger.info('--------------- Final del proceso de sincronizacion Azure <> Redmine ---------------', extra=EVENTO_PROGRESO)
     sys.exit(0)
 
 signal.signal(signal.SIGINT, signal_handler)
 signal.signal(signal.SIGTERM, signal_handler)
 
+class FormateadorJson(logging.Formatter):
+    """Formatea cada registro como una línea JSON con los campos estructurados del evento."""
+
+    def format(self, record):
+        evento = {
+            'ts': datetime.datetime.fromtimestamp(record.created, zona_horaria_local).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'hilo': record.threadName,
+            'mensaje': record.getMessage(),
+        }
+        for campo in CAMPOS_EVENTO:
+            if hasattr(record, campo):
+                evento[campo] = getattr(record, campo)
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+def filtro_consola(record):
+    if modo_consola == 'detallado':
+        return True
+    if modo_consola == 'progreso':
+        return record.levelno >= logging.WARNING or getattr(record, 'progreso', False)
+    return record.levelno >= logging.ERROR
+
 def configurar_logging():    
+    """
+    Los mensajes se encolan y un hilo en segundo plano los escribe en los archivos de log, en el archivo
+    de eventos JSON y en la consola, para que los hilos de sincronización no esperen a la E/S.
+    """
     # Configuración de la rotación del log
     log_file_max_size = 30 * 1024 * 1024  # 30 MB
     backup_count = 5  # Número de archivos de backup
 
-    logger.setLevel(logging.DEBUG)  # Capturar todos los niveles de log
+    # Los mensajes de detalle de cada tarea (DEBUG) solo se generan en el modo de consola 'detallado'
+    logger.setLevel(logging.DEBUG if modo_consola == 'detallado' else logging.INFO)
 
     # Crea un handler para escribir mensajes de error (ERROR y CRITICAL) en error.log
     error_handler = RotatingFileHandler('error.log', maxBytes=log_file_max_size, backupCount=backup_count)
@@ -116,7 +329,59 @@ def configurar_logging():
     info_handler.setLevel(logging.INFO)  # Solo mensajes INFO y DEBUG
     info_formatter = logging.Formatter('%(asctime)s:%(levelname)s:%(message)s')
     info_handler.setFormatter(info_formatter)
-    logger.addHandler(info_handler)
+
+    # Eventos estructurados (JSON lines) con el work item, la fase y la duración de cada paso
+    eventos_handler = RotatingFileHandler(LOG_EVENTOS_FILE, maxBytes=log_file_max_size, backupCount=backup_count, encoding='utf-8')
+    eventos_handler.setLevel(logging.INFO)
+    eventos_handler.setFormatter(FormateadorJson())
+
+    consola_handler = logging.StreamHandler(sys.stdout)
+    consola_handler.setFormatter(logging.Formatter('%(message)s'))
+    consola_handler.addFilter(filtro_consola)
+
+    cola_logs = queue.SimpleQueue()
+    logger.addHandler(QueueHandler(cola_logs))
+    escritor_logs = QueueListener(cola_logs, error_handler, info_handler, eventos_handler, consola_handler, respect_handler_level=True)
+    escritor_logs.start()
+    # Al salir se escriben los mensajes que queden en la cola
+    atexit.register(escritor_logs.stop)
+
+def registrar_evento(mensaje, nivel=logging.INFO, **campos):
+    # Un evento por paso, con el objetivo del hilo actual y los campos estructurados indicados
+    objetivo = getattr(contexto_objetivo, 'objetivo', None)
+    if objetivo is not None:
+        campos.setdefault('objetivo', objetivo['nombre'])
+    logger.log(nivel, mensaje, extra=campos)
+
+def crear_objetivos():
+    """
+    Crea los objetivos de sincronización a partir de los números de sprint (con AREA_PATH e ITERATION_PATH)
+    y de los --objetivo 'AREA|ITERACION|VERSION' de la línea de comandos.
+    """
+    objetivos.clear()
+    for numero in sprint_numbers:
+        objetivos.append(crear_objetivo(AREA_PATH, f"{ITERATION_PATH} {numero}", f"Sprint {numero}"))
+    for definicion in objetivos_cli:
+        partes = [parte.strip() for parte in definicion.split('|')]
+        if len(partes) != 3 or not all(partes):
+            parser.error(f"Objetivo no válido '{definicion}'. Formato: AREA|ITERACION|VERSION")
+        objetivos.append(crear_objetivo(*partes))
+
+def crear_objetivo(area_path, iteration_path, nombre_version):
+    return {
+        'nombre': nombre_version,
+        'area_path': area_path,
+        'iteration_path': iteration_path,
+        'nombre_version': nombre_version,
+        'version': None,
+        'azure_tasks': None,
+        'plan': [],
+        'created_issues': [],
+        'failed_tasks': [],
+        'modified_tasks': [],
+        'none_modified_tasks': [],
+        'imputaciones': [] # (ID de Azure, ID de Redmine, horas completadas) de las tareas aplicadas
+    }
 
 # endregion Configuracion Aplicacion
 
@@ -133,6 +398,69 @@ def obtener_duracion_formateada():
     
     return f"{horas}h {minutos}m {segundos}s"
 
+def medir_fase(fase):
+    """
+    Decorador que suma a tiempos_fases[fase] el tiempo propio de la función, sin contar el de las
+    fases anidadas (por ejemplo la descarga de miembros durante la planificación).
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltorio(*args, **kwargs):
+            pila = contexto_fases.__dict__.setdefault('pila', [])
+            pila.append(0.0)
+            inicio = time.monotonic()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                duracion = time.monotonic() - inicio
+                tiempo_anidado = pila.pop()
+                if pila:
+                    pila[-1] += duracion
+                registrar_tiempo_fase(fase, duracion - tiempo_anidado)
+        return envoltorio
+    return decorador
+
+def registrar_tiempo_fase(fase, segundos):
+    # Las fases que se ejecutan a la vez en varios objetivos suman el tiempo de todos
+    with bloqueo_fases:
+        tiempos_fases[fase] = tiempos_fases.get(fase, 0.0) + segundos
+
+def ejecutar_en_paralelo(funcion, elementos, max_workers):
+    """
+    Aplica una función a cada elemento usando como máximo max_workers hilos.
+
+    Args:
+        funcion (callable): Función que recibe un elemento.
+        elementos (list): Elementos a procesar.
+        max_workers (int): Número máximo de hilos simultáneos.
+
+    Returns:
+        list: Los resultados en el mismo orden que los elementos de entrada.
+    """
+    if max_workers <= 1 or len(elementos) <= 1:
+        return [funcion(elemento) for elemento in elementos]
+    # Los hilos trabajan sobre el mismo objetivo que el hilo que los lanza
+    objetivo = getattr(contexto_objetivo, 'objetivo', None)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(elementos))) as executor:
+        return list(executor.map(lambda elemento: en_objetivo(objetivo, funcion, elemento), elementos))
+
+def en_objetivo(objetivo, funcion, *args):
+    # Ejecuta la función con el objetivo indicado como objetivo del hilo actual
+    anterior = getattr(contexto_objetivo, 'objetivo', None)
+    contexto_objetivo.objetivo = objetivo
+    try:
+        return funcion(*args)
+    finally:
+        contexto_objetivo.objetivo = anterior
+
+def objetivo_actual():
+    return contexto_objetivo.objetivo
+
+def registrar_resultado(clave, texto):
+    # Las escrituras en Redmine se aplican en paralelo y todas registran su resultado en el mismo objetivo
+    with bloqueo_resultados:
+        objetivo_actual()[clave].append(texto)
+
 def normalize_name(name):
     # Convertir a minúsculas y quitar acentos
     name = unidecode(name).lower()
@@ -142,31 +470,517 @@ def normalize_name(name):
 
 # endregion Funciones de soporte
 
+# region Cliente HTTP
+
+class MotorRedmineCompartido(SyncEngine):
+    """Motor de python-redmine que envía las peticiones a través del cliente HTTP compartido."""
+
+    def request(self, method, url, headers=None, params=None, data=None):
+        kwargs = self.construct_request_kwargs(method, headers, params, data)
+        # La clave de API del cliente (por ejemplo la de un usuario concreto) tiene prioridad sobre la del host
+        kwargs['headers'] = dict(self.requests.get('headers', {}), **kwargs['headers'])
+        kwargs['params'] = dict(self.requests.get('params', {}), **kwargs['params'])
+        return self.process_response(peticion_http(method, url, **kwargs))
+
+def configurar_clientes_http():
+    """
+    Registra la autenticación de Azure DevOps y Redmine en el cliente HTTP compartido y crea el cliente de python-redmine.
+    """
+    global redmine
+    token = ':{}'.format(AZURE_TOKEN) 
+    encoded_token = base64.b64encode(token.encode()).decode()
+    registrar_cabeceras_http(AZURE_DEVOPS_PROJECT_BASE, {'Authorization': f'Basic {encoded_token}'})
+    registrar_cabeceras_http(REDMINE_URL, {'X-Redmine-API-Key': REDMINE_TOKEN})
+    redmine = Redmine(REDMINE_URL, key=REDMINE_TOKEN, engine=MotorRedmineCompartido)
+
+def registrar_cabeceras_http(url_base, cabeceras):
+    cabeceras_http[urlsplit(url_base).netloc] = cabeceras
+
+def obtener_sesion_http(host):
+    with bloqueo_http:
+        sesion = sesiones_http.get(host)
+        if sesion is None:
+            sesion = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_TAMANO_POOL)
+            sesion.mount('http://', adaptador)
+            sesion.mount('https://', adaptador)
+            sesion.headers.update(cabeceras_http.get(host, {}))
+            sesiones_http[host] = sesion
+        return sesion
+
+def obtener_endpoint(metodo, url):
+    # Los IDs de la ruta se sustituyen para agrupar, por ejemplo, todos los PUT /issues/{id}.json
+    partes = urlsplit(url)
+    ruta = re.sub(r'/[0-9]+', '/{id}', re.sub(r'/+', '/', partes.path))
+    return f"{metodo.upper()} {partes.netloc}{ruta}"
+
+def registrar_metrica_http(endpoint, latencia, error=False, reintento=False, bytes_enviados=0, bytes_recibidos=0):
+    with bloqueo_http:
+        metricas = metricas_http.setdefault(endpoint, {'llamadas': 0, 'errores': 0, 'reintentos': 0, 'latencias': [], 'bytes_enviados': 0, 'bytes_recibidos': 0})
+        metricas['llamadas'] += 1
+        metricas['latencias'].append(latencia)
+        metricas['bytes_enviados'] += bytes_enviados
+        metricas['bytes_recibidos'] += bytes_recibidos
+        if error:
+            metricas['errores'] += 1
+        if reintento:
+            metricas['reintentos'] += 1
+
+def peticion_http(metodo, url, idempotente=None, **kwargs):
+    """
+    Realiza una petición HTTP con la sesión keep-alive del host, su autenticación y los timeouts configurados.
+
+    Los errores de conexión, los timeouts y las respuestas 502/503/504 se reintentan con backoff exponencial
+    y jitter solo si la petición es idempotente; las demás (por ejemplo un POST de creación) solo se
+    reintentan si no se llegó a establecer la conexión.
+
+    Args:
+        metodo (str): Método HTTP.
+        url (str): URL completa.
+        idempotente (bool): Si la petición se puede repetir sin efectos. Por defecto depende del método.
+        **kwargs: Parámetros adicionales de requests (params, json, headers...).
+
+    Returns:
+        requests.Response: La respuesta obtenida.
+    """
+    host = urlsplit(url).netloc
+    endpoint = obtener_endpoint(metodo, url)
+    sesion = obtener_sesion_http(host)
+    kwargs.setdefault('timeout', (HTTP_TIMEOUT_CONEXION, HTTP_TIMEOUT_LECTURA))
+    if idempotente is None:
+        idempotente = metodo.upper() in METODOS_IDEMPOTENTES
+
+    for intento in range(HTTP_MAX_REINTENTOS + 1):
+        ultimo_intento = intento == HTTP_MAX_REINTENTOS
+        inicio = time.monotonic()
+        try:
+            response = sesion.request(metodo, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            registrar_metrica_http(endpoint, time.monotonic() - inicio, error=True, reintento=intento > 0)
+            if ultimo_intento or not (idempotente or isinstance(e, requests.ConnectTimeout)):
+                raise
+            motivo = str(e)
+        else:
+            cuerpo_enviado = response.request.body or b''
+            registrar_metrica_http(endpoint, time.monotonic() - inicio, error=response.status_code >= 500, reintento=intento > 0,
+                                   bytes_enviados=len(cuerpo_enviado), bytes_recibidos=len(response.content))
+            if ultimo_intento or not idempotente or response.status_code not in (502, 503, 504):
+                return response
+            motivo = f"HTTP {response.status_code}"
+
+        espera = min(2 ** intento, 30) * random.uniform(0.5, 1.5)
+        aviso = f"Error en la petición {metodo} a {host} ({motivo}). Reintentando en {espera:.1f}s..."
+        logger.warning(aviso)
+        time.sleep(espera)
+
+def calcular_percentil(valores_ordenados, percentil):
+    if not valores_ordenados:
+        return 0.0
+    posicion = max(0, math.ceil(percentil / 100 * len(valores_ordenados)) - 1)
+    return valores_ordenados[posicion]
+
+def resumen_metricas_http():
+    """
+    Resume las métricas HTTP de la ejecución por endpoint.
+
+    Returns:
+        dict: Endpoint -> llamadas, errores, reintentos, percentiles de latencia (ms) y bytes transferidos.
+    """
+    with bloqueo_http:
+        resumen = {}
+        for endpoint, metricas in sorted(metricas_http.items()):
+            latencias = sorted(metricas['latencias'])
+            resumen[endpoint] = {
+                'llamadas': metricas['llamadas'],
+                'errores': metricas['errores'],
+                'reintentos': metricas['reintentos'],
+                'p50_ms': round(calcular_percentil(latencias, 50) * 1000, 1),
+                'p95_ms': round(calcular_percentil(latencias, 95) * 1000, 1),
+                'p99_ms': round(calcular_percentil(latencias, 99) * 1000, 1),
+                'max_ms': round((latencias[-1] if latencias else 0) * 1000, 1),
+                'bytes_enviados': metricas['bytes_enviados'],
+                'bytes_recibidos': metricas['bytes_recibidos'],
+            }
+        return resumen
+
+def escribir_metricas_http():
+    for endpoint, metricas in resumen_metricas_http().items():
+        logger.info(
+            f"HTTP {endpoint}: {metricas['llamadas']} llamadas, {metricas['errores']} errores, {metricas['reintentos']} reintentos, "
+            f"latencia p50 {metricas['p50_ms']:.0f} ms, p95 {metricas['p95_ms']:.0f} ms, p99 {metricas['p99_ms']:.0f} ms, máxima {metricas['max_ms']:.0f} ms, "
+            f"{metricas['bytes_enviados']} bytes enviados, {metricas['bytes_recibidos']} bytes recibidos"
+        )
+    for fase, segundos in tiempos_fases.items():
+        logger.info(f"Fase {fase}: {segundos:.2f}s")
+
+# endregion Cliente HTTP
+
+# region Estado de sincronización
+
+def abrir_estado_sincronizacion():
+    """
+    Abre (y crea si no existe) la base de datos SQLite con el estado de la última sincronización de cada work item:
+    la revisión de Azure ('System.Rev'), la issue de Redmine asociada y un hash de los valores enviados.
+    También guarda los usuarios resueltos, el índice de issues de Redmine por ID de Azure, los cambios de estado de Redmine
+    pendientes de enviar a Azure y las entradas de tiempo imputadas.
+    """
+    global conexion_estado
+    conexion_estado = sqlite3.connect(SYNC_STATE_FILE, check_same_thread=False)
+    with bloqueo_estado, conexion_estado:
+        conexion_estado.execute("""
+            CREATE TABLE IF NOT EXISTS estado_work_items (
+                azure_id INTEGER PRIMARY KEY,
+                azure_rev INTEGER,
+                redmine_id INTEGER,
+                hash_valores TEXT,
+                sincronizado TEXT
+            )
+        """)
+        conexion_estado.execute("""
+            CREATE TABLE IF NOT EXISTS usuarios_redmine (
+                azure_unique_name TEXT PRIMARY KEY,
+                redmine_id INTEGER,
+                redmine_nombre TEXT,
+                guardado_en REAL
+            )
+        """)
+        conexion_estado.execute("""
+            CREATE TABLE IF NOT EXISTS metadatos (
+                clave TEXT PRIMARY KEY,
+                valor TEXT
+            )
+        """)
+        conexion_estado.execute("""
+            CREATE TABLE IF NOT EXISTS issues_redmine (
+                redmine_id INTEGER PRIMARY KEY,
+                azure_id INTEGER NOT NULL,
+                estado_id INTEGER,
+                porcentaje_realizado INTEGER,
+                horas_estimadas REAL,
+                asignado_id INTEGER,
+                version_id INTEGER,
+                campos_personalizados TEXT,
+                hash_descripcion TEXT
+            )
+        """)
+        conexion_estado.execute("CREATE INDEX IF NOT EXISTS issues_redmine_azure_id ON issues_redmine (azure_id)")
+        # IDs de Azure cuyas issues ya se han pedido a Redmine mientras el índice es parcial
+        conexion_estado.execute("""
+            CREATE TABLE IF NOT EXISTS issues_redmine_cobertura (
+                azure_id INTEGER PRIMARY KEY
+            )
+        """)
+        conexion_estado.execute("""
+            CREATE TABLE IF NOT EXISTS imputaciones_tiempo (
+                clave TEXT PRIMARY KEY,
+                azure_id INTEGER,
+                azure_rev INTEGER,
+                redmine_id INTEGER,
+                usuario TEXT,
+                fecha TEXT,
+                horas REAL,
+                time_entry_id INTEGER,
+                imputado TEXT
+            )
+        """)
+        conexion_estado.execute("""
+            CREATE TABLE IF NOT EXISTS estados_redmine_pendientes (
+                redmine_id INTEGER PRIMARY KEY,
+                azure_id INTEGER NOT NULL,
+                estado_anterior INTEGER,
+                estado_id INTEGER
+            )
+        """)
+        conexion_estado.execute("""
+            CREATE TABLE IF NOT EXISTS horas_imputadas (
+                azure_id INTEGER PRIMARY KEY,
+                horas_completadas REAL
+            )
+        """)
+        columnas = {fila[1] for fila in conexion_estado.execute("PRAGMA table_info(issues_redmine)")}
+        if 'hash_descripcion' not in columnas:
+            # Índice anterior a la comparación de descripciones: se reconstruye en la siguiente actualización
+            conexion_estado.execute("ALTER TABLE issues_redmine ADD COLUMN hash_descripcion TEXT")
+            conexion_estado.execute("DELETE FROM metadatos WHERE clave = 'indice_issues_reconstruido'")
+
+def obtener_estado_work_item(azure_id):
+    if conexion_estado is None:
+        return None
+    with bloqueo_estado:
+        fila = conexion_estado.execute(
+            "SELECT azure_rev, redmine_id, hash_valores FROM estado_work_items WHERE azure_id = ?", (azure_id,)
+        ).fetchone()
+    if fila is None:
+        return None
+    return {'azure_rev': fila[0], 'redmine_id': fila[1], 'hash_valores': fila[2]}
+
+def guardar_estado_work_item(azure_id, azure_rev, redmine_id, hash_valores):
+    if conexion_estado is None:
+        return
+    with bloqueo_estado, conexion_estado:
+        conexion_estado.execute(
+            "INSERT OR REPLACE INTO estado_work_items (azure_id, azure_rev, redmine_id, hash_valores, sincronizado) VALUES (?, ?, ?, ?, ?)",
+            (azure_id, azure_rev, redmine_id, hash_valores, datetime.datetime.now(zona_horaria_local).isoformat())
+        )
+
+def obtener_usuario_guardado(azure_unique_name):
+    # Devuelve (ID, nombre) del usuario de Redmine guardado para el usuario de Azure si no ha caducado
+    if conexion_estado is None or not azure_unique_name:
+        return None
+    with bloqueo_estado:
+        fila = conexion_estado.execute(
+            "SELECT redmine_id, redmine_nombre FROM usuarios_redmine WHERE azure_unique_name = ? AND guardado_en > ?",
+            (azure_unique_name, time.time() - USUARIOS_TTL)
+        ).fetchone()
+    return fila
+
+def guardar_usuario(azure_unique_name, redmine_id, redmine_nombre):
+    if conexion_estado is None or not azure_unique_name:
+        return
+    with bloqueo_estado, conexion_estado:
+        conexion_estado.execute(
+            "INSERT OR REPLACE INTO usuarios_redmine (azure_unique_name, redmine_id, redmine_nombre, guardado_en) VALUES (?, ?, ?, ?)",
+            (azure_unique_name, redmine_id, redmine_nombre, time.time())
+        )
+
+def actualizar_huella_miembros(huella):
+    """
+    Guarda la huella de los miembros del proyecto. Si ha cambiado respecto a la guardada se descartan
+    las correspondencias de usuarios, ya que un usuario nuevo o renombrado puede cambiar el resultado.
+    """
+    if conexion_estado is None:
+        return
+    with bloqueo_estado, conexion_estado:
+        fila = conexion_estado.execute("SELECT valor FROM metadatos WHERE clave = 'huella_miembros'").fetchone()
+        if fila is not None and fila[0] == huella:
+            return
+        conexion_estado.execute("DELETE FROM usuarios_redmine")
+        conexion_estado.execute("INSERT OR REPLACE INTO metadatos (clave, valor) VALUES ('huella_miembros', ?)", (huella,))
+    if fila is not None:
+        mensaje = "Los miembros del proyecto han cambiado. Se descartan las correspondencias de usuarios guardadas."
+        logger.info(mensaje, extra=EVENTO_PROGRESO)
+
+def obtener_metadato(clave):
+    if conexion_estado is None:
+        return None
+    with bloqueo_estado:
+        fila = conexion_estado.execute("SELECT valor FROM metadatos WHERE clave = ?", (clave,)).fetchone()
+    return fila[0] if fila else None
+
+def guardar_metadato(clave, valor):
+    if conexion_estado is None:
+        return
+    with bloqueo_estado, conexion_estado:
+        conexion_estado.execute("INSERT OR REPLACE INTO metadatos (clave, valor) VALUES (?, ?)", (clave, valor))
+
+def guardar_issues_indice(issues, reconstruir=False):
+    """
+    Guarda en el índice persistente las issues descargadas de Redmine.
+
+    Args:
+        issues (list): Tuplas (ID de Azure, IssueRedmine). Las issues sin ID de Azure se quitan del índice.
+        reconstruir (bool): Si es True se sustituye el índice entero.
+    """
+    filas = [
+        (issue.id, azure_id, issue.estado_id, issue.porcentaje_realizado, issue.horas_estimadas, issue.asignado_id,
+         issue.version_id, json.dumps(issue.campos_personalizados, ensure_ascii=False), issue.hash_descripcion)
+        for azure_id, issue in issues if azure_id is not None
+    ]
+    with bloqueo_estado, conexion_estado:
+        if reconstruir:
+            conexion_estado.execute("DELETE FROM issues_redmine")
+            conexion_estado.execute("DELETE FROM issues_redmine_cobertura")
+        else:
+            conexion_estado.executemany("DELETE FROM issues_redmine WHERE redmine_id = ?", [(issue.id,) for azure_id, issue in issues if azure_id is None])
+        conexion_estado.executemany(
+            "INSERT OR REPLACE INTO issues_redmine (redmine_id, azure_id, estado_id, porcentaje_realizado, horas_estimadas, asignado_id, "
+            "version_id, campos_personalizados, hash_descripcion) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", filas
+        )
+
+def vaciar_indice_issues():
+    # Empieza un índice parcial, que se completa con las issues de los IDs de Azure que se sincronizan
+    with bloqueo_estado, conexion_estado:
+        conexion_estado.execute("DELETE FROM issues_redmine")
+        conexion_estado.execute("DELETE FROM issues_redmine_cobertura")
+        conexion_estado.execute("DELETE FROM metadatos WHERE clave IN ('indice_issues_completo', 'indice_issues_versiones')")
+
+def obtener_ids_sin_indexar(azure_ids):
+    indexados = {fila[0] for fila in consultar_en_grupos("SELECT azure_id FROM issues_redmine_cobertura WHERE azure_id IN ({})", azure_ids)}
+    return sorted(set(azure_ids) - indexados)
+
+def guardar_ids_indexados(azure_ids):
+    with bloqueo_estado, conexion_estado:
+        conexion_estado.executemany("INSERT OR IGNORE INTO issues_redmine_cobertura (azure_id) VALUES (?)", [(azure_id,) for azure_id in azure_ids])
+
+def obtener_issues_indice(azure_ids):
+    """
+    Lee del índice persistente las issues de unos IDs de Azure.
+
+    Returns:
+        dict: ID de Azure -> lista de IssueRedmine, la más reciente primero como en el listado de Redmine.
+    """
+    azure_ids = sorted(set(azure_ids))
+    issues = {}
+    with bloqueo_estado:
+        # SQLite limita el número de parámetros de cada consulta
+        for inicio in range(0, len(azure_ids), 500):
+            grupo = azure_ids[inicio:inicio + 500]
+            filas = conexion_estado.execute(
+                "SELECT redmine_id, azure_id, estado_id, porcentaje_realizado, horas_estimadas, asignado_id, version_id, campos_personalizados, "
+                f"hash_descripcion FROM issues_redmine WHERE azure_id IN ({','.join('?' * len(grupo))}) ORDER BY redmine_id DESC", grupo
+            ).fetchall()
+            for redmine_id, azure_id, estado_id, porcentaje_realizado, horas_estimadas, asignado_id, version_id, campos, hash_descripcion in filas:
+                issue = IssueRedmine(redmine_id, estado_id, porcentaje_realizado, horas_estimadas, asignado_id, version_id,
+                                     hash_descripcion, {int(id_campo): valor for id_campo, valor in json.loads(campos).items()})
+                issues.setdefault(azure_id, []).append(issue)
+    return issues
+
+def consultar_en_grupos(consulta, valores):
+    # SQLite limita el número de parámetros de cada consulta
+    valores = sorted(set(valores))
+    filas = []
+    with bloqueo_estado:
+        for inicio in range(0, len(valores), 500):
+            grupo = valores[inicio:inicio + 500]
+            filas.extend(conexion_estado.execute(consulta.format(','.join('?' * len(grupo))), grupo).fetchall())
+    return filas
+
+def obtener_estados_indice(redmine_ids):
+    # ID de Redmine -> estado guardado en el índice persistente
+    return dict(consultar_en_grupos("SELECT redmine_id, estado_id FROM issues_redmine WHERE redmine_id IN ({})", redmine_ids))
+
+def guardar_estado_indice(redmine_id, estado_id):
+    # Las escrituras de la propia sincronización se reflejan en el índice persistente para no confundirlas con cambios hechos en Redmine
+    with bloqueo_estado, conexion_estado:
+        conexion_estado.execute("UPDATE issues_redmine SET estado_id = ? WHERE redmine_id = ?", (estado_id, redmine_id))
+
+def guardar_cambios_estado_redmine(cambios):
+    # Si ya había un cambio pendiente de la issue se conserva el estado anterior, que es el que todavía tiene Azure
+    with bloqueo_estado, conexion_estado:
+        conexion_estado.executemany(
+            "INSERT INTO estados_redmine_pendientes (redmine_id, azure_id, estado_anterior, estado_id) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (redmine_id) DO UPDATE SET azure_id = excluded.azure_id, estado_id = excluded.estado_id", cambios
+        )
+
+def obtener_cambios_estado_redmine():
+    with bloqueo_estado:
+        filas = conexion_estado.execute("SELECT redmine_id, azure_id, estado_anterior, estado_id FROM estados_redmine_pendientes").fetchall()
+    return [{'redmine_id': redmine_id, 'azure_id': azure_id, 'estado_anterior': estado_anterior, 'estado_id': estado_id}
+            for redmine_id, azure_id, estado_anterior, estado_id in filas]
+
+def borrar_cambios_estado_redmine(redmine_ids):
+    with bloqueo_estado, conexion_estado:
+        conexion_estado.executemany("DELETE FROM estados_redmine_pendientes WHERE redmine_id = ?", [(redmine_id,) for redmine_id in redmine_ids])
+
+def obtener_horas_imputadas(azure_ids):
+    # ID de Azure -> horas completadas en Azure que ya están imputadas en Redmine
+    return dict(consultar_en_grupos("SELECT azure_id, horas_completadas FROM horas_imputadas WHERE azure_id IN ({})", azure_ids))
+
+def guardar_horas_imputadas(horas):
+    with bloqueo_estado, conexion_estado:
+        conexion_estado.executemany("INSERT OR REPLACE INTO horas_imputadas (azure_id, horas_completadas) VALUES (?, ?)", horas)
+
+def obtener_claves_imputadas(claves):
+    return {fila[0] for fila in consultar_en_grupos("SELECT clave FROM imputaciones_tiempo WHERE clave IN ({})", claves)}
+
+def guardar_imputacion(entrada, time_entry_id):
+    with bloqueo_estado, conexion_estado:
+        conexion_estado.execute(
+            "INSERT OR REPLACE INTO imputaciones_tiempo (clave, azure_id, azure_rev, redmine_id, usuario, fecha, horas, time_entry_id, imputado) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (entrada['clave'], entrada['azure_id'], entrada['azure_rev'], entrada['redmine_id'], entrada['usuario'], entrada['fecha'],
+             entrada['horas'], time_entry_id, datetime.datetime.now(zona_horaria_local).isoformat())
+        )
+
+def calcular_hash_work_item(task_info):
+    """
+    Calcula un hash de los valores que la sincronización envía a Redmine para un work item.
+    El padre se identifica por su ID de Azure para no depender del orden de procesado.
+    """
+    work_item = task_info['data']
+    valores = {
+        'type': work_item.tipo,
+        'state': work_item.estado,
+        'estado_redmine': mapeo_estados.get(work_item.estado),
+        'title': work_item.titulo,
+        'parent': work_item.parent_id,
+        'estimatedhours': work_item.horas_estimadas,
+        'remaininghours': work_item.horas_restantes,
+        'assigned_to': work_item.asignado_usuario,
+        'version_sprint_id': objetivo_actual()['version'].id if objetivo_actual()['version'] else None,
+    }
+    return hashlib.sha256(json.dumps(valores, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def preparar_descripcion(descripcion):
+    # Texto de la descripción tal como se envía a Redmine
+    return (descripcion or '')[:TAMANO_MAXIMO_DESCRIPCION]
+
+def calcular_hash_descripcion(descripcion):
+    """
+    Hash del contenido normalizado de una descripción (sin diferencias de espacios ni saltos de línea),
+    para comparar la de Azure con la de Redmine sin guardar ninguna de las dos.
+    """
+    return hashlib.sha256(' '.join(preparar_descripcion(descripcion).split()).encode('utf-8')).hexdigest()
+
+def work_item_sin_cambios(task_info):
+    """
+    Comprueba si un work item ya se sincronizó con la misma revisión de Azure y los mismos valores.
+
+    Returns:
+        int: El ID de la issue de Redmine asociada si no hay cambios, o None si hay que procesarlo.
+    """
+    if forzar_sincronizacion or not task_info.get('data'):
+        return None
+    estado = obtener_estado_work_item(task_info['id'])
+    if (estado and estado['redmine_id']
+            and estado['azure_rev'] == task_info['data'].rev
+            and estado['hash_valores'] == calcular_hash_work_item(task_info)):
+        return estado['redmine_id']
+    return None
+
+# endregion Estado de sincronización
+
 #region Obtencion de datos de Azure y Redmine de configuración
 
+@medir_fase('miembros')
 def cargar_miembros_proyecto():
-    print("Obteniendo usuarios Redmine...")
-    logger.info("Obteniendo usuarios Redmine...")
-    global project_memberships
+    logger.info("Obteniendo usuarios Redmine...", extra=EVENTO_PROGRESO)
+    global project_memberships, miembros_cargados
     project_memberships_raw = redmine.project_membership.filter(project_id=PROJECT_ID)
     
     project_memberships = []
     for miembro in project_memberships_raw:
         if hasattr(miembro, 'user'):
             project_memberships.append(miembro.user)
+    construir_indice_miembros()
+    huella = hashlib.sha256(json.dumps(sorted((user.id, user.name) for user in project_memberships)).encode('utf-8')).hexdigest()
+    actualizar_huella_miembros(huella)
+    miembros_cargados = True
     procesado = f"Proceso realizado en {obtener_duracion_formateada()}."
-    print(procesado)
-    logger.info(procesado)
-
+    logger.info(procesado, extra=EVENTO_PROGRESO)
+
+def construir_indice_miembros():
+    # Índice de las palabras de los nombres normalizados, para no recorrer todos los miembros en cada usuario
+    indice_miembros_por_token.clear()
+    for posicion, miembro in enumerate(project_memberships):
+        partes_nombre_miembro = frozenset(normalize_name(miembro.name).split())
+        for parte in partes_nombre_miembro:
+            indice_miembros_por_token.setdefault(parte, []).append((posicion, miembro, partes_nombre_miembro))
+        nombres_usuarios_redmine[miembro.id] = miembro.name
+
+def asegurar_miembros_cargados():
+    with bloqueo_miembros:
+        if not miembros_cargados:
+            cargar_miembros_proyecto()
+
+@medir_fase('estados')
 def obtener_mapear_estados_redmine():
-    print("Obteniendo y mapeando estados Redmine <> Azure...")
-    logger.info("Obteniendo y mapeando estados Redmine <> Azure...")
+    logger.info("Obteniendo y mapeando estados Redmine <> Azure...", extra=EVENTO_PROGRESO)
     url = f"{REDMINE_URL}/issue_statuses.json"
-    headers = {'X-Redmine-API-Key': REDMINE_TOKEN}
     global mapeo_estados
 
     try:
-        response = requests.get(url, headers=headers)
+        response = peticion_http('GET', url)
         response.raise_for_status()
         estados = response.json().get('issue_statuses', [])
         estados_redmine  = {estado['name']: estado['id'] for estado in estados}    
@@ -181,74 +995,373 @@ def obtener_mapear_estados_redmine():
             'Removed': estados_redmine.get('Desestimada', None),
         }
         procesado = f"Proceso realizado en {obtener_duracion_formateada()}."
-        print(procesado)
-        logger.info(procesado)
+        logger.info(procesado, extra=EVENTO_PROGRESO)
     except requests.RequestException as e:
         error_message = f"Error al obtener los estados de Redmine: {e}"
-        print(error_message)
         logger.error(error_message, exc_info=True)
         sys.exit(1)
 
-def buscar_version_segun_sprint(nombre_version):
-    print("Obteniendo Id de la version del Sprint de Redmine...")
-    logger.info("Obteniendo Id de la version del Sprint de Redmine...")
-    global version_sprint
-    proyecto = redmine.project.get(PROJECT_ID)   
-    
-    for version in proyecto.versions:
-        if nombre_version.lower() in version.name.lower():
-            version_sprint = version
-            procesado = f"Proceso realizado en {obtener_duracion_formateada()}."
-            print(procesado)
-            logger.info(procesado)
-            return   
-    
-    version_sprint = None    
+@medir_fase('versiones')
+def buscar_versiones_objetivos():
+    logger.info("Obteniendo Id de las versiones de los Sprints de Redmine...", extra=EVENTO_PROGRESO)
+    # Las versiones del proyecto se piden una sola vez para todos los objetivos
+    versiones = list(redmine.project.get(PROJECT_ID).versions)
+    for objetivo in objetivos:
+        objetivo['version'] = buscar_version_segun_sprint(objetivo['nombre_version'], versiones)
+        if objetivo['version'] is None:
+            mensaje = f"No se ha encontrado en Redmine la versión '{objetivo['nombre_version']}'."
+            logger.warning(mensaje)
     procesado = f"Proceso realizado en {obtener_duracion_formateada()}."
-    print(procesado)
-    logger.info(procesado)
+    logger.info(procesado, extra=EVENTO_PROGRESO)
+
+def buscar_version_segun_sprint(nombre_version, versiones):
+    for version in versiones:
+        if nombre_version.lower() in version.name.lower():
+            return version
+    return None
 
 # endregion Obtencion de datos de Azure y Redmine de configuración
 
+#region Registros de Azure y Redmine
+
+@dataclass(slots=True)
+class WorkItemAzure:
+    """
+    Campos de un work item de Azure DevOps que usa la sincronización. Se crea al recibir la respuesta de Azure
+    y el JSON completo (enlaces, relaciones y campos que no se sincronizan) se descarta.
+    """
+    id: int
+    rev: int | None
+    tipo: str | None
+    estado: str | None
+    titulo: str | None
+    descripcion: str | None # None hasta que se pide a Azure con cargar_descripciones
+    padre: int | None # System.Parent tal como llega de Azure
+    parent_id: int | None # Solo las Task y los Bug se sincronizan con su padre
+    horas_estimadas: float | None
+    horas_restantes: float | None
+    horas_completadas: float | None
+    asignado_nombre: str
+    asignado_usuario: str # uniqueName del usuario asignado
+    url: str
+    area_path: str | None
+    iteration_path: str | None
+
+@dataclass(slots=True)
+class IssueRedmine:
+    """
+    Campos de una issue de Redmine que se comparan con Azure. El índice de issues guarda estos registros
+    en lugar de las issues completas.
+    """
+    id: int
+    estado_id: int | None = None
+    porcentaje_realizado: int | None = None
+    horas_estimadas: float | None = None
+    asignado_id: int | None = None
+    version_id: int | None = None
+    hash_descripcion: str | None = None # None si no se conoce la descripción de la issue
+    campos_personalizados: dict = field(default_factory=dict) # ID del campo -> valor, solo los que se sincronizan
+
+def crear_registro_work_item(task_data):
+    """
+    Convierte un work item de la API de Azure DevOps (individual, de lotes, del feed de revisiones o de un
+    service hook) en un WorkItemAzure.
+    """
+    campos = task_data['fields']
+    work_item_type = campos.get('System.WorkItemType')
+    asignado = campos.get('System.AssignedTo') or {}
+    # La API de lotes no devuelve '_links' cuando se piden campos concretos
+    url = (task_data.get('_links') or {}).get('html', {}).get('href') or f"{AZURE_DEVOPS_PROJECT_BASE}_workitems/edit/{task_data['id']}"
+    return WorkItemAzure(
+        id=task_data['id'],
+        rev=task_data.get('rev'),
+        tipo=work_item_type,
+        estado=campos.get('System.State'),
+        titulo=campos.get('System.Title'),
+        descripcion=campos.get('System.Description'),
+        padre=campos.get('System.Parent'),
+        parent_id=campos.get('System.Parent') if work_item_type in ['Task', 'Bug'] else None,
+        horas_estimadas=campos.get('Microsoft.VSTS.Scheduling.OriginalEstimate'),
+        horas_restantes=campos.get('Microsoft.VSTS.Scheduling.RemainingWork'),
+        horas_completadas=campos.get('Microsoft.VSTS.Scheduling.CompletedWork'),
+        asignado_nombre=asignado.get('displayName', ''),
+        asignado_usuario=asignado.get('uniqueName', ''),
+        url=url,
+        area_path=campos.get('System.AreaPath'),
+        iteration_path=campos.get('System.IterationPath')
+    )
+
+def crear_registro_issue(issue):
+    # Convierte una issue de la API de Redmine en un IssueRedmine con los campos que se sincronizan
+    ids_campos = {int(ID_CAMPO_HORAS_RESTANTES), int(ID_CAMPO_IBER_IDCLIENTE), ID_CAMPO_VERSION_SOLICITADA}
+    return IssueRedmine(
+        id=issue['id'],
+        estado_id=(issue.get('status') or {}).get('id'),
+        porcentaje_realizado=issue.get('done_ratio'),
+        horas_estimadas=issue.get('estimated_hours'),
+        asignado_id=(issue.get('assigned_to') or {}).get('id'),
+        version_id=(issue.get('fixed_version') or {}).get('id'),
+        hash_descripcion=calcular_hash_descripcion(issue.get('description')),
+        campos_personalizados={int(campo['id']): campo.get('value') for campo in issue.get('custom_fields', []) if int(campo['id']) in ids_campos}
+    )
+
+#endregion Registros de Azure y Redmine
+
 #region Obtención de Trabajos de Azure y Redmine
 
-def cargar_issues_Redmine():
-    global issues_por_campo_personalizado
-    print("Obteniendo tareas de Redmine...")
-    logger.info("Obteniendo tareas de Redmine...")
-    url = f"{REDMINE_URL}/projects/{PROJECT_ID}/issues.json"
-    headers = {'X-Redmine-API-Key': REDMINE_TOKEN}
-    issues = []
-    offset = 0
-    limit = 100  # Redmine suele tener un límite de 100 issues por página
+def obtener_retry_after(response):
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
 
-    while True:
-        params = {'offset': offset, 'limit': limit}
-        response = requests.get(url, headers=headers, params=params)
-        if response.status_code == 200:
-            data = response.json()
-            issues.extend(data['issues'])
-            if len(data['issues']) < limit:
+def pausar_peticiones_azure(segundos):
+    global azure_pausa_hasta
+    with bloqueo_throttling_azure:
+        azure_pausa_hasta = max(azure_pausa_hasta, time.monotonic() + segundos)
+
+def peticion_azure(metodo, url, idempotente=True, **kwargs):
+    """
+    Realiza una petición a Azure DevOps respetando las cabeceras de throttling.
+
+    Las respuestas 429 y 5xx se reintentan esperando lo indicado en 'Retry-After' (o un backoff
+    exponencial si no viene). Si una respuesta correcta indica que no quedan peticiones
+    ('X-RateLimit-Remaining') o trae 'Retry-After', se pausan las siguientes peticiones de todos los hilos.
+
+    Args:
+        idempotente (bool): Si es False (escrituras) solo se reintentan las respuestas 429, que Azure rechaza sin
+            aplicar; tras un error de conexión o una respuesta 5xx la petición puede haberse aplicado y no se repite.
+
+    Returns:
+        requests.Response: La última respuesta obtenida, o None si no se ha podido conectar.
+    """
+    response = None
+    for intento in range(AZURE_MAX_REINTENTOS + 1):
+        espera = azure_pausa_hasta - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+
+        try:
+            # Las consultas a Azure (también los POST de WIQL y de lotes) solo leen datos
+            response = peticion_http(metodo, url, idempotente=idempotente, **kwargs)
+        except requests.RequestException as e:
+            response = None
+            motivo = str(e)
+            if not idempotente:
+                logger.warning(f"Error en la petición {metodo} a Azure DevOps ({motivo}). No se repite porque puede haberse aplicado.")
                 break
-            offset += limit
         else:
-            error_msg = f"Error en la solicitud: {response.status_code}"
-            print(error_msg)
-            logger.error(error_msg)
-            sys.exit(1)            
+            retry_after = obtener_retry_after(response)
+            if response.status_code != 429 and (response.status_code < 500 or not idempotente):
+                restantes = response.headers.get('X-RateLimit-Remaining')
+                if retry_after is not None or restantes in ('0', '0.0'):
+                    pausar_peticiones_azure(retry_after if retry_after is not None else 1)
+                return response
+            motivo = f"HTTP {response.status_code}"
+
+        if intento == AZURE_MAX_REINTENTOS:
+            break
+        espera = retry_after if response is not None and retry_after is not None else min(2 ** intento, 60) + random.uniform(0, 1)
+        pausar_peticiones_azure(espera)
+        aviso = f"Azure DevOps limita o rechaza la petición ({motivo}). Reintentando en {espera:.1f}s..."
+        logger.warning(aviso)
+    return response
+
+@medir_fase('redmine')
+def cargar_issues_Redmine(azure_ids):
+    """
+    Carga en el índice en memoria las issues de Redmine de unos IDs de Azure. Se leen del índice persistente
+    de sync_state.db, que se actualiza antes (una vez por ciclo) con las issues modificadas en Redmine. Si el
+    índice es parcial, antes se piden a Redmine las issues de los IDs que todavía no se han consultado.
 
-    issues_por_campo_personalizado = agrupar_issues_por_campo_personalizado(issues)
-    procesado = f"Proceso realizado en {obtener_duracion_formateada()}."
-    print(procesado)
-    logger.info(procesado)    
+    Args:
+        azure_ids (list): IDs de Azure que se van a sincronizar.
+    """
+    asegurar_indice_issues_al_dia()
+    completar_indice_issues(azure_ids)
+    issues_cargadas = obtener_issues_indice(azure_ids)
+    with bloqueo_indice:
+        issues_por_campo_personalizado.update(issues_cargadas)
+    logger.debug(f"Cargadas {len(issues_cargadas)} tareas de Redmine del índice de issues.")
+
+def asegurar_indice_issues_al_dia():
+    # El índice persistente se actualiza una vez por ciclo y solo cuando hay tareas con cambios que comparar
+    global indice_issues_al_dia
+    with bloqueo_indice_issues:
+        if not indice_issues_al_dia:
+            actualizar_indice_issues()
+            indice_issues_al_dia = True
+
+@medir_fase('redmine')
+def actualizar_indice_issues():
+    """
+    Actualiza el índice persistente de issues de Redmine (ID de Azure, ID de Redmine y campos que se comparan).
+
+    Normalmente solo se descargan las issues modificadas desde la actualización anterior (filtro 'updated_on'),
+    que incluyen las creadas y modificadas por la propia sincronización. Sin índice previo (base de datos nueva)
+    no se descarga el proyecto: el índice empieza vacío y completar_indice_issues le añade las issues de los IDs
+    de Azure que se sincronizan. El proyecto entero solo se descarga con --forzar y, si el índice ya está completo,
+    cada INDICE_ISSUES_RECONSTRUCCION segundos, lo que además elimina las issues borradas o movidas de proyecto.
+    Pasado ese plazo, un índice parcial se vacía y vuelve a empezar.
+    """
+    global reconstruccion_indice_pendiente
+    inicio = datetime.datetime.now(datetime.timezone.utc)
+    actualizado_desde = obtener_metadato('indice_issues_actualizado')
+    reconstruido_en = obtener_metadato('indice_issues_reconstruido')
+    completo = obtener_metadato('indice_issues_completo') == '1'
+    nuevo = actualizado_desde is None or reconstruido_en is None
+    caducado = not nuevo and time.time() - float(reconstruido_en) > INDICE_ISSUES_RECONSTRUCCION
+    reconstruir = reconstruccion_indice_pendiente or (completo and caducado)
+
+    issues = []
+    if reconstruir:
+        logger.info("Reconstruyendo el índice de issues de Redmine con todas las issues del proyecto...", extra=EVENTO_PROGRESO)
+        issues = obtener_issues_paginadas({'status_id': '*'})
+    elif not nuevo:
+        logger.info(f"Obteniendo tareas de Redmine modificadas desde {actualizado_desde}...", extra=EVENTO_PROGRESO)
+        issues = obtener_issues_paginadas({'status_id': '*', 'updated_on': f">={actualizado_desde}"})
+    if modo_inverso:
+        detectar_cambios_estado_redmine(issues)
+        if nuevo or (caducado and not reconstruir):
+            logger.warning("El índice de issues de Redmine es nuevo: los cambios de estado hechos en Redmine hasta ahora no se pueden detectar "
+                           "y no se envían a Azure DevOps. --inversa los detecta a partir de esta ejecución en las issues que se añadan al índice.")
+    if reconstruir or not (nuevo or caducado):
+        guardar_issues_indice(issues, reconstruir)
+    else:
+        vaciar_indice_issues()
+        logger.info("Índice de issues de Redmine nuevo: solo se pedirán las issues de las tareas que se sincronizan.", extra=EVENTO_PROGRESO)
+
+    guardar_metadato('indice_issues_actualizado', (inicio - datetime.timedelta(seconds=MARGEN_INDICE_ISSUES)).strftime('%Y-%m-%dT%H:%M:%SZ'))
+    if reconstruir or nuevo or caducado:
+        guardar_metadato('indice_issues_reconstruido', str(time.time()))
+    if reconstruir:
+        guardar_metadato('indice_issues_completo', '1')
+        reconstruccion_indice_pendiente = False
+    procesado = f"Índice de issues de Redmine actualizado con {len(issues)} tareas. Proceso realizado en {obtener_duracion_formateada()}."
+    logger.info(procesado, extra=EVENTO_PROGRESO)
+
+@medir_fase('redmine')
+def completar_indice_issues(azure_ids):
+    """
+    Añade al índice parcial las issues de los IDs de Azure que todavía no se han consultado. Se piden solo las
+    issues cuyo 'Iber_IdCliente' coincide (en grupos de IDs para no superar la longitud de URL) y, una vez por
+    versión, las de las versiones de los objetivos, que cubren las issues identificadas únicamente por el asunto.
+    Después las issues de esos IDs se mantienen al día con las modificadas ('updated_on').
+
+    Args:
+        azure_ids (list): IDs de Azure que se van a sincronizar.
+    """
+    if obtener_metadato('indice_issues_completo') == '1':
+        return
+    with bloqueo_indice_issues:
+        ids_sin_indexar = obtener_ids_sin_indexar(azure_ids)
+        versiones_indexadas = json.loads(obtener_metadato('indice_issues_versiones') or '[]')
+        versiones = sorted({objetivo['version'].id for objetivo in objetivos if objetivo['version'] is not None} - set(versiones_indexadas))
+        if not ids_sin_indexar and not versiones:
+            return
+        consultas = [
+            {'status_id': '*', f'cf_{ID_CAMPO_IBER_IDCLIENTE}': '|'.join(str(azure_id) for azure_id in ids_sin_indexar[inicio:inicio + TAMANO_FILTRO_IDS_REDMINE])}
+            for inicio in range(0, len(ids_sin_indexar), TAMANO_FILTRO_IDS_REDMINE)
+        ]
+        consultas.extend({'status_id': '*', 'fixed_version_id': version_id} for version_id in versiones)
+        issues = [issue for issues_consulta in ejecutar_en_paralelo(obtener_issues_paginadas, consultas, REDMINE_MAX_WORKERS) for issue in issues_consulta]
+        guardar_issues_indice(issues)
+        guardar_ids_indexados(ids_sin_indexar)
+        guardar_metadato('indice_issues_versiones', json.dumps(versiones_indexadas + versiones))
+    logger.debug(f"Añadidas al índice de issues {len(issues)} tareas de Redmine de {len(ids_sin_indexar)} IDs de Azure en {len(consultas)} consultas.")
+
+def detectar_cambios_estado_redmine(issues):
+    """
+    Guarda como pendientes de enviar a Azure los cambios de estado de las issues descargadas respecto al índice
+    persistente. Las issues nuevas en el índice no se consideran cambios (sin índice previo no se detecta ninguno),
+    y los estados que escribe la propia sincronización ya están en el índice (guardar_estado_indice), así que no
+    vuelven a Azure.
+    """
+    estados_indice = obtener_estados_indice([issue.id for azure_id, issue in issues if azure_id is not None])
+    cambios = [
+        (issue.id, azure_id, estados_indice[issue.id], issue.estado_id) for azure_id, issue in issues
+        if issue.id in estados_indice and issue.estado_id != estados_indice[issue.id] and obtener_estado_azure(issue.estado_id)
+    ]
+    if cambios:
+        guardar_cambios_estado_redmine(cambios)
+        logger.info(f"Detectados {len(cambios)} cambios de estado en Redmine pendientes de enviar a Azure DevOps.", extra=EVENTO_PROGRESO)
+
+def obtener_issues_paginadas(filtros):
+    """
+    Obtiene todas las páginas de issues de Redmine para unos filtros. La primera página indica el
+    'total_count' y el resto de offsets se piden en paralelo. Cada página se convierte en registros
+    IssueRedmine en cuanto llega.
+
+    Args:
+        filtros (dict): Parámetros de filtrado de la API de issues de Redmine.
+
+    Returns:
+        list: Tuplas (ID de Azure, IssueRedmine) de las issues de todas las páginas.
+    """
+    limit = 100  # Redmine suele tener un límite de 100 issues por página
+    data = obtener_pagina_issues(filtros, 0, limit)
+    issues = [(obtener_clave_issue(issue), crear_registro_issue(issue)) for issue in data['issues']]
+    offsets = list(range(limit, data.get('total_count', 0), limit))
+    for pagina in ejecutar_en_paralelo(lambda offset: obtener_pagina_issues(filtros, offset, limit), offsets, REDMINE_MAX_WORKERS):
+        issues.extend((obtener_clave_issue(issue), crear_registro_issue(issue)) for issue in pagina['issues'])
+    return issues
+
+def obtener_pagina_issues(filtros, offset, limit):
+    url = f"{REDMINE_URL}/projects/{PROJECT_ID}/issues.json"
+    params = dict(filtros, offset=offset, limit=limit)
+    response = peticion_http('GET', url, params=params)
+    if response.status_code == 200:
+        return response.json()
+    else:
+        error_msg = f"Error en la solicitud: {response.status_code}"
+        logger.error(error_msg)
+        sys.exit(1)            
+
+def registrar_issue_en_indice(azure_id, issue):
+    # Las issues creadas durante la ejecución se añaden al índice para que no se vuelvan a crear
+    with bloqueo_indice:
+        issues_por_campo_personalizado[azure_id] = [issue]
+        ids_en_creacion.discard(azure_id)
+
+def reservar_creacion_issue(azure_id):
+    """
+    Marca el work item como en creación si todavía no tiene issue en Redmine.
+
+    Returns:
+        bool: False si la issue ya existe o la está creando otro hilo.
+    """
+    with bloqueo_indice:
+        if issues_por_campo_personalizado.get(azure_id) or azure_id in ids_en_creacion:
+            return False
+        ids_en_creacion.add(azure_id)
+        return True
 
-def agrupar_issues_por_campo_personalizado(issues):
-    issues_por_campo_personalizado = {}
-    for issue in issues:
-        key = obtener_clave_issue(issue)
-        if key is not None:
-            issues_por_campo_personalizado.setdefault(key, []).append(issue)
-    return issues_por_campo_personalizado
+def liberar_creacion_issue(azure_id):
+    with bloqueo_indice:
+        ids_en_creacion.discard(azure_id)
+
+def aplicar_cambios_en_indice(redmine_task, cambios):
+    """
+    Refleja en la issue cacheada los cambios enviados a Redmine, para que el índice siga al día entre ciclos.
+    """
+    if 'estado' in cambios:
+        redmine_task.estado_id = cambios['estado']
+    if 'horas_restantes' in cambios:
+        redmine_task.campos_personalizados[int(ID_CAMPO_HORAS_RESTANTES)] = cambios['horas_restantes']
+    if 'porcentaje_realizado' in cambios:
+        redmine_task.porcentaje_realizado = cambios['porcentaje_realizado']
+    if 'assigned_to_id' in cambios:
+        redmine_task.asignado_id = cambios['assigned_to_id'] or None
+    if 'azure_id' in cambios:
+        redmine_task.campos_personalizados[int(ID_CAMPO_IBER_IDCLIENTE)] = cambios['azure_id']
+    if 'version_sprint_id' in cambios:
+        version_sprint = objetivo_actual()['version']
+        redmine_task.version_id = version_sprint.id
+        redmine_task.campos_personalizados[ID_CAMPO_VERSION_SOLICITADA] = version_sprint.name
+    if 'estimated_hours' in cambios:
+        redmine_task.horas_estimadas = cambios['estimated_hours']
+    if 'descripcion' in cambios:
+        redmine_task.hash_descripcion = calcular_hash_descripcion(cambios['descripcion'])
 
 def obtener_clave_issue(issue):
     """
@@ -281,18 +1394,34 @@ def obtener_clave_issue(issue):
     # Si no se encuentra un identificador válido en ningún campo, retornar None
     return None
 
-def get_azure_devops_tasks():
+def get_azure_devops_tasks(objetivo):
     """
     Obtiene las tareas de Azure DevOps para un área y una iteración específicas que han sido modificadas desde el último timestamp.  
+
+    Args:
+        objetivo (dict): El objetivo con el área y la iteración a consultar.
         
     Returns:
         list: Una lista de tareas de Azure DevOps.
     """
+    work_item_ids = consultar_ids_work_items(objetivo)
+    if work_item_ids is None:
+        return None
+    tasks = obtener_work_items_por_lotes(work_item_ids)
+    return organize_work_items(tasks)
+
+@medir_fase('azure_consulta')
+def consultar_ids_work_items(objetivo):
+    """
+    Ejecuta la consulta WIQL del objetivo con las tareas modificadas desde el último timestamp.
+
+    Returns:
+        list: Los IDs de los work items, o None si la consulta ha fallado.
+    """
 
     # Ajustar el timestamp para asegurarse de no perder actualizaciones que ocurrieron durante el día de la última sincronización
     adjusted_timestamp = last_run_timestamp - datetime.timedelta(days=1)
-    print(f"Obteniendo tareas de Azure DevOps modificadas des de {adjusted_timestamp}...")
-    logger.info(f"Obteniendo tareas de Azure DevOps modificadas des de {adjusted_timestamp}...")
+    logger.info(f"Obteniendo tareas de Azure DevOps de {objetivo['iteration_path']} modificadas des de {adjusted_timestamp}...", extra=EVENTO_PROGRESO)
     
     wiql_query = {
         "query": f"""
@@ -308,8 +1437,8 @@ def get_azure_devops_tasks():
                 [Microsoft.VSTS.Scheduling.RemainingWork]
             From WorkItems 
             Where 
-                [System.AreaPath] = '{AREA_PATH}' 
-                And [System.IterationPath] = '{ITERATION_PATH} {sprint_number}'
+                [System.AreaPath] = '{objetivo['area_path']}' 
+                And [System.IterationPath] = '{objetivo['iteration_path']}'
                 And (
                     [System.WorkItemType] = 'Bug' 
                     Or [System.WorkItemType] = 'Task'
@@ -318,39 +1447,148 @@ def get_azure_devops_tasks():
                 And [System.ChangedDate] > '{adjusted_timestamp.strftime("%Y-%m-%d")}'             
         """
     }
-    token = ':{}'.format(AZURE_TOKEN) 
-    encoded_token = base64.b64encode(token.encode()).decode()
-    headers = {'Authorization': f'Basic {encoded_token}', 'Content-Type': 'application/json'}
-    response = requests.post(AZURE_DEVOPS_URL, json=wiql_query, headers=headers)
-    if response.status_code == 200:
-        work_item_ids = response.json()["workItems"]
-        tasks = []
-        for work_item in work_item_ids:
-            task_url = '{}_apis/wit/workitems/{}?api-version=6.0&$expand=relations'.format(AZURE_DEVOPS_PROJECT_BASE, work_item['id'])            
-            task_response = requests.get(task_url, headers=headers)
-            if task_response.status_code == 200:
-                task_data = task_response.json()
-                work_item_type = task_data['fields'].get('System.WorkItemType')
-                parent_id = None
-                if work_item_type in ['Task', 'Bug']:                    
-                    parent_id = task_data['fields'].get('System.Parent')                            
-                task_data['parent_id'] = parent_id                 
-                tasks.append(task_data)
-            else:
-                print(f"Error al obtener las tarea de Azure DevOps: {task_response.status_code}") 
-                logger.error(f"Error al obtener las tarea de Azure DevOps: {task_response.status_code}")       
-        return organize_work_items(tasks)
+    response = peticion_azure('POST', AZURE_DEVOPS_URL, json=wiql_query)
+    if response is not None and response.status_code == 200:
+        return [work_item['id'] for work_item in response.json()["workItems"]]
     else:
-        print(f"Error al obtener las tareas de Azure DevOps: {response.status_code}")
-        logger.error(f"Error al obtener las tareas de Azure DevOps: {response.status_code}")
+        codigo = response.status_code if response is not None else 'sin conexión'
+        logger.error(f"Error al obtener las tareas de Azure DevOps: {codigo}")
+        return None
+
+@medir_fase('azure_consulta')
+def get_azure_devops_revisiones():
+    """
+    Obtiene las tareas de Azure DevOps a partir del feed de revisiones de reporting, pidiendo solo las
+    revisiones posteriores al continuation token de la última ejecución correcta. Sin token (primera
+    ejecución) se parte del último timestamp menos un día. El feed se lee una sola vez y las tareas se
+    reparten entre los objetivos, que quedan en objetivo['azure_tasks'].
+
+    El nuevo token queda pendiente y se guarda al terminar la ejecución sin errores.
+
+    Returns:
+        bool: True si se ha podido leer el feed.
+    """
+    global continuation_token_pendiente
+    url = f"{AZURE_DEVOPS_PROJECT_BASE}_apis/wit/reporting/workitemrevisions"
+    params = {
+        'api-version': '6.0',
+        'includeLatestOnly': 'true',
+        'types': ','.join(TIPOS_WORK_ITEM_SINCRONIZADOS),
+        'fields': ','.join(CAMPOS_WORK_ITEM_SINCRONIZACION + ['System.AreaPath', 'System.IterationPath'])
+    }
+    continuation_token = cargar_continuation_token()
+    if continuation_token:
+        params['continuationToken'] = continuation_token
+        mensaje = "Obteniendo revisiones de Azure DevOps posteriores a la última ejecución..."
+    else:
+        adjusted_timestamp = last_run_timestamp - datetime.timedelta(days=1)
+        params['startDateTime'] = adjusted_timestamp.isoformat()
+        mensaje = f"Obteniendo revisiones de Azure DevOps des de {adjusted_timestamp}..."
+    logger.info(mensaje, extra=EVENTO_PROGRESO)
+
+    revisiones = {}
+    while True:
+        response = peticion_azure('GET', url, params=params)
+        if response is None or response.status_code != 200:
+            codigo = response.status_code if response is not None else 'sin conexión'
+            logger.error(f"Error al obtener las revisiones de Azure DevOps: {codigo}")
+            return False
+        data = response.json()
+        for revision in data.get('values', []):
+            # Se conserva solo la última revisión de cada work item
+            revisiones[revision['id']] = revision
+        params.pop('startDateTime', None)
+        params['continuationToken'] = data.get('continuationToken')
+        if data.get('isLastBatch', True) or not params['continuationToken']:
+            break
+
+    continuation_token_pendiente = params['continuationToken']
+    work_items = [crear_registro_work_item(revision) for revision in revisiones.values()]
+    revisiones.clear()
+    for objetivo in objetivos:
+        # Los work items cuya última revisión ya no pertenece a ningún objetivo se descartan
+        tasks = [work_item for work_item in work_items if work_item_pertenece_al_objetivo(work_item, objetivo)]
+        resumen = f"Obtenidas {len(tasks)} tareas de Azure DevOps con cambios para {objetivo['nombre']}."
+        logger.info(resumen, extra=EVENTO_PROGRESO)
+        objetivo['azure_tasks'] = organize_work_items(tasks)
+    return True
+
+def work_item_pertenece_al_objetivo(work_item, objetivo):
+    return (work_item.area_path == objetivo['area_path']
+            and work_item.iteration_path == objetivo['iteration_path']
+            and work_item.tipo in TIPOS_WORK_ITEM_SINCRONIZADOS)
+
+def buscar_objetivo_de_work_item(work_item):
+    for objetivo in objetivos:
+        if work_item_pertenece_al_objetivo(work_item, objetivo):
+            return objetivo
+    return None
+
+@medir_fase('azure_detalle')
+def obtener_work_items_por_lotes(work_item_ids):
+    """
+    Obtiene el detalle de los work items de Azure DevOps mediante la API workitemsbatch, en lotes de
+    hasta 200 IDs y pidiendo solo los campos que utiliza la sincronización. Los lotes se piden en
+    paralelo (AZURE_MAX_WORKERS) y el resultado conserva el orden de la consulta WIQL.
+
+    Si un lote falla, sus work items se obtienen uno a uno como antes.
+
+    Args:
+        work_item_ids (list): IDs de los work items devueltos por la consulta WIQL.
+
+    Returns:
+        list: Los work items con la misma estructura que la API de work items individual.
+    """
+    lotes = [work_item_ids[inicio:inicio + TAMANO_LOTE_AZURE] for inicio in range(0, len(work_item_ids), TAMANO_LOTE_AZURE)]
+    resultados = ejecutar_en_paralelo(obtener_lote_work_items, lotes, AZURE_MAX_WORKERS)
+
+    tasks = []
+    llamadas_realizadas = 0
+    for tasks_lote, llamadas_lote in resultados:
+        tasks.extend(tasks_lote)
+        llamadas_realizadas += llamadas_lote
+
+    llamadas_ahorradas = len(work_item_ids) - llamadas_realizadas
+    resumen_lotes = f"Obtenidas {len(tasks)} tareas de Azure DevOps en {llamadas_realizadas} llamadas ({llamadas_ahorradas} llamadas ahorradas)."
+    logger.info(resumen_lotes, extra=EVENTO_PROGRESO)
+    return tasks
+
+def obtener_lote_work_items(lote):
+    url_lote = f"{AZURE_DEVOPS_PROJECT_BASE}_apis/wit/workitemsbatch?api-version=6.0"
+    cuerpo = {'ids': lote, 'fields': CAMPOS_WORK_ITEM_SINCRONIZACION, 'errorPolicy': 'omit'}
+    response = peticion_azure('POST', url_lote, json=cuerpo)
+    if response is not None and response.status_code == 200:
+        # Con errorPolicy 'omit' los work items inaccesibles llegan como null
+        return [crear_registro_work_item(task_data) for task_data in response.json().get('value', []) if task_data], 1
+
+    codigo = response.status_code if response is not None else 'sin conexión'
+    error_msg = f"Error al obtener el lote de tareas de Azure DevOps: {codigo}. Se obtienen una a una..."
+    logger.error(error_msg)
+    tasks = []
+    for work_item_id in lote:
+        task_data = obtener_work_item(work_item_id)
+        if task_data:
+            tasks.append(task_data)
+    return tasks, 1 + len(lote)
+
+def obtener_work_item(work_item_id):
+    task_url = '{}_apis/wit/workitems/{}?api-version=6.0&$expand=relations'.format(AZURE_DEVOPS_PROJECT_BASE, work_item_id)
+    task_response = peticion_azure('GET', task_url)
+    if task_response is not None and task_response.status_code == 200:
+        return crear_registro_work_item(task_response.json())
+    else:
+        codigo = task_response.status_code if task_response is not None else 'sin conexión'
+        logger.error(f"Error al obtener las tarea de Azure DevOps: {codigo}")
+        # Se deja constancia en el resumen para que la tarea no se pierda en silencio
+        registrar_resultado('failed_tasks', f"Azure: {work_item_id} Error: no se ha podido obtener de Azure DevOps ({codigo})")
         return None
 
 def organize_work_items(work_items):
     organized = {}
     for item in work_items:
-        item_id = item['id']
-        item_type = item['fields']['System.WorkItemType']
-        parent_id = item['fields'].get('System.Parent')
+        item_id = item.id
+        item_type = item.tipo
+        parent_id = item.padre
         task_info = {
             'id': item_id,
             'type': item_type,
@@ -371,74 +1609,533 @@ def organize_work_items(work_items):
                 }
             organized[parent_id]['children'].append(task_info)    
     procesado = f"Proceso realizado en {obtener_duracion_formateada()}."
-    print(procesado)
-    logger.info(procesado)
+    logger.info(procesado, extra=EVENTO_PROGRESO)
     return organized
 
+def obtener_ids_azure(work_items):
+    # IDs de las HUs (incluidos los padres fake) y de las subtareas con cambios desde la última sincronización
+    ids = []
+    for id, US_info in work_items.items():
+        ids_hijos = [child_info['id'] for child_info in US_info['children'] if not work_item_sin_cambios(child_info)]
+        # Un padre fake solo hace falta para localizar el padre de subtareas con cambios
+        if (US_info['data'] and not work_item_sin_cambios(US_info)) or (not US_info['data'] and ids_hijos):
+            ids.append(id)
+        ids.extend(ids_hijos)
+    return ids
+
+@medir_fase('azure_detalle')
+def cargar_descripciones(work_items):
+    """
+    Pide a Azure DevOps solo 'System.Description' de los work items que todavía no la tienen. La consulta general
+    no incluye la descripción, así que solo se descarga la de los work items con una revisión nueva que se van a
+    crear o comparar con Redmine.
+
+    Args:
+        work_items (list): Los WorkItemAzure a completar.
+    """
+    pendientes = [work_item for work_item in work_items if work_item.descripcion is None]
+    if not pendientes:
+        return
+    lotes = [pendientes[inicio:inicio + TAMANO_LOTE_AZURE] for inicio in range(0, len(pendientes), TAMANO_LOTE_AZURE)]
+    ejecutar_en_paralelo(obtener_lote_descripciones, lotes, AZURE_MAX_WORKERS)
+    logger.debug(f"Obtenidas las descripciones de {len(pendientes)} tareas de Azure DevOps en {len(lotes)} llamadas.")
+
+def obtener_lote_descripciones(lote):
+    url_lote = f"{AZURE_DEVOPS_PROJECT_BASE}_apis/wit/workitemsbatch?api-version=6.0"
+    cuerpo = {'ids': [work_item.id for work_item in lote], 'fields': ['System.Description'], 'errorPolicy': 'omit'}
+    response = peticion_azure('POST', url_lote, json=cuerpo)
+    if response is not None and response.status_code == 200:
+        descripciones = {task_data['id']: task_data['fields'].get('System.Description', '') for task_data in response.json().get('value', []) if task_data}
+    else:
+        codigo = response.status_code if response is not None else 'sin conexión'
+        logger.error(f"Error al obtener las descripciones de Azure DevOps: {codigo}. Se obtienen una a una...")
+        descripciones = {}
+        for work_item in lote:
+            task_url = f"{AZURE_DEVOPS_PROJECT_BASE}_apis/wit/workitems/{work_item.id}?api-version=6.0&fields=System.Description"
+            task_response = peticion_azure('GET', task_url)
+            if task_response is not None and task_response.status_code == 200:
+                descripciones[work_item.id] = task_response.json().get('fields', {}).get('System.Description', '')
+    for work_item in lote:
+        # Si no se ha podido obtener se queda en None: se crea sin descripción y no se compara
+        if work_item.id in descripciones:
+            work_item.descripcion = descripciones[work_item.id]
+
 #endregion Obtención de Trabajos de Azure y Redmine
 
 #region Procesamiento de tareas de Azure y Redmine
 
-def process_work_items(work_items):
-            total_tasks = sum(1 + len(US_info['children']) for US_info in work_items.values())
-            total_parent_tasks = len(work_items) 
-            print(f"Se van a Procesar un total de {total_parent_tasks} HUs con un total de {total_tasks} subtareas...")
-            logger.info(f"Se van a Procesar un total de {total_parent_tasks} HUs con un total de {total_tasks} subtareas...")
-
-            for id, US_info in work_items.items():
-                parent_issue_id = None
-                if US_info['data']:
-                    parent_issue_id = process_task((id, US_info))
-                else:
-                    redmine_task = buscar_issue_por_campo_personalizado(id)
-                    if redmine_task is not None:
-                        parent_issue_id = redmine_task['id']
-                if parent_issue_id:
-                    for child_info in US_info['children']:
-                        # Asegúrate de que child_info es un par clave-valor
-                        child_id = child_info['id']
-                        child_info['parent_id'] = parent_issue_id  # Establecer la ID de la tarea padre
-                        process_task((child_id, child_info)) 
-
-def process_task(taskazure):
-            task_azure_id, task_info = taskazure  
-            url_task_azure = task_info['data']['_links']['html']['href']
-            texto_tarea_a_registrar = f"{task_azure_id} - '{task_info['data']['fields']['System.Title']}'"
-            print(f"--- Procesando Tarea {texto_tarea_a_registrar} - Url: {url_task_azure} ---")      
-            logger.info(f"--- Procesando Tarea {texto_tarea_a_registrar} - Url: {url_task_azure} ---")
-            
-            assigned_to_display_name = task_info['data']['fields'].get('System.AssignedTo', {}).get('displayName', '')
-            assigned_to_unique_name = task_info['data']['fields'].get('System.AssignedTo', {}).get('uniqueName', '')
-            assigned_to_id = buscar_usuario_redmine(assigned_to_display_name, assigned_to_unique_name, texto_tarea_a_registrar)
-            
-            new_redmine_task = {
-                'id': task_azure_id,
-                'type': task_info['data']['fields']['System.WorkItemType'],
-                'state': task_info['data']['fields']['System.State'],
-                'title': task_info['data']['fields']['System.Title'],
-                'description': task_info['data']['fields'].get('System.Description', ''),
-                'parentid': task_info.get('parent_id', None),
-                'estimatedhours': task_info['data']['fields'].get('Microsoft.VSTS.Scheduling.OriginalEstimate', None),
-                'remaininghours': task_info['data']['fields'].get('Microsoft.VSTS.Scheduling.RemainingWork', None),
-                'assigned_to_id': assigned_to_id
-            }
+@medir_fase('planificacion')
+def planificar_work_items(work_items):
+    """
+    Fase de planificación: compara las tareas de Azure con el índice de issues de Redmine y calcula
+    las acciones necesarias sin escribir nada en Redmine.
+
+    Cada acción es un diccionario serializable a JSON con 'accion' ('crear', 'actualizar', 'sin_cambios'
+    o 'error'), los datos de la tarea y, en las actualizaciones, los cambios campo a campo. Las HUs van
+    antes que sus subtareas; si la HU todavía no existe en Redmine, la subtarea guarda el ID de Azure
+    de la HU en 'padre_azure_id' y el ID de Redmine se resuelve al aplicar el plan.
+
+    Args:
+        work_items (dict): Las tareas organizadas por HU.
+
+    Returns:
+        list: Las acciones del plan.
+    """
+    total_tasks = sum(1 + len(US_info['children']) for US_info in work_items.values())
+    total_parent_tasks = len(work_items) 
+    logger.info(f"Se van a Procesar un total de {total_parent_tasks} HUs con un total de {total_tasks} subtareas...", extra=EVENTO_PROGRESO)
+    cargar_descripciones([task_info['data'] for US_info in work_items.values() for task_info in [US_info] + US_info['children']
+                          if task_info['data'] and not work_item_sin_cambios(task_info)])
+
+    plan = []
+    for id, US_info in work_items.items():
+        parent_issue_id = None
+        if US_info['data']:
+            accion_padre = planificar_tarea(id, US_info)
+            plan.append(accion_padre)
+            if accion_padre['accion'] == 'error':
+                continue
+            parent_issue_id = accion_padre['redmine_id']
+        else:
+            parent_issue_id = resolver_padre_sin_datos(id)
+            if not parent_issue_id:
+                continue
+        for child_info in US_info['children']:
+            child_info['parent_id'] = parent_issue_id  # ID de Redmine de la HU, None si se va a crear
+            plan.append(planificar_tarea(child_info['id'], child_info, padre_azure_id=id))
+    return plan
+
+def resolver_padre_sin_datos(padre_azure_id):
+    # HU que no está entre las tareas obtenidas: su issue se busca en el índice o en el estado guardado
+    redmine_task = buscar_issue_por_campo_personalizado(padre_azure_id)
+    if redmine_task is not None:
+        return redmine_task.id
+    estado_padre = obtener_estado_work_item(padre_azure_id)
+    return estado_padre['redmine_id'] if estado_padre else None
+
+def planificar_tarea(task_azure_id, task_info, padre_azure_id=None):
+    inicio = time.monotonic()
+    accion = calcular_accion_tarea(task_azure_id, task_info, padre_azure_id)
+    registrar_evento(f"Tarea {accion['texto']} planificada: {accion['accion']}", fase='planificacion', azure_id=task_azure_id,
+                     redmine_id=accion['redmine_id'], accion=accion['accion'], duracion_ms=round((time.monotonic() - inicio) * 1000, 1))
+    return accion
+
+def calcular_accion_tarea(task_azure_id, task_info, padre_azure_id):
+    work_item = task_info['data']
+    url_task_azure = work_item.url
+    texto_tarea_a_registrar = f"{task_azure_id} - '{work_item.titulo}'"
+    logger.debug(f"--- Procesando Tarea {texto_tarea_a_registrar} - Url: {url_task_azure} ---")
+
+    accion = {
+        'accion': None,
+        'azure_id': task_azure_id,
+        'tipo': work_item.tipo,
+        'titulo': work_item.titulo,
+        'texto': texto_tarea_a_registrar,
+        'padre_azure_id': padre_azure_id,
+        'redmine_id': None
+    }
+
+    redmine_id_sin_cambios = work_item_sin_cambios(task_info)
+    if redmine_id_sin_cambios:
+        texto_sin_cambios = f"La tarea {texto_tarea_a_registrar} no ha cambiado desde la última sincronización (Redmine Id {redmine_id_sin_cambios})."
+        logger.debug(texto_sin_cambios)
+        accion.update({'accion': 'sin_cambios', 'redmine_id': redmine_id_sin_cambios, 'guardar_estado': False})
+        return accion
+
+    if objetivo_actual()['version'] is None:
+        accion.update({'accion': 'error', 'error': f"No existe en Redmine la versión '{objetivo_actual()['nombre_version']}'"})
+        return accion
+    
+    assigned_to_id = buscar_usuario_redmine(work_item.asignado_nombre, work_item.asignado_usuario, texto_tarea_a_registrar)
+    
+    new_redmine_task = {
+        'id': task_azure_id,
+        'type': work_item.tipo,
+        'state': work_item.estado,
+        'title': work_item.titulo,
+        'description': work_item.descripcion,
+        'parentid': task_info.get('parent_id', None),
+        'padre_azure_id': padre_azure_id,
+        'estimatedhours': work_item.horas_estimadas,
+        'remaininghours': work_item.horas_restantes,
+        'completedhours': work_item.horas_completadas,
+        'assigned_to_id': assigned_to_id,
+        'rev': work_item.rev,
+        'hash_valores': calcular_hash_work_item(task_info)
+    }
+    accion['tarea'] = new_redmine_task
+
+    logger.debug(f"Buscando en Redmine si existe la tarea {texto_tarea_a_registrar}...")
+    
+    redmine_task = buscar_issue_por_campo_personalizado(task_azure_id)
+    if redmine_task is None:
+        accion['accion'] = 'crear'
+        return accion
+
+    accion['redmine_id'] = redmine_task.id
+    # Se compara con los datos ya cargados en cargar_issues_Redmine; la issue solo se vuelve a pedir si hay que escribir
+    cambios_necesarios = necesita_actualizacion(new_redmine_task, redmine_task)
+    if cambios_necesarios:
+        accion.update({'accion': 'actualizar', 'cambios': cambios_necesarios})
+    else:
+        accion.update({'accion': 'sin_cambios', 'guardar_estado': True})
+    return accion
+
+@medir_fase('aplicacion')
+def aplicar_plan(plan):
+    """
+    Fase de aplicación: ejecuta las acciones calculadas por planificar_work_items y registra los resultados
+    en el objetivo del hilo actual. Primero se aplican en paralelo las HUs y después, también en paralelo,
+    las subtareas, que solo dependen del ID de Redmine de su HU. REDMINE_MAX_ESCRITURAS limita las
+    escrituras simultáneas.
+    """
+    ids_redmine_creados = {} # ID de Azure -> ID de Redmine de las issues creadas al aplicar el plan
+    progreso = {'total': len(plan), 'aplicadas': 0}
+    aplicar = functools.partial(aplicar_accion, progreso=progreso)
+    acciones_padre = [accion for accion in plan if accion['padre_azure_id'] is None]
+    for accion, redmine_id in zip(acciones_padre, ejecutar_en_paralelo(aplicar, acciones_padre, REDMINE_MAX_ESCRITURAS)):
+        if accion['accion'] == 'crear' and redmine_id:
+            ids_redmine_creados[accion['azure_id']] = redmine_id
+
+    acciones_hijo = []
+    for accion in plan:
+        if accion['padre_azure_id'] is None:
+            continue
+        tarea = accion.get('tarea')
+        if tarea is not None and tarea['parentid'] is None:
+            tarea['parentid'] = ids_redmine_creados.get(tarea['padre_azure_id'])
+            if tarea['parentid'] is None:
+                omitir_accion_sin_padre(accion, progreso)
+                continue
+        acciones_hijo.append(accion)
+    ejecutar_en_paralelo(aplicar, acciones_hijo, REDMINE_MAX_ESCRITURAS)
+
+def omitir_accion_sin_padre(accion, progreso):
+    # La HU no se ha podido crear, como antes las subtareas se quedan sin procesar
+    registrar_evento(f"Se omite la tarea {accion['texto']} porque no se ha podido crear su HU {accion['padre_azure_id']}.",
+                     fase='aplicacion', azure_id=accion['azure_id'], accion='omitida')
+    with bloqueo_resultados:
+        progreso['total'] -= 1
+
+def aplicar_accion(accion, progreso):
+    inicio = time.monotonic()
+    redmine_id = ejecutar_accion(accion)
+    tarea = accion.get('tarea')
+    if modo_imputaciones and redmine_id and tarea and tarea.get('completedhours'):
+        with bloqueo_resultados:
+            objetivo_actual()['imputaciones'].append((accion['azure_id'], redmine_id, tarea['completedhours']))
+    texto_cambios = f" Cambios: {resumir_cambios(accion['cambios'])}" if accion['accion'] == 'actualizar' else ''
+    registrar_evento(f"Tarea {accion['texto']} aplicada: {accion['accion']} (Redmine Id {redmine_id}).{texto_cambios}", fase='aplicacion',
+                     azure_id=accion['azure_id'], redmine_id=redmine_id, accion=accion['accion'], duracion_ms=round((time.monotonic() - inicio) * 1000, 1))
+    with bloqueo_resultados:
+        progreso['aplicadas'] += 1
+        aplicadas, total = progreso['aplicadas'], progreso['total']
+    # Aviso de avance cada 10% del plan
+    if aplicadas == total or aplicadas % max(1, total // 10) == 0:
+        logger.info(f"Aplicadas {aplicadas} de {total} acciones de {objetivo_actual()['nombre']}...", extra=EVENTO_PROGRESO)
+    return redmine_id
+
+def resumir_cambios(cambios):
+    # La descripción se resume para no volcar el HTML completo en los logs y en el resumen
+    return {campo: f"<{len(valor)} caracteres>" if campo == 'descripcion' else valor for campo, valor in cambios.items()}
+
+def ejecutar_accion(accion):
+    if accion['accion'] == 'crear':
+        return crear_nueva_tarea_redmine(accion['tarea'], accion['texto'])
+    if accion['accion'] == 'actualizar':
+        return actualizar_tarea_existente_redmine(accion)
+    if accion['accion'] == 'sin_cambios':
+        registrar_resultado('none_modified_tasks', f"{accion['tipo']}: {accion['redmine_id']} - {accion['titulo']}")
+        if accion['guardar_estado']:
+            texto_cambios_no_realizados = f"No se requieren actualizaciones para la tarea {accion['texto']} con Redmine Id {accion['redmine_id']}."
+            logger.debug(texto_cambios_no_realizados)
+            tarea = accion['tarea']
+            guardar_estado_work_item(tarea['id'], tarea['rev'], accion['redmine_id'], tarea['hash_valores'])
+        return accion['redmine_id']
+    error_msg = f"No se puede sincronizar la tarea {accion['texto']}. Error: {accion['error']}"
+    logger.error(error_msg)
+    registrar_resultado('failed_tasks', f"{accion['tipo']}: {accion['texto']} Error: {accion['error']}")
+    return None
+
+def escribir_plan_sincronizacion():
+    # Guarda el plan de todos los objetivos en SYNC_PLAN_FILE
+    plan = {
+        'generado': datetime.datetime.now(zona_horaria_local).isoformat(),
+        'objetivos': [
+            {
+                'nombre': objetivo['nombre'],
+                'resumen': {tipo: sum(1 for accion in objetivo['plan'] if accion['accion'] == tipo) for tipo in ('crear', 'actualizar', 'sin_cambios', 'error')},
+                'acciones': objetivo['plan']
+            }
+            for objetivo in objetivos
+        ]
+    }
+    escribir_archivo_atomico(SYNC_PLAN_FILE, json.dumps(plan, indent=4, ensure_ascii=False, default=str))
+    for objetivo_plan in plan['objetivos']:
+        resumen = objetivo_plan['resumen']
+        mensaje = (f"Plan de {objetivo_plan['nombre']}: {resumen['crear']} a crear, {resumen['actualizar']} a actualizar, "
+                   f"{resumen['sin_cambios']} sin cambios y {resumen['error']} con errores.")
+        logger.info(mensaje, extra=EVENTO_PROGRESO)
+    logger.info(f"Plan de sincronización guardado en {SYNC_PLAN_FILE}.", extra=EVENTO_PROGRESO)
+
+#endregion Procesamiento de tareas de Azure y Redmine
+            
+#region Sincronización en streaming
+
+FIN_COLA = None # Marca de fin de las colas del pipeline de streaming
+
+def sincronizar_objetivos_streaming():
+    """
+    Sincroniza los objetivos con --streaming: el índice de issues de Redmine se completa con cada lote de
+    Azure DevOps. Los objetivos se procesan en paralelo.
+
+    Returns:
+        bool: True si se han podido consultar las tareas de todos los objetivos.
+    """
+    tareas_obtenidas = all(ejecutar_en_paralelo(lambda objetivo: en_objetivo(objetivo, sincronizar_objetivo_streaming, objetivo), objetivos, len(objetivos)))
+    if modo_plan:
+        escribir_plan_sincronizacion()
+    return tareas_obtenidas
+
+def sincronizar_objetivo_streaming(objetivo):
+    """
+    Pipeline de un objetivo en tres etapas unidas por colas acotadas:
+
+    1. Obtención: los lotes de workitemsbatch se piden en paralelo (AZURE_MAX_WORKERS) y se encolan según llegan.
+       Con la cola llena (STREAMING_TAMANO_COLA lotes) se deja de pedir hasta que la planificación avanza.
+    2. Organización y planificación: por cada lote se cargan sus issues de Redmine y se planifican las HUs y las
+       subtareas cuya HU ya se conoce. Las subtareas que llegan antes que su HU esperan a que llegue.
+    3. Aplicación: REDMINE_MAX_ESCRITURAS hilos aplican las acciones. Las subtareas de una HU que se está creando
+       se aplican justo después de crearla, con el ID de Redmine que se le ha asignado.
+
+    Así las escrituras en Redmine empiezan con el primer lote y la memoria depende del tamaño de las colas y no del sprint.
+
+    Returns:
+        bool: False si ha fallado la consulta WIQL.
+    """
+    work_item_ids = consultar_ids_work_items(objetivo)
+    if work_item_ids is None:
+        return False
+    lotes = [work_item_ids[inicio:inicio + TAMANO_LOTE_AZURE] for inicio in range(0, len(work_item_ids), TAMANO_LOTE_AZURE)]
+    logger.info(f"Sincronizando en streaming {len(work_item_ids)} tareas de Azure DevOps de {objetivo['nombre']} en {len(lotes)} lotes...", extra=EVENTO_PROGRESO)
+
+    pipeline = {
+        'ids': set(work_item_ids),
+        'cola_lotes': queue.Queue(maxsize=STREAMING_TAMANO_COLA),
+        'cola_acciones': queue.Queue(maxsize=STREAMING_TAMANO_COLA * TAMANO_LOTE_AZURE),
+        'cancelado': threading.Event(), # Alguna etapa ha fallado y el resto deja de esperar en las colas
+        'bloqueo': threading.Lock(),
+        'llamadas_azure': 0,
+        'acciones_padre': {}, # ID de Azure de la HU -> acción planificada
+        'padres_sin_datos': {}, # ID de Azure de la HU que no está entre las tareas obtenidas -> ID de Redmine
+        'hijos_en_espera': {}, # ID de Azure de la HU todavía no recibida -> subtareas recibidas
+        'hijos_por_crear': {}, # ID de Azure de la HU que se está creando -> acciones de sus subtareas
+        'padres_creados': {}, # ID de Azure de la HU creada al aplicar -> ID de Redmine (None si ha fallado)
+        'progreso': {'total': len(work_item_ids), 'aplicadas': 0}
+    }
+    escritores = 0 if modo_plan else REDMINE_MAX_ESCRITURAS
+    with ThreadPoolExecutor(max_workers=1 + escritores) as executor:
+        obtencion = executor.submit(en_objetivo, objetivo, obtener_lotes_streaming, lotes, pipeline)
+        aplicaciones = [executor.submit(en_objetivo, objetivo, aplicar_acciones_streaming, pipeline) for _ in range(escritores)]
+        try:
+            planificar_lotes_streaming(pipeline)
+        except BaseException:
+            pipeline['cancelado'].set()
+            raise
+        finally:
+            for _ in aplicaciones:
+                poner_en_cola(pipeline['cola_acciones'], FIN_COLA, pipeline['cancelado'])
+    for futuro in [obtencion] + aplicaciones:
+        futuro.result()
+
+    llamadas_ahorradas = len(work_item_ids) - pipeline['llamadas_azure']
+    resumen = f"Obtenidas {len(work_item_ids)} tareas de Azure DevOps de {objetivo['nombre']} en {pipeline['llamadas_azure']} llamadas ({llamadas_ahorradas} llamadas ahorradas)."
+    logger.info(resumen, extra=EVENTO_PROGRESO)
+    if not modo_plan:
+        if modo_imputaciones:
+            en_objetivo(objetivo, sincronizar_imputaciones, objetivo['imputaciones'])
+        escribir_resultados_ejecucion(objetivo)
+    return True
+
+def poner_en_cola(cola, elemento, cancelado):
+    # Espera a que haya sitio en la cola salvo que otra etapa del pipeline haya fallado
+    while not cancelado.is_set():
+        try:
+            cola.put(elemento, timeout=0.5)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def tomar_de_cola(cola, cancelado):
+    # Devuelve FIN_COLA si otra etapa del pipeline ha fallado
+    while not cancelado.is_set():
+        try:
+            return cola.get(timeout=0.5)
+        except queue.Empty:
+            pass
+    return FIN_COLA
+
+def obtener_lotes_streaming(lotes, pipeline):
+    # Etapa de obtención: al terminar (o fallar) se marca el fin de la cola de lotes
+    objetivo = objetivo_actual()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(AZURE_MAX_WORKERS, len(lotes)))) as executor:
+            futuros = [executor.submit(en_objetivo, objetivo, obtener_lote_streaming, lote, pipeline) for lote in lotes]
+            for futuro in futuros:
+                futuro.result()
+    except BaseException:
+        pipeline['cancelado'].set()
+        raise
+    finally:
+        poner_en_cola(pipeline['cola_lotes'], FIN_COLA, pipeline['cancelado'])
+
+def obtener_lote_streaming(lote, pipeline):
+    inicio = time.monotonic()
+    tasks, llamadas = obtener_lote_work_items(lote)
+    # Solo se mide la descarga, no la espera por la cola llena
+    registrar_tiempo_fase('azure_detalle', time.monotonic() - inicio)
+    with pipeline['bloqueo']:
+        pipeline['llamadas_azure'] += llamadas
+    poner_en_cola(pipeline['cola_lotes'], tasks, pipeline['cancelado'])
+
+def planificar_lotes_streaming(pipeline):
+    # Etapa de organización y planificación, en el hilo del objetivo
+    while True:
+        tasks = tomar_de_cola(pipeline['cola_lotes'], pipeline['cancelado'])
+        if tasks is FIN_COLA:
+            break
+        for accion in planificar_lote_streaming(tasks, pipeline):
+            encolar_accion_streaming(accion, pipeline)
+    if pipeline['cancelado'].is_set():
+        return
+    # Subtareas cuya HU no se ha podido obtener de Azure: se tratan como las de un padre fake
+    for accion in planificar_hijos_en_espera(pipeline):
+        encolar_accion_streaming(accion, pipeline)
+
+@medir_fase('planificacion')
+def planificar_lote_streaming(tasks, pipeline):
+    """
+    Organiza un lote de work items, carga sus issues de Redmine y planifica las HUs y las subtareas que ya tienen
+    su HU planificada. Las acciones se devuelven para encolarlas fuera de la medición de la fase.
+    """
+    historias = []
+    hijos = []
+    for item in tasks:
+        task_info = {'id': item.id, 'type': item.tipo, 'data': item, 'children': []}
+        if item.tipo in ['User Story', 'Feature']:
+            historias.append(task_info)
+        elif item.padre:
+            hijos.append(task_info)
+
+    # Issues de Redmine de las tareas con cambios y de las HUs de sus subtareas que no se van a obtener de Azure
+    con_cambios = [task_info for task_info in historias + hijos if not work_item_sin_cambios(task_info)]
+    cargar_descripciones([task_info['data'] for task_info in con_cambios])
+    ids_pendientes = [task_info['id'] for task_info in con_cambios]
+    ids_pendientes.extend({task_info['data'].padre for task_info in hijos
+                           if task_info['data'].padre not in pipeline['ids'] and not work_item_sin_cambios(task_info)})
+    if ids_pendientes:
+        cargar_issues_Redmine(ids_pendientes)
+
+    acciones = []
+    for US_info in historias:
+        accion_padre = planificar_tarea(US_info['id'], US_info)
+        pipeline['acciones_padre'][US_info['id']] = accion_padre
+        acciones.append(accion_padre)
+        for child_info in pipeline['hijos_en_espera'].pop(US_info['id'], []):
+            acciones.extend(planificar_hijo_streaming(child_info, US_info['id'], pipeline))
+    for child_info in hijos:
+        padre_azure_id = child_info['data'].padre
+        if padre_azure_id in pipeline['ids'] and padre_azure_id not in pipeline['acciones_padre']:
+            pipeline['hijos_en_espera'].setdefault(padre_azure_id, []).append(child_info)
+        else:
+            acciones.extend(planificar_hijo_streaming(child_info, padre_azure_id, pipeline))
+    return acciones
+
+@medir_fase('planificacion')
+def planificar_hijos_en_espera(pipeline):
+    ids_padres = list(pipeline['hijos_en_espera'])
+    if ids_padres:
+        cargar_issues_Redmine(ids_padres)
+    acciones = []
+    for padre_azure_id in ids_padres:
+        for child_info in pipeline['hijos_en_espera'].pop(padre_azure_id):
+            acciones.extend(planificar_hijo_streaming(child_info, padre_azure_id, pipeline))
+    return acciones
+
+def planificar_hijo_streaming(child_info, padre_azure_id, pipeline):
+    """
+    Planifica una subtarea con el ID de Redmine de su HU, como en planificar_work_items.
+
+    Returns:
+        list: La acción de la subtarea, o ninguna si su HU tiene errores o no existe en Redmine.
+    """
+    accion_padre = pipeline['acciones_padre'].get(padre_azure_id)
+    if accion_padre is not None:
+        if accion_padre['accion'] == 'error':
+            return []
+        parent_issue_id = accion_padre['redmine_id']
+    else:
+        if padre_azure_id not in pipeline['padres_sin_datos']:
+            pipeline['padres_sin_datos'][padre_azure_id] = resolver_padre_sin_datos(padre_azure_id)
+        parent_issue_id = pipeline['padres_sin_datos'][padre_azure_id]
+        if not parent_issue_id:
+            return []
+    child_info['parent_id'] = parent_issue_id  # ID de Redmine de la HU, None si se va a crear
+    return [planificar_tarea(child_info['id'], child_info, padre_azure_id=padre_azure_id)]
+
+def encolar_accion_streaming(accion, pipeline):
+    if modo_plan:
+        objetivo_actual()['plan'].append(accion)
+        return
+    tarea = accion.get('tarea')
+    if accion['padre_azure_id'] is not None and tarea is not None and tarea['parentid'] is None:
+        # La HU se está creando: la subtarea se aplica cuando se conozca su ID de Redmine
+        with pipeline['bloqueo']:
+            if accion['padre_azure_id'] not in pipeline['padres_creados']:
+                pipeline['hijos_por_crear'].setdefault(accion['padre_azure_id'], []).append(accion)
+                return
+            tarea['parentid'] = pipeline['padres_creados'][accion['padre_azure_id']]
+        if tarea['parentid'] is None:
+            omitir_accion_sin_padre(accion, pipeline['progreso'])
+            return
+    poner_en_cola(pipeline['cola_acciones'], accion, pipeline['cancelado'])
+
+def aplicar_acciones_streaming(pipeline):
+    # Etapa de aplicación: cada hilo aplica acciones hasta recibir el fin de la cola
+    try:
+        while True:
+            accion = tomar_de_cola(pipeline['cola_acciones'], pipeline['cancelado'])
+            if accion is FIN_COLA:
+                break
+            aplicar_accion_streaming(accion, pipeline)
+    except BaseException:
+        pipeline['cancelado'].set()
+        raise
+
+@medir_fase('aplicacion')
+def aplicar_accion_streaming(accion, pipeline):
+    redmine_id = aplicar_accion(accion, pipeline['progreso'])
+    if accion['padre_azure_id'] is not None or accion['accion'] != 'crear':
+        return
+    with pipeline['bloqueo']:
+        pipeline['padres_creados'][accion['azure_id']] = redmine_id
+        acciones_hijo = pipeline['hijos_por_crear'].pop(accion['azure_id'], [])
+    for accion_hijo in acciones_hijo:
+        accion_hijo['tarea']['parentid'] = redmine_id
+        if redmine_id is None:
+            omitir_accion_sin_padre(accion_hijo, pipeline['progreso'])
+        else:
+            aplicar_accion(accion_hijo, pipeline['progreso'])
 
-            print(f"Buscando en Redmine si existe la tarea {texto_tarea_a_registrar}...")
-            logger.info(f"Buscando en Redmine si existe la tarea {texto_tarea_a_registrar}...")
-            
-            redmine_task = buscar_issue_por_campo_personalizado(task_azure_id)
-            if redmine_task is None:
-                return crear_nueva_tarea_redmine(new_redmine_task, texto_tarea_a_registrar)
-            else:
-                return actualizar_tarea_existente_redmine(redmine_task, new_redmine_task, texto_tarea_a_registrar)
+#endregion Sincronización en streaming
 
-#endregion Procesamiento de tareas de Azure y Redmine
-            
 #region Consulta de tareas de Redmine
 
 def buscar_issue_por_campo_personalizado(taskid):
     try:
-        logger.info(f"Buscando issue en Redmine por el campo personalizado 'Iber_IdCliente' con valor {taskid}...")
+        logger.debug(f"Buscando issue en Redmine por el campo personalizado 'Iber_IdCliente' con valor {taskid}...")
         # Buscar en el diccionario global por la clave 'taskid'
         issues_encontradas = issues_por_campo_personalizado.get(taskid)
 
@@ -450,14 +2147,12 @@ def buscar_issue_por_campo_personalizado(taskid):
             return None
     except Exception as e:
         error_message = f"Se ha producido un error al buscar la issue por el campo personalizado: {e}"
-        print(error_message)
         logger.error(error_message, exc_info=True)
         sys.exit(1)
 
 def buscar_usuario_redmine(nombre_usuario_azure, user_azure_id, texto_tarea_a_registrar):
     global azure_redmine_user_map
-    print(f"Buscando usuario asignado {nombre_usuario_azure} de la tarea {texto_tarea_a_registrar} de Azure en Redmine ...")
-    logger.info(f"Buscando usuario asignado {nombre_usuario_azure} de la tarea {texto_tarea_a_registrar} de Azure en Redmine ...")
+    logger.debug(f"Buscando usuario asignado {nombre_usuario_azure} de la tarea {texto_tarea_a_registrar} de Azure en Redmine ...")
 
     if nombre_usuario_azure == '':
         # Si el nombre del usuario de Azure está vacío, retorna None o un valor que represente "sin asignar"
@@ -467,56 +2162,76 @@ def buscar_usuario_redmine(nombre_usuario_azure, user_azure_id, texto_tarea_a_re
     if user_azure_id in azure_redmine_user_map:
         return azure_redmine_user_map[user_azure_id]
 
+    # Verificar si se resolvió en una ejecución anterior
+    usuario_guardado = obtener_usuario_guardado(user_azure_id)
+    if usuario_guardado is not None:
+        redmine_id, redmine_nombre = usuario_guardado
+        if redmine_nombre:
+            nombres_usuarios_redmine[redmine_id] = redmine_nombre
+        azure_redmine_user_map[user_azure_id] = redmine_id
+        return redmine_id
+
+    asegurar_miembros_cargados()
     nombre_usuario_azure_normalizado = normalize_name(nombre_usuario_azure)
     partes_nombre_azure = set(nombre_usuario_azure_normalizado.split())
-    for miembro in project_memberships:
-        nombre_miembro_normalizado = normalize_name(miembro.name)
-        # Dividir el nombre del miembro y convertirlo a un conjunto para facilitar la comparación
-        partes_nombre_miembro = set(nombre_miembro_normalizado.split())
-
+    # Solo se comprueban los miembros que comparten alguna palabra con el nombre de Azure, en el orden original
+    candidatos = {}
+    for parte in partes_nombre_azure:
+        for posicion, miembro, partes_nombre_miembro in indice_miembros_por_token.get(parte, []):
+            candidatos[posicion] = (miembro, partes_nombre_miembro)
+
+    redmine_id = ID_USUARIO_REDMINE_POR_DEFECTO
+    for posicion in sorted(candidatos):
+        miembro, partes_nombre_miembro = candidatos[posicion]
         # Comprobar si todas las partes del nombre del miembro están en el nombre de Azure
         if partes_nombre_miembro.issubset(partes_nombre_azure):
-            azure_redmine_user_map[user_azure_id] = miembro.id
-            return miembro.id
+            redmine_id = miembro.id
+            break
 
-    # Si no se encuentra una coincidencia, asignar y retornar el ID de usuario por defecto de Redmine
-    azure_redmine_user_map[user_azure_id] = 2666
-    return 2666  # ID Usuario Redmine por defecto eaymerich
+    # Si no se encuentra una coincidencia, se asigna el ID de usuario por defecto de Redmine
+    azure_redmine_user_map[user_azure_id] = redmine_id
+    # El usuario por defecto no se guarda, para resolverlo de nuevo en cuanto se añada al proyecto de Redmine
+    if redmine_id != ID_USUARIO_REDMINE_POR_DEFECTO:
+        guardar_usuario(user_azure_id, redmine_id, nombres_usuarios_redmine.get(redmine_id))
+    return redmine_id
 
 #endregion Consulta de tareas de Redmine
 
 #region Tratamiento de Tareas Redmine
 
 def crear_nueva_tarea_redmine(new_redmine_task, texto_tarea_a_registrar):
-            global created_issues, failed_tasks
-            print(f"Tarea {texto_tarea_a_registrar} no encontrada en Redmine. Creando...")
-            logger.info(f"Tarea {texto_tarea_a_registrar} no encontrada en Redmine. Creando...")
+            logger.debug(f"Tarea {texto_tarea_a_registrar} no encontrada en Redmine. Creando...")
+
+            if not reservar_creacion_issue(new_redmine_task['id']):
+                # Otro hilo (u otro ciclo) ya ha creado o está creando la issue de este work item
+                redmine_task = buscar_issue_por_campo_personalizado(new_redmine_task['id'])
+                id_redmine = redmine_task.id if redmine_task else None
+                texto_ya_creada = f"La tarea {texto_tarea_a_registrar} ya se ha creado en Redmine durante esta ejecución (Redmine Id {id_redmine})."
+                logger.debug(texto_ya_creada)
+                return id_redmine
             
             # Lógica para crear una nueva tarea en Redmine
-            success, id_redmine = create_redmine_task(new_redmine_task)
+            try:
+                success, id_redmine = create_redmine_task(new_redmine_task)
+            finally:
+                # Si la creación ha ido bien la issue ya está en el índice
+                liberar_creacion_issue(new_redmine_task['id'])
             if success:
-                print(f"Tarea {texto_tarea_a_registrar} creada en Redmine con ID: {id_redmine}")
-                logger.info(f"Tarea '{new_redmine_task['title']}' creada en Redmine con ID: {id_redmine}")
-                created_issues.append(f"{new_redmine_task['type']}: {id_redmine} - {new_redmine_task['title']}")
-                print(f"--- Final del Procesado de la Tarea {texto_tarea_a_registrar} con Redmine Id {id_redmine} ---")
-                logger.info(f"--- Final del Procesado de la Tarea {texto_tarea_a_registrar} con Redmine Id {id_redmine} ---")
+                logger.debug(f"Tarea '{new_redmine_task['title']}' creada en Redmine con ID: {id_redmine}")
+                registrar_resultado('created_issues', f"{new_redmine_task['type']}: {id_redmine} - {new_redmine_task['title']}")
+                guardar_estado_work_item(new_redmine_task['id'], new_redmine_task['rev'], id_redmine, new_redmine_task['hash_valores'])
+                logger.debug(f"--- Final del Procesado de la Tarea {texto_tarea_a_registrar} con Redmine Id {id_redmine} ---")
                 return id_redmine
             else:
                 error_msg = f"No se ha podido crear la tarea de Redmine con ID {texto_tarea_a_registrar}. Error: {id_redmine}"
-                print(error_msg)
                 logger.error(error_msg)
-                print(f"--- Final del Procesado de la Tarea {texto_tarea_a_registrar} con errores. Error {id_redmine} ---")
-                logger.info(f"--- Final del Procesado de la Tarea {texto_tarea_a_registrar} con errores. Error {id_redmine} ---")
-                failed_tasks.append(f"{new_redmine_task['type']}: {texto_tarea_a_registrar} Error: {id_redmine}")
+                logger.debug(f"--- Final del Procesado de la Tarea {texto_tarea_a_registrar} con errores. Error {id_redmine} ---")
+                registrar_resultado('failed_tasks', f"{new_redmine_task['type']}: {texto_tarea_a_registrar} Error: {id_redmine}")
                 return None   
 
 def create_redmine_task(task):
-    headers = {'X-Redmine-API-Key': REDMINE_TOKEN}
-
-    max_description_length = 65000
-    description = task['description']
-    if len(description) > max_description_length:
-        description = description[:max_description_length]  
+    version_sprint = objetivo_actual()['version']
+    description = preparar_descripcion(task['description'])
     task_data = {
         'issue': {            
             'project_id': PROJECT_ID,
@@ -547,34 +2262,34 @@ def create_redmine_task(task):
         if task['remaininghours'] is not None:         
             task_data['issue']['custom_fields'].append({"id": 36, "name": "Horas restantes", "value": str(int(math.ceil(task['remaininghours'])))})
              
-    response = requests.post(REDMINE_URL+'issues.json', json=task_data, headers=headers)
+    response = peticion_http('POST', REDMINE_URL+'issues.json', json=task_data)
     if response.status_code == 201:
-        issue_id = response.json().get('issue', {}).get('id')
+        issue = response.json().get('issue', {})
+        issue_id = issue.get('id')
+        registrar_issue_en_indice(task['id'], crear_registro_issue(issue))
         return (True, issue_id)  # Retorna True i l'ID de la issue creada
     else:
         error_message = f"Error {response.status_code}: {response.text}"
         return (False, error_message)  # Retorna False i el missatge d'error
 
-def actualizar_tarea_existente_redmine(redmine_task_found,new_redmine_task, texto_tarea_a_registrar):
-    global modified_tasks, none_modified_tasks      
-    redmine_task_id = redmine_task_found['id']
+def actualizar_tarea_existente_redmine(accion):
+    new_redmine_task = accion['tarea']
+    texto_tarea_a_registrar = accion['texto']
+    cambios_necesarios = accion['cambios']
+    redmine_task_id = accion['redmine_id']
+    redmine_task_found = buscar_issue_por_campo_personalizado(accion['azure_id']) or IssueRedmine(id=redmine_task_id)
     typeTask = 'Tarea'
 
-    redmine_task = redmine.issue.get(redmine_task_id)
-    cambios_necesarios = necesita_actualizacion(new_redmine_task, redmine_task)
-    if new_redmine_task['parentid'] is None and not cambios_necesarios:
-        typeTask = 'HU'
     texto_tarea_encontrada = f"{typeTask}  {texto_tarea_a_registrar} encontrada en Redmine con Id {redmine_task_id}. Procesando..."
-    print(texto_tarea_encontrada)
-    logger.info(texto_tarea_encontrada)       
+    logger.debug(texto_tarea_encontrada)
     
     if cambios_necesarios:
-        if actualizar_tarea_redmine(redmine_task, cambios_necesarios):
+        if actualizar_tarea_redmine(redmine_task_found, cambios_necesarios):
             cambios_realizados = ", ".join([
                 f"{campo}: {next((nombre_estado for nombre_estado, id_estado in mapeo_estados.items() if id_estado == valor), valor)}" if campo == 'estado'
-                else f"{campo}: {next((user.name for user in project_memberships if user.id == valor), valor)}" if campo == 'assigned_to_id'
+                else f"{campo}: {nombres_usuarios_redmine.get(valor, valor)}" if campo == 'assigned_to_id'
                 else f"{campo}: {valor}"
-                for campo, valor in cambios_necesarios.items()
+                for campo, valor in resumir_cambios(cambios_necesarios).items()
             ])
             mensaje_modificacion = f"{new_redmine_task['type']}: {redmine_task_id} - {new_redmine_task['title']} (Cambios: {cambios_realizados})"
 
@@ -582,22 +2297,27 @@ def actualizar_tarea_existente_redmine(redmine_task_found,new_redmine_task, text
             #mensaje_modificacion = f"{new_redmine_task['type']}: {redmine_task_id} - {new_redmine_task['title']} (Cambios: {cambios_realizados})"
 
             texto_cambios_realizados = f"{typeTask} {texto_tarea_a_registrar} actualizada en Redmine con Id {redmine_task_id}. Cambios: {cambios_realizados}"
-            print(texto_cambios_realizados)
-            logger.info(texto_cambios_realizados)
-            modified_tasks.append(mensaje_modificacion)
+            logger.debug(texto_cambios_realizados)
+            registrar_resultado('modified_tasks', mensaje_modificacion)
+            if 'estado' in cambios_necesarios:
+                guardar_estado_indice(redmine_task_id, cambios_necesarios['estado'])
+            # Con el índice ya actualizado, el siguiente plan no debe encontrar más diferencias
+            cambios_pendientes = necesita_actualizacion(new_redmine_task, redmine_task_found)
+            if cambios_pendientes and actualizar_tarea_redmine(redmine_task_found, cambios_pendientes):
+                if 'estado' in cambios_pendientes:
+                    guardar_estado_indice(redmine_task_id, cambios_pendientes['estado'])
+                cambios_pendientes = necesita_actualizacion(new_redmine_task, redmine_task_found)
+            if cambios_pendientes:
+                # Sin guardar la revisión, la tarea se vuelve a comparar en la siguiente ejecución
+                logger.warning(f"La tarea {texto_tarea_a_registrar} sigue con cambios pendientes tras actualizarla: {cambios_pendientes}")
+            else:
+                guardar_estado_work_item(new_redmine_task['id'], new_redmine_task['rev'], redmine_task_id, new_redmine_task['hash_valores'])
         else:
             texto_error_realizar_cambios = f"No se ha podido actualizar la {typeTask} de Redmine con ID {redmine_task_id}."
-            print(texto_error_realizar_cambios)
             logger.error(texto_error_realizar_cambios)
-            none_modified_tasks.append(f"{new_redmine_task['type']}: {redmine_task_id} - {new_redmine_task['title']}")
-    else:
-        texto_cambios_no_realizados = f"No se requieren actualizaciones para la {typeTask} {texto_tarea_a_registrar} con Redmine Id {redmine_task_id}."
-        print(texto_cambios_no_realizados)
-        logger.info(texto_cambios_no_realizados)
-        none_modified_tasks.append(f"{new_redmine_task['type']}: {redmine_task_id} - {new_redmine_task['title']}")
+            registrar_resultado('none_modified_tasks', f"{new_redmine_task['type']}: {redmine_task_id} - {new_redmine_task['title']}")
 
-    print(f"--- Final del Procesado de la {typeTask} {texto_tarea_a_registrar} con Redmine Id {redmine_task_id} ---")
-    logger.info(f"--- Final del Procesado de la {typeTask} {texto_tarea_a_registrar} con Redmine Id {redmine_task_id} ---")
+    logger.debug(f"--- Final del Procesado de la {typeTask} {texto_tarea_a_registrar} con Redmine Id {redmine_task_id} ---")
     return redmine_task_id
 
 def calcular_porcentaje_realizado(horas_restantes, horas_totales_estimadas):
@@ -607,105 +2327,424 @@ def calcular_porcentaje_realizado(horas_restantes, horas_totales_estimadas):
     porcentaje_realizado = (horas_realizadas / horas_totales_estimadas) * 100
     return max(0, min(100, round(porcentaje_realizado)))
 
+def buscar_campo_personalizado(redmine_task, id_campo):
+    # Valor del campo personalizado, o None si la issue no lo tiene
+    return redmine_task.campos_personalizados.get(int(id_campo))
+
 def necesita_actualizacion(task_azure, redmine_task):
+    """
+    Calcula los cambios que hay que aplicar a una issue de Redmine a partir de la tarea de Azure.
+
+    Args:
+        task_azure (dict): La tarea de Azure con los valores a sincronizar.
+        redmine_task (IssueRedmine): La issue de Redmine del índice.
+
+    Returns:
+        dict: Los cambios necesarios, vacío si la issue ya está al día.
+    """
     cambios = {}    
     
-    if task_azure['parentid'] is None:
+    if task_azure['parentid'] is None and task_azure.get('padre_azure_id') is None:
         #Campos a actualizar cuando es una HU padre
-        campos_a_actualizar = ['estado', 'azure_id', 'version_sprint_id']
+        campos_a_actualizar = ['estado', 'azure_id', 'version_sprint_id', 'descripcion']
     else:        
-        campos_a_actualizar = ['estado', 'azure_id', 'version_sprint_id','horas_restantes', 'porcentaje_realizado', 'assigned_to_id', 'estimated_hours']
+        campos_a_actualizar = ['estado', 'azure_id', 'version_sprint_id','horas_restantes', 'porcentaje_realizado', 'assigned_to_id', 'estimated_hours', 'descripcion']
     
     if 'estado' in campos_a_actualizar:
         estado_redmine = mapeo_estados.get(task_azure['state'])
-        if estado_redmine and redmine_task.status.id != estado_redmine:
+        if estado_redmine and redmine_task.estado_id != estado_redmine:
             cambios['estado'] = estado_redmine
 
     if 'azure_id' in campos_a_actualizar:
-        if str(task_azure['id']) != redmine_task.custom_fields.get(int(ID_CAMPO_IBER_IDCLIENTE)).value:
+        campo_azure_id = buscar_campo_personalizado(redmine_task, ID_CAMPO_IBER_IDCLIENTE)
+        if campo_azure_id is None or str(task_azure['id']) != campo_azure_id:
             cambios['azure_id'] = str(task_azure['id'])
 
     if 'version_sprint_id' in campos_a_actualizar:
-        fixed_version_actual = getattr(redmine_task.fixed_version, 'id', None) if hasattr(redmine_task, 'fixed_version') else None
-        if fixed_version_actual != version_sprint.id:
+        version_sprint = objetivo_actual()['version']
+        if redmine_task.version_id != version_sprint.id:
             cambios['version_sprint_id'] = version_sprint.id
 
     if 'horas_restantes' in campos_a_actualizar and task_azure['remaininghours'] is not None:
         horas_restantes_redmine = str(int(math.ceil(task_azure['remaininghours'])))
-        campo_horas_restantes = redmine_task.custom_fields.get(int(ID_CAMPO_HORAS_RESTANTES))
-        if campo_horas_restantes is not None and campo_horas_restantes.value != horas_restantes_redmine:
+        campo_horas_restantes = buscar_campo_personalizado(redmine_task, ID_CAMPO_HORAS_RESTANTES)
+        if campo_horas_restantes is not None and campo_horas_restantes != horas_restantes_redmine:
             cambios['horas_restantes'] = horas_restantes_redmine
 
+    if 'estimated_hours' in campos_a_actualizar:
+        estimated_hours_redmine = redmine_task.horas_estimadas or 0
+        if task_azure['estimatedhours'] and estimated_hours_redmine != task_azure['estimatedhours']:
+            cambios['estimated_hours'] = task_azure['estimatedhours']
+
     if 'porcentaje_realizado' in campos_a_actualizar and task_azure['remaininghours'] is not None:
-        horas_totales_estimadas = getattr(redmine_task, 'estimated_hours', 0)
+        # Si la estimación cambia en el mismo PUT, el porcentaje se calcula con la nueva
+        horas_totales_estimadas = cambios.get('estimated_hours', redmine_task.horas_estimadas or 0)
         porcentaje_realizado = calcular_porcentaje_realizado(int(horas_restantes_redmine), horas_totales_estimadas)
-        if porcentaje_realizado != redmine_task.done_ratio:
+        if porcentaje_realizado != redmine_task.porcentaje_realizado:
             cambios['porcentaje_realizado'] = porcentaje_realizado
 
     if 'assigned_to_id' in campos_a_actualizar:
-        assigned_to_id_redmine = getattr(redmine_task.assigned_to, 'id', None) if hasattr(redmine_task, 'assigned_to') else None
-        if task_azure['assigned_to_id'] and assigned_to_id_redmine != task_azure['assigned_to_id']:
+        if task_azure['assigned_to_id'] and redmine_task.asignado_id != task_azure['assigned_to_id']:
             cambios['assigned_to_id'] = task_azure['assigned_to_id']
-    
-    if 'estimated_hours' in campos_a_actualizar:
-        estimated_hours_redmine = getattr(redmine_task, 'estimated_hours', 0)
-        if task_azure['estimatedhours'] and estimated_hours_redmine != task_azure['estimatedhours']:
-            cambios['estimated_hours'] = task_azure['estimatedhours']
+
+    # Solo se compara si se conocen las dos descripciones
+    if 'descripcion' in campos_a_actualizar and task_azure['description'] is not None and redmine_task.hash_descripcion is not None:
+        if calcular_hash_descripcion(task_azure['description']) != redmine_task.hash_descripcion:
+            cambios['descripcion'] = preparar_descripcion(task_azure['description'])
 
     return cambios
 
-def actualizar_tarea_redmine(redmine_task, cambios):
-    try:
-        tarea = redmine.issue.get(redmine_task['id'])
-        actualizacion_realizada = False
+def construir_actualizacion_issue(cambios):
+    """
+    Construye el cuerpo de un único PUT /issues/{id}.json con todos los campos que han cambiado.
+    Los campos personalizados se acumulan en una sola lista para que ninguno se pierda.
 
-        if 'estado' in cambios:
-            tarea.status_id = cambios['estado']
-            actualizacion_realizada = True
+    Args:
+        cambios (dict): Los cambios calculados por necesita_actualizacion.
 
-        if 'horas_restantes' in cambios:
-            tarea.custom_fields = [{'id': ID_CAMPO_HORAS_RESTANTES, 'value': cambios['horas_restantes']}]
-            actualizacion_realizada = True
+    Returns:
+        dict: El cuerpo de la petición, o None si no hay nada que enviar.
+    """
+    issue = {}
+    custom_fields = []
 
-        if 'porcentaje_realizado' in cambios:
-            tarea.done_ratio = cambios['porcentaje_realizado']
-            actualizacion_realizada = True        
+    if 'estado' in cambios:
+        issue['status_id'] = cambios['estado']
 
-        if 'assigned_to_id' in cambios:
-            if cambios['assigned_to_id'] is None:
-                tarea.assigned_to_id = '' 
-            else:
-                tarea.assigned_to_id = cambios['assigned_to_id']
-            actualizacion_realizada = True
-
-        if 'azure_id' in cambios:
-            tarea.custom_fields = [{'id': ID_CAMPO_IBER_IDCLIENTE, 'value': cambios['azure_id']}]
-            actualizacion_realizada = True
-
-        if 'version_sprint_id' in cambios:
-            tarea.fixed_version_id = version_sprint.id
-            tarea.custom_fields = [{'id': 34, 'value': version_sprint.name}]
-            actualizacion_realizada = True
-
-        if 'estimated_hours' in cambios:
-            tarea.estimated_hours = cambios['estimated_hours']
-            actualizacion_realizada = True 
-
-        if actualizacion_realizada:
-            tarea.save()
-            print(f"La tarea {tarea.id} - {tarea.subject} se ha actualizado correctamente en Redmine.")
-            logger.info(f"La tarea {tarea.id} - {tarea.subject} se ha actualizado correctamente en Redmine.")
-            return True
-        else:
-            print(f"La tarea {tarea.id} - {tarea.subject} ya está actualizada en Redmine.")
-            logger.info(f"La tarea {tarea.id} - {tarea.subject} ya está actualizada en Redmine.")
+    if 'horas_restantes' in cambios:
+        custom_fields.append({'id': int(ID_CAMPO_HORAS_RESTANTES), 'value': cambios['horas_restantes']})
+
+    if 'porcentaje_realizado' in cambios:
+        issue['done_ratio'] = cambios['porcentaje_realizado']
+
+    if 'assigned_to_id' in cambios:
+        issue['assigned_to_id'] = '' if cambios['assigned_to_id'] is None else cambios['assigned_to_id']
+
+    if 'azure_id' in cambios:
+        custom_fields.append({'id': int(ID_CAMPO_IBER_IDCLIENTE), 'value': cambios['azure_id']})
+
+    if 'version_sprint_id' in cambios:
+        version_sprint = objetivo_actual()['version']
+        issue['fixed_version_id'] = version_sprint.id
+        custom_fields.append({'id': ID_CAMPO_VERSION_SOLICITADA, 'value': version_sprint.name})
+
+    if 'estimated_hours' in cambios:
+        issue['estimated_hours'] = cambios['estimated_hours']
+
+    if 'descripcion' in cambios:
+        issue['description'] = cambios['descripcion']
+
+    if custom_fields:
+        issue['custom_fields'] = custom_fields
+    return {'issue': issue} if issue else None
+
+def actualizar_tarea_redmine(redmine_task, cambios):
+    texto_tarea = f"{redmine_task.id}"
+    datos_actualizacion = construir_actualizacion_issue(cambios)
+    if datos_actualizacion is None:
+        logger.debug(f"La tarea {texto_tarea} ya está actualizada en Redmine.")
+        return False
+    try:
+        response = peticion_http('PUT', f"{REDMINE_URL}issues/{redmine_task.id}.json", json=datos_actualizacion)
+        if response.status_code not in (200, 204):
+            error_message = f"Error al actualizar la tarea en Redmine {texto_tarea}. Error {response.status_code}: {response.text}"
+            logger.error(error_message)
             return False
-    except Exception as e:
-        error_message = f"Error al actualizar la tarea en Redmine {tarea.id} - {tarea.subject}. Error: {e}"
-        print(error_message)
+        aplicar_cambios_en_indice(redmine_task, cambios)
+        logger.debug(f"La tarea {texto_tarea} se ha actualizado correctamente en Redmine.")
+        return True
+    except requests.RequestException as e:
+        error_message = f"Error al actualizar la tarea en Redmine {texto_tarea}. Error: {e}"
         logger.error(error_message, exc_info=True)
         return False
 
+#endregion Tratamiento de Tareas Redmine
+
+#region Sincronización Redmine > Azure
+
+def obtener_estado_azure(estado_id):
+    # Inverso de mapeo_estados: estado de Azure que corresponde a un estado de Redmine
+    return next((estado_azure for estado_azure, id_estado in mapeo_estados.items() if id_estado == estado_id), None)
+
+@medir_fase('azure_escritura')
+def sincronizar_estados_redmine_a_azure():
+    """
+    Envía a Azure DevOps los cambios de estado hechos en Redmine.
+
+    Los cambios se detectan al actualizar el índice de issues con las modificadas desde la ejecución anterior
+    ('updated_on') y quedan guardados en SYNC_STATE_FILE hasta que Azure los acepta o los rechaza. Se envían como
+    JSON Patch agrupados en llamadas a _apis/wit/$batch. Cada patch comprueba ('test') que Azure sigue en el estado
+    anterior al cambio: si el estado también ha cambiado en Azure, prevalece Azure y la sincronización Azure > Redmine
+    lo lleva a Redmine.
+    """
+    asegurar_indice_issues_al_dia()
+    cambios = []
+    descartados = []
+    for cambio in obtener_cambios_estado_redmine():
+        cambio['estado_azure_anterior'] = obtener_estado_azure(cambio['estado_anterior'])
+        cambio['estado_azure'] = obtener_estado_azure(cambio['estado_id'])
+        # La issue ha vuelto a su estado anterior o el estado no tiene equivalente en Azure
+        if cambio['estado_azure'] is None or cambio['estado_azure'] == cambio['estado_azure_anterior']:
+            descartados.append(cambio['redmine_id'])
+        else:
+            cambios.append(cambio)
+    borrar_cambios_estado_redmine(descartados)
+    if not cambios:
+        return
+
+    logger.info(f"Enviando a Azure DevOps {len(cambios)} cambios de estado hechos en Redmine...", extra=EVENTO_PROGRESO)
+    lotes = [cambios[inicio:inicio + TAMANO_LOTE_BATCH_AZURE] for inicio in range(0, len(cambios), TAMANO_LOTE_BATCH_AZURE)]
+    codigos = [codigo for codigos_lote in ejecutar_en_paralelo(enviar_lote_estados_azure, lotes, AZURE_MAX_WORKERS) for codigo in codigos_lote]
+
+    enviados = [cambio for cambio, codigo in zip(cambios, codigos) if codigo == 200]
+    # Los rechazos de Azure (4xx, por ejemplo porque el estado también ha cambiado allí) son definitivos; el resto se reintenta
+    rechazados = [cambio for cambio, codigo in zip(cambios, codigos) if codigo is not None and 400 <= codigo < 500]
+    if rechazados:
+        # Un cambio que se aplicó en un envío anterior sin respuesta falla el 'test' al repetirlo: si Azure ya tiene el estado, está enviado
+        estados_actuales = obtener_estados_work_items_azure([cambio['azure_id'] for cambio in rechazados])
+        enviados.extend(cambio for cambio in rechazados if estados_actuales.get(cambio['azure_id']) == cambio['estado_azure'])
+        rechazados = [cambio for cambio in rechazados if estados_actuales.get(cambio['azure_id']) != cambio['estado_azure']]
+    for cambio in rechazados:
+        logger.warning(f"Azure DevOps ha rechazado el estado '{cambio['estado_azure']}' de la tarea {cambio['azure_id']} (Redmine Id {cambio['redmine_id']}), "
+                       f"que ya no está en '{cambio['estado_azure_anterior']}'. Prevalece el estado de Azure.")
+    for cambio in enviados:
+        registrar_evento(f"Estado '{cambio['estado_azure']}' de la issue {cambio['redmine_id']} enviado a la tarea {cambio['azure_id']} de Azure DevOps.",
+                         fase='azure_escritura', azure_id=cambio['azure_id'], redmine_id=cambio['redmine_id'], accion='actualizar_azure')
+    borrar_cambios_estado_redmine([cambio['redmine_id'] for cambio in enviados + rechazados])
+    pendientes = len(cambios) - len(enviados) - len(rechazados)
+    logger.info(f"Enviados a Azure DevOps {len(enviados)} cambios de estado en {len(lotes)} llamadas ({len(rechazados)} rechazados, {pendientes} pendientes).", extra=EVENTO_PROGRESO)
+
+def obtener_estados_work_items_azure(azure_ids):
+    # ID de Azure -> estado actual del work item en Azure DevOps
+    lotes = [azure_ids[inicio:inicio + TAMANO_LOTE_AZURE] for inicio in range(0, len(azure_ids), TAMANO_LOTE_AZURE)]
+    return {work_item.id: work_item.estado for tasks, _ in ejecutar_en_paralelo(obtener_lote_work_items, lotes, AZURE_MAX_WORKERS) for work_item in tasks}
+
+def construir_patch_estado(cambio):
+    operaciones = [{'op': 'add', 'path': '/fields/System.State', 'value': cambio['estado_azure']}]
+    # Sin estado anterior conocido no se puede comprobar si Azure ha cambiado mientras tanto
+    if cambio['estado_azure_anterior'] is not None:
+        operaciones.insert(0, {'op': 'test', 'path': '/fields/System.State', 'value': cambio['estado_azure_anterior']})
+    return operaciones
+
+def enviar_lote_estados_azure(lote):
+    """
+    Envía un lote de cambios de estado en una sola llamada a _apis/wit/$batch.
+
+    Returns:
+        list: El código HTTP de cada cambio del lote, o None si la llamada ha fallado.
+    """
+    # $batch es un recurso de la organización, no del proyecto
+    url_batch = f"{AZURE_DEVOPS_PROJECT_BASE.rstrip('/').rsplit('/', 1)[0]}/_apis/wit/$batch?api-version=6.0"
+    peticiones = [
+        {
+            'method': 'PATCH',
+            'uri': f"/_apis/wit/workitems/{cambio['azure_id']}?api-version=6.0",
+            'headers': {'Content-Type': 'application/json-patch+json'},
+            'body': construir_patch_estado(cambio)
+        }
+        for cambio in lote
+    ]
+    response = peticion_azure('POST', url_batch, idempotente=False, json=peticiones)
+    if response is None or response.status_code != 200:
+        codigo = response.status_code if response is not None else 'sin conexión'
+        logger.error(f"Error al enviar los cambios de estado a Azure DevOps: {codigo}")
+        return [None] * len(lote)
+    respuestas = response.json().get('value', [])
+    return [respuesta.get('code') for respuesta in respuestas] + [None] * (len(lote) - len(respuestas))
+
+#endregion Sincronización Redmine > Azure
+
+#region Imputación de horas
+
+@medir_fase('imputaciones')
+def sincronizar_imputaciones(candidatas):
+    """
+    Imputa en Redmine las horas completadas en Azure DevOps ('Completed Work') de las tareas aplicadas.
+
+    Solo se consultan las revisiones de las tareas cuyas horas completadas han cambiado desde la última imputación.
+    Cada aumento de las horas en una revisión es una entrada de tiempo del usuario que hizo el cambio, en la fecha
+    del cambio. Su clave (ID de Azure:revisión) se guarda en SYNC_STATE_FILE al crearla y va en el comentario de
+    la entrada. Las claves que no están en SYNC_STATE_FILE (base de datos nueva o perdida) se buscan en las entradas
+    de tiempo de la issue en Redmine antes de crearlas, de modo que volver a procesar las mismas revisiones no
+    duplica entradas. Las entradas se agrupan por usuario y cada grupo se envía con el cliente de Redmine de su
+    API key; los grupos se envían en paralelo (REDMINE_MAX_ESCRITURAS).
+
+    Args:
+        candidatas (list): Tuplas (ID de Azure, ID de Redmine, horas completadas) de las tareas aplicadas.
+    """
+    horas_imputadas = obtener_horas_imputadas([azure_id for azure_id, _, _ in candidatas])
+    pendientes = [candidata for candidata in candidatas if candidata[2] != horas_imputadas.get(candidata[0])]
+    if not pendientes:
+        return
+    entradas_por_tarea = ejecutar_en_paralelo(obtener_entradas_tiempo, pendientes, AZURE_MAX_WORKERS)
+    entradas = [entrada for entradas_tarea in entradas_por_tarea if entradas_tarea for entrada in entradas_tarea]
+    claves_imputadas = obtener_claves_imputadas([entrada['clave'] for entrada in entradas])
+    nuevas = [entrada for entrada in entradas if entrada['clave'] not in claves_imputadas]
+    redmine_ids = sorted({entrada['redmine_id'] for entrada in nuevas})
+    imputaciones_redmine = dict(zip(redmine_ids, ejecutar_en_paralelo(obtener_imputaciones_redmine, redmine_ids, REDMINE_MAX_WORKERS)))
+
+    entradas_por_usuario = {}
+    claves_sin_comprobar = set()
+    for entrada in nuevas:
+        imputadas_issue = imputaciones_redmine[entrada['redmine_id']]
+        if imputadas_issue is None:
+            # Si no se ha podido comprobar en Redmine no se crea, para no duplicarla
+            claves_sin_comprobar.add(entrada['clave'])
+        elif entrada['clave'] in imputadas_issue:
+            guardar_imputacion(entrada, imputadas_issue[entrada['clave']])
+            claves_imputadas.add(entrada['clave'])
+        else:
+            entradas_por_usuario.setdefault(entrada['usuario'], []).append(entrada)
+    claves_fallidas = set().union(*ejecutar_en_paralelo(imputar_entradas_usuario, list(entradas_por_usuario.values()), REDMINE_MAX_ESCRITURAS))
+    creadas = sum(len(entradas_usuario) for entradas_usuario in entradas_por_usuario.values()) - len(claves_fallidas)
+    claves_fallidas |= claves_sin_comprobar
+
+    # Las tareas con alguna entrada pendiente se vuelven a revisar en la siguiente ejecución
+    tareas_con_fallos = {entrada['azure_id'] for entrada in entradas if entrada['clave'] in claves_fallidas}
+    guardar_horas_imputadas([
+        (azure_id, horas_completadas) for (azure_id, _, horas_completadas), entradas_tarea in zip(pendientes, entradas_por_tarea)
+        if entradas_tarea is not None and azure_id not in tareas_con_fallos
+    ])
+    mensaje = (f"Imputadas {creadas} entradas de tiempo de {len(pendientes)} tareas de {objetivo_actual()['nombre']} "
+               f"({len(entradas_por_usuario)} usuarios, {len(claves_imputadas)} ya imputadas, {len(claves_fallidas)} pendientes).")
+    logger.info(mensaje, extra=EVENTO_PROGRESO)
+
+def obtener_entradas_tiempo(candidata):
+    """
+    Calcula las entradas de tiempo de un work item a partir de sus revisiones.
+
+    Returns:
+        list: Las entradas (diccionarios con la clave, el usuario, la fecha y las horas), o None si no se han
+              podido obtener las revisiones.
+    """
+    azure_id, redmine_id, _ = candidata
+    revisiones = obtener_revisiones_work_item(azure_id)
+    if revisiones is None:
+        return None
+    entradas = []
+    horas_anteriores = 0
+    for revision in sorted(revisiones, key=lambda revision: revision['rev']):
+        campos = revision.get('fields', {})
+        horas = campos.get('Microsoft.VSTS.Scheduling.CompletedWork') or 0
+        incremento = round(horas - horas_anteriores, 2)
+        horas_anteriores = horas
+        # Las reducciones de horas no se descuentan de las entradas ya imputadas
+        if incremento <= 0:
+            continue
+        entradas.append({
+            'clave': f"{azure_id}:{revision['rev']}",
+            'azure_id': azure_id,
+            'azure_rev': revision['rev'],
+            'redmine_id': redmine_id,
+            'usuario': obtener_usuario_revision(campos.get('System.ChangedBy')),
+            'fecha': obtener_fecha_local(campos.get('System.ChangedDate')),
+            'horas': incremento
+        })
+    return entradas
+
+def obtener_revisiones_work_item(azure_id):
+    revisiones = []
+    while True:
+        url = f"{AZURE_DEVOPS_PROJECT_BASE}_apis/wit/workitems/{azure_id}/revisions?api-version=6.0&$top=200&$skip={len(revisiones)}"
+        response = peticion_azure('GET', url)
+        if response is None or response.status_code != 200:
+            codigo = response.status_code if response is not None else 'sin conexión'
+            logger.error(f"Error al obtener las revisiones de la tarea {azure_id} de Azure DevOps: {codigo}")
+            return None
+        valores = response.json().get('value', [])
+        revisiones.extend(valores)
+        if len(valores) < 200:
+            return revisiones
+
+def obtener_usuario_revision(usuario):
+    # 'System.ChangedBy' es una identidad o, en versiones antiguas de la API, el texto 'Nombre <usuario>'
+    if isinstance(usuario, dict):
+        return (usuario.get('uniqueName') or '').lower()
+    coincidencia = re.search(r'<([^>]+)>', usuario or '')
+    return (coincidencia.group(1) if coincidencia else usuario or '').lower()
+
+def obtener_fecha_local(fecha_utc):
+    if not fecha_utc:
+        return datetime.datetime.now(zona_horaria_local).date().isoformat()
+    return datetime.datetime.fromisoformat(fecha_utc.replace('Z', '+00:00')).astimezone(zona_horaria_local).date().isoformat()
+
+def imputar_entradas_usuario(entradas):
+    """
+    Crea en Redmine las entradas de tiempo de un usuario con su API key.
+
+    Returns:
+        set: Las claves de las entradas que no se han podido crear.
+    """
+    usuario = entradas[0]['usuario']
+    api_key = obtener_api_key_imputacion(usuario)
+    if not api_key:
+        logger.warning(f"No hay API key de Redmine para {usuario or 'el usuario desconocido'} en {IMPUTACIONES_API_KEYS_FILE}. Quedan pendientes {len(entradas)} entradas de tiempo.")
+        return {entrada['clave'] for entrada in entradas}
+    claves_fallidas = set()
+    for entrada in entradas:
+        inicio = time.monotonic()
+        time_entry = anadir_entrada_tiempo(api_key, entrada['redmine_id'], entrada['horas'], ID_ACTIVIDAD_IMPUTACION, entrada['fecha'], comentario_imputacion(entrada))
+        if time_entry is None:
+            claves_fallidas.add(entrada['clave'])
+            continue
+        guardar_imputacion(entrada, time_entry.id)
+        registrar_evento(f"Imputadas {entrada['horas']}h de {usuario} el {entrada['fecha']} en la issue {entrada['redmine_id']}.", fase='imputaciones',
+                         azure_id=entrada['azure_id'], redmine_id=entrada['redmine_id'], accion='imputar', duracion_ms=round((time.monotonic() - inicio) * 1000, 1))
+    return claves_fallidas
+
+def comentario_imputacion(entrada):
+    # Incluye la clave de la entrada, que obtener_imputaciones_redmine vuelve a leer con PATRON_COMENTARIO_IMPUTACION
+    return f"Horas completadas en Azure DevOps (tarea {entrada['azure_id']}, revisión {entrada['azure_rev']})"
+
+def obtener_imputaciones_redmine(redmine_id):
+    """
+    Obtiene de Redmine las entradas de tiempo de una issue creadas por la imputación, por la clave de su comentario.
+
+    Returns:
+        dict: Clave (ID de Azure:revisión) -> ID de la entrada de tiempo, o None si no se han podido consultar.
+    """
+    imputadas = {}
+    offset = 0
+    limit = 100
+    while True:
+        try:
+            response = peticion_http('GET', f"{REDMINE_URL}/time_entries.json", params={'issue_id': redmine_id, 'offset': offset, 'limit': limit})
+            codigo = response.status_code
+        except requests.RequestException as e:
+            response, codigo = None, e
+        if response is None or response.status_code != 200:
+            logger.error(f"Error al consultar las entradas de tiempo de la issue {redmine_id} en Redmine: {codigo}")
+            return None
+        data = response.json()
+        for time_entry in data['time_entries']:
+            coincidencia = PATRON_COMENTARIO_IMPUTACION.search(time_entry.get('comments') or '')
+            if coincidencia:
+                imputadas[f"{coincidencia.group(1)}:{coincidencia.group(2)}"] = time_entry['id']
+        offset += limit
+        if offset >= data.get('total_count', 0):
+            return imputadas
+
+def obtener_api_key_imputacion(usuario):
+    global api_keys_imputacion
+    with bloqueo_clientes_redmine:
+        if api_keys_imputacion is None:
+            try:
+                with open(IMPUTACIONES_API_KEYS_FILE, 'r', encoding='utf-8') as file:
+                    api_keys_imputacion = {unique_name.lower(): api_key for unique_name, api_key in json.load(file).items()}
+            except FileNotFoundError:
+                logger.error(f"No existe {IMPUTACIONES_API_KEYS_FILE} con las API keys de Redmine de los usuarios. No se pueden imputar horas.")
+                api_keys_imputacion = {}
+        return api_keys_imputacion.get(usuario)
+
+def obtener_cliente_redmine_usuario(api_key):
+    # Un cliente por API key para todo el proceso; las peticiones usan las conexiones keep-alive del cliente HTTP compartido
+    with bloqueo_clientes_redmine:
+        cliente = clientes_redmine_usuarios.get(api_key)
+        if cliente is None:
+            cliente = Redmine(REDMINE_URL, key=api_key, engine=MotorRedmineCompartido)
+            clientes_redmine_usuarios[api_key] = cliente
+        return cliente
+
 def anadir_entrada_tiempo(api_key, id_issue, horas, actividad_id, fecha, comentarios=''):
     """
     Añade una nueva entrada de tiempo a una issue en Redmine usando la API key del usuario.
@@ -713,147 +2752,564 @@ def anadir_entrada_tiempo(api_key, id_issue, horas, actividad_id, fecha, comenta
     :param api_key: API key del usuario que añade la entrada de tiempo.
     :param id_issue: ID de la issue a la que se le añadirá el tiempo.
     :param horas: Número de horas trabajadas.
-    :param actividad_id: ID de la actividad (enumeración en Redmine).
+    :param actividad_id: ID de la actividad (enumeración en Redmine). Si es None se usa la actividad por defecto.
     :param fecha: Fecha en la que se gastaron las horas (formato 'YYYY-MM-DD').
     :param comentarios: Comentarios opcionales para la entrada de tiempo.
     """
     try:
-        # Crear una instancia de Redmine usando la API key del usuario
-        redmine_imputacion = Redmine(REDMINE_URL, key=api_key)
+        # Cliente de Redmine del usuario, compartido por todas sus entradas
+        redmine_imputacion = obtener_cliente_redmine_usuario(api_key)
+        campos = {'issue_id': id_issue, 'hours': horas, 'spent_on': fecha, 'comments': comentarios}
+        if actividad_id is not None:
+            campos['activity_id'] = actividad_id
 
         # Crear la entrada de tiempo
-        time_entry = redmine_imputacion.time_entry.create(
-            issue_id=id_issue,
-            hours=horas,
-            activity_id=actividad_id,
-            spent_on=fecha,
-            comments=comentarios
-        )
+        time_entry = redmine_imputacion.time_entry.create(**campos)
         return time_entry
     except Exception as e:
-        print(f"Error al añadir la entrada de tiempo: {e}")
+        logger.error(f"Error al añadir la entrada de tiempo: {e}")
         return None
+
+#endregion Imputación de horas
+
     
-#endregion Tratamiento de Tareas Redmine
-    
+#region Receptor de service hooks de Azure DevOps
+
+class ReceptorHooksAzure(BaseHTTPRequestHandler):
+    """Recibe los service hooks de Azure DevOps y encola los work items para sincronizarlos."""
+
+    def do_POST(self):
+        if not hook_autorizado(self.headers.get('Authorization')):
+            self.responder(401, {'error': 'No autorizado'})
+            return
+        try:
+            longitud = int(self.headers.get('Content-Length') or 0)
+            payload = json.loads(self.rfile.read(longitud) or b'{}')
+        except ValueError:
+            self.responder(400, {'error': 'JSON no válido'})
+            return
+
+        work_item = extraer_work_item_de_hook(payload)
+        if work_item is None:
+            self.responder(202, {'encolado': False})
+            return
+        encolar_work_item_hook(work_item)
+        self.responder(202, {'encolado': True, 'id': work_item.id})
+
+    def responder(self, codigo, cuerpo):
+        contenido = json.dumps(cuerpo).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(contenido)))
+        self.end_headers()
+        self.wfile.write(contenido)
+
+    def log_message(self, format, *args):
+        logger.info(f"Service hook {self.address_string()}: {format % args}")
+
+def hook_autorizado(cabecera_authorization):
+    if not WEBHOOK_SECRETO:
+        return True
+    if not cabecera_authorization or not cabecera_authorization.startswith('Basic '):
+        return False
+    try:
+        credenciales = base64.b64decode(cabecera_authorization[len('Basic '):]).decode('utf-8')
+    except ValueError:
+        return False
+    return credenciales.partition(':')[2] == WEBHOOK_SECRETO
+
+def extraer_work_item_de_hook(payload):
+    """
+    Obtiene el work item de un payload 'workitem.created' o 'workitem.updated' con la misma estructura
+    que la API de work items, para no tener que volver a pedirlo a Azure.
+
+    Returns:
+        WorkItemAzure: El work item, o None si el evento no es de creación/modificación o no es de ningún objetivo sincronizado.
+    """
+    evento = payload.get('eventType')
+    recurso = payload.get('resource') or {}
+    if evento == 'workitem.updated':
+        # En las modificaciones el work item completo viene en 'revision' y 'resource' solo trae los cambios
+        work_item = dict(recurso.get('revision') or {})
+        work_item.setdefault('id', recurso.get('workItemId'))
+    elif evento == 'workitem.created':
+        work_item = dict(recurso)
+    else:
+        return None
+
+    campos = work_item.get('fields')
+    if not work_item.get('id') or not campos:
+        return None
+    work_item.setdefault('rev', campos.get('System.Rev'))
+    asignado = campos.get('System.AssignedTo')
+    if isinstance(asignado, str):
+        # Las versiones antiguas de los hooks envían 'Nombre <usuario@dominio>'
+        nombre, _, unico = asignado.partition('<')
+        campos['System.AssignedTo'] = {'displayName': nombre.strip(), 'uniqueName': unico.rstrip('>').strip()}
+    work_item = crear_registro_work_item(work_item)
+    if buscar_objetivo_de_work_item(work_item) is None:
+        return None
+    return work_item
+
+def encolar_work_item_hook(work_item):
+    global ultimo_hook_recibido
+    with condicion_hooks:
+        anterior = cola_hooks.get(work_item.id)
+        # Varias notificaciones del mismo work item se quedan en la de revisión más alta
+        if anterior is None or (work_item.rev or 0) >= (anterior.rev or 0):
+            cola_hooks[work_item.id] = work_item
+        ultimo_hook_recibido = time.monotonic()
+        condicion_hooks.notify()
+
+def procesar_cola_hooks():
+    """
+    Hilo que espera a que lleguen hooks y, tras WEBHOOK_DEBOUNCE segundos sin recibir más, sincroniza
+    solo los work items encolados.
+    """
+    while not evento_parada.is_set():
+        with condicion_hooks:
+            if not cola_hooks:
+                condicion_hooks.wait(timeout=1)
+                continue
+            espera = ultimo_hook_recibido + WEBHOOK_DEBOUNCE - time.monotonic()
+            if espera > 0:
+                condicion_hooks.wait(timeout=espera)
+                continue
+            work_items = list(cola_hooks.values())
+            cola_hooks.clear()
+
+        mensaje = f"Procesando {len(work_items)} tareas recibidas por service hooks..."
+        logger.info(mensaje, extra=EVENTO_PROGRESO)
+        try:
+            with bloqueo_sincronizacion:
+                reiniciar_resultados_ejecucion()
+                cargar_datos_referencia()
+                for objetivo in objetivos:
+                    objetivo['azure_tasks'] = organize_work_items([work_item for work_item in work_items if work_item_pertenece_al_objetivo(work_item, objetivo)])
+                sincronizar_objetivos()
+                if hay_cambios_en_objetivos():
+                    generar_resumen_html(objetivos, not hay_fallos_en_objetivos())
+        except (Exception, SystemExit) as e:
+            error_message = f"Error al procesar las tareas recibidas por service hooks: {e}"
+            logger.error(error_message, exc_info=True)
+
+def iniciar_receptor_hooks():
+    servidor = ThreadingHTTPServer((WEBHOOK_HOST, webhook_puerto), ReceptorHooksAzure)
+    threading.Thread(target=servidor.serve_forever, name='receptor-hooks', daemon=True).start()
+    threading.Thread(target=procesar_cola_hooks, name='cola-hooks', daemon=True).start()
+    mensaje = f"Receptor de service hooks de Azure DevOps escuchando en http://{WEBHOOK_HOST}:{webhook_puerto}/"
+    logger.info(mensaje, extra=EVENTO_PROGRESO)
+    return servidor
+
+#endregion Receptor de service hooks de Azure DevOps
+
 def main():  
+    inicializar_aplicacion()
+    if modo_webhook:
+        servidor_hooks = iniciar_receptor_hooks()
+        ejecutar_daemon()
+        servidor_hooks.shutdown()
+        # Se espera a que termine la cola de hooks que se estuviera procesando
+        with bloqueo_sincronizacion:
+            pass
+    elif modo_daemon:
+        ejecutar_daemon()
+    elif not ejecutar_ciclo_sincronizacion():
+        sys.exit(1)
+
+def inicializar_aplicacion():
+    crear_objetivos()
+    cargar_ultimo_timestamp()
+    configurar_logging()
+    configurar_clientes_http()
+    abrir_estado_sincronizacion()
+    iniciar_notificaciones()
+
+def ejecutar_daemon():
+    """
+    Mantiene el proceso activo ejecutando un ciclo de sincronización cada 'intervalo_daemon' segundos.
+    Los datos de referencia y el índice de issues de Redmine se reutilizan entre ciclos durante REFERENCIA_TTL segundos.
+    El bucle termina cuando signal_handler recibe SIGINT o SIGTERM.
+    """
+    if intervalo_daemon <= 0:
+        # Solo service hooks, sin polling
+        evento_parada.wait()
+        logger.info('--------------- Final del modo daemon de sincronizacion Azure <> Redmine ---------------', extra=EVENTO_PROGRESO)
+        return
+    mensaje_inicio = f"Iniciando modo daemon con un ciclo cada {intervalo_daemon}s..."
+    logger.info(mensaje_inicio, extra=EVENTO_PROGRESO)
+    while not evento_parada.is_set():
+        inicio_ciclo = time.monotonic()
+        try:
+            with bloqueo_sincronizacion:
+                ejecutar_ciclo_sincronizacion()
+        except (Exception, SystemExit) as e:
+            # Un ciclo fallido (por ejemplo Redmine caído) no detiene el daemon
+            error_message = f"Error en el ciclo de sincronización: {e}"
+            logger.error(error_message, exc_info=True)
+        evento_parada.wait(max(0, intervalo_daemon - (time.monotonic() - inicio_ciclo)))
+    logger.info('--------------- Final del modo daemon de sincronizacion Azure <> Redmine ---------------', extra=EVENTO_PROGRESO)
+
+def cargar_datos_referencia():
+    """
+    Carga los estados y las versiones de los objetivos. En modo daemon solo se recargan cuando ha pasado
+    REFERENCIA_TTL, y en ese momento también se descarta el índice de issues de Redmine y se marcan los
+    miembros del proyecto para volver a descargarlos cuando haga falta resolver un usuario nuevo.
+    """
+    global datos_referencia_cargados_en, miembros_cargados
+    if datos_referencia_cargados_en is not None and time.monotonic() - datos_referencia_cargados_en < REFERENCIA_TTL:
+        return
+    with bloqueo_miembros:
+        miembros_cargados = False
+    azure_redmine_user_map.clear()
+    obtener_mapear_estados_redmine()                
+    buscar_versiones_objetivos()
+    issues_por_campo_personalizado.clear()
+    datos_referencia_cargados_en = time.monotonic()
+
+def reiniciar_resultados_ejecucion():
+    global tiempo_inicio, indice_issues_al_dia
+    tiempo_inicio = datetime.datetime.now(zona_horaria_local)
+    indice_issues_al_dia = False
+    with bloqueo_http:
+        metricas_http.clear()
+    with bloqueo_fases:
+        tiempos_fases.clear()
+    for objetivo in objetivos:
+        objetivo['azure_tasks'] = None
+        objetivo['plan'] = []
+        for clave in ('created_issues', 'failed_tasks', 'modified_tasks', 'none_modified_tasks', 'imputaciones'):
+            objetivo[clave].clear()
+
+def obtener_tareas_objetivo(objetivo):
+    objetivo['azure_tasks'] = en_objetivo(objetivo, get_azure_devops_tasks, objetivo)
+    return objetivo['azure_tasks'] is not None
+
+def sincronizar_objetivos():
+    # Carga de una sola vez las issues de Redmine que faltan en el índice de todos los objetivos y procesa los objetivos en paralelo
+    objetivos_con_tareas = [objetivo for objetivo in objetivos if objetivo['azure_tasks']]
+    ids_pendientes = []
+    for objetivo in objetivos_con_tareas:
+        # El hash de cada work item depende de la versión de su objetivo
+        ids_pendientes.extend(en_objetivo(objetivo, obtener_ids_azure, objetivo['azure_tasks']))
+    if ids_pendientes:
+        cargar_issues_Redmine(ids_pendientes)
+    ejecutar_en_paralelo(sincronizar_objetivo, objetivos_con_tareas, len(objetivos_con_tareas))
+    if modo_plan:
+        escribir_plan_sincronizacion()
+
+def sincronizar_objetivo(objetivo):
+    objetivo['plan'] = en_objetivo(objetivo, planificar_work_items, objetivo['azure_tasks'])
+    if modo_plan:
+        return
+    en_objetivo(objetivo, aplicar_plan, objetivo['plan'])
+    if modo_imputaciones:
+        en_objetivo(objetivo, sincronizar_imputaciones, objetivo['imputaciones'])
+    escribir_resultados_ejecucion(objetivo)
+
+def hay_cambios_en_objetivos():
+    return any(objetivo['created_issues'] or objetivo['modified_tasks'] or objetivo['failed_tasks'] for objetivo in objetivos)
+
+def hay_fallos_en_objetivos():
+    return any(objetivo['failed_tasks'] for objetivo in objetivos)
+
+def ejecutar_ciclo_sincronizacion():
+    """
+    Ejecuta una sincronización completa Azure > Redmine de todos los objetivos y genera el resumen de resultados.
+
+    Returns:
+        bool: True si la sincronización ha terminado sin errores.
+    """
     exito = True  
+    reiniciar_resultados_ejecucion()
     try:       
-        cargar_ultimo_timestamp()
-        configurar_logging()
-        print("Iniciando proceso de sincronizacion Azure <> Redmine...") 
-        logger.info("--------------- Iniciando proceso de sincronizacion Azure <> Redmine ---------------")                               
-        cargar_miembros_proyecto()             
-        obtener_mapear_estados_redmine()                
-        buscar_version_segun_sprint(f"Sprint {sprint_number}")                
-        cargar_issues_Redmine()                                 
-        azure_tasks = get_azure_devops_tasks()                   
-
-        if azure_tasks:
-            process_work_items(azure_tasks)   
-            escribir_resultados_ejecucion(created_issues, failed_tasks, modified_tasks, none_modified_tasks)   
-
-        actualizar_ultimo_timestamp()
+        logger.info("--------------- Iniciando proceso de sincronizacion Azure <> Redmine ---------------", extra=EVENTO_PROGRESO)
+        cargar_datos_referencia()
+        if modo_inverso and not modo_plan:
+            # Antes de leer Azure, para que la sincronización Azure > Redmine ya reciba los estados enviados
+            sincronizar_estados_redmine_a_azure()
+        if modo_streaming:
+            tareas_obtenidas = sincronizar_objetivos_streaming()
+        else:
+            if modo_incremental:
+                tareas_obtenidas = get_azure_devops_revisiones()
+            else:
+                tareas_obtenidas = all(ejecutar_en_paralelo(obtener_tareas_objetivo, objetivos, len(objetivos)))
+            sincronizar_objetivos()
+
+        if modo_plan:
+            # Solo se ha calculado el plan: la siguiente ejecución debe volver a ver los mismos cambios
+            pass
+        elif modo_incremental:
+            # Si alguna tarea ha fallado se vuelven a leer las mismas revisiones en la siguiente ejecución
+            if tareas_obtenidas and not hay_fallos_en_objetivos():
+                actualizar_continuation_token()
+        else:
+            actualizar_ultimo_timestamp()
                 
     except Exception as e:
-            escribir_resultados_ejecucion(created_issues, failed_tasks, modified_tasks, none_modified_tasks)
-            total_tasks = sum(1 + len(US_info['children']) for US_info in azure_tasks.values())
-            total_parent_tasks = len(azure_tasks) 
+            for objetivo in objetivos:
+                escribir_resultados_ejecucion(objetivo)
             exito = False            
 
             error_message = f"\nError durante la ejecución del programa: {e}"
-            print(error_message)
             logger.error(error_message, exc_info=True)
-            generar_resumen_html(total_parent_tasks, total_tasks, created_issues, modified_tasks, failed_tasks, none_modified_tasks, exito, error_message)
-            print(f"Proceso de sincronización completado en {obtener_duracion_formateada()}. Generando el archivo de resultados...")
-            logger.info('--------------- Final con errores del proceso de sincronizacion Azure <> Redmine ---------------')
-            sys.exit(1)
-
-    print(f"Proceso de sincronización completado en {obtener_duracion_formateada()}. Generando el archivo de resultados...")
-    logger.info(f"Proceso de sincronización completado en {obtener_duracion_formateada()}. Generando el archivo de resultados...")
-    logger.info('--------------- Final del proceso de sincronizacion Azure <> Redmine ---------------')
-    
-    total_tasks = sum(1 + len(US_info['children']) for US_info in azure_tasks.values())
-    total_parent_tasks = len(azure_tasks) 
-    generar_resumen_html(total_parent_tasks, total_tasks, created_issues, modified_tasks, failed_tasks, none_modified_tasks, exito)
-
-def actualizar_data_json(nueva_ejecucion):
-    # Ruta al archivo data.json dentro de la carpeta docs
-    data_json_path = 'docs/data.json'
-
-    # Leer el contenido actual de data.json
-    try:
-        with open(data_json_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-    except FileNotFoundError:
-        # Si data.json no existe, empezamos con una lista vacía
-        data = []
-
-    # Añadir la nueva ejecución a la lista
-    data.insert(0, nueva_ejecucion)
+            generar_resumen_html(objetivos, exito, error_message)
+            logger.info('--------------- Final con errores del proceso de sincronizacion Azure <> Redmine ---------------', extra=EVENTO_PROGRESO)
+            return exito
 
-    # Si la lista excede las 50 ejecuciones, se elimina la más antigua (la última de la lista)
-    if len(data) > 50:
-        data = data[:50]  # Conservar solo las primeras 50 ejecuciones
-
-    # Guardar los cambios en data.json
-    with open(data_json_path, 'w', encoding='utf-8') as file:
-        json.dump(data, file, indent=4, ensure_ascii=False)
+    logger.info(f"Proceso de sincronización completado en {obtener_duracion_formateada()}. Generando el archivo de resultados...", extra=EVENTO_PROGRESO)
+    escribir_metricas_http()
+    logger.info('--------------- Final del proceso de sincronizacion Azure <> Redmine ---------------', extra=EVENTO_PROGRESO)
+    
+    if not modo_plan:
+        generar_resumen_html(objetivos, exito)
+    return exito
 
-def escribir_resultados_ejecucion(created_issues, failed_tasks, modified_tasks, none_modified_tasks):    
+def escribir_resultados_ejecucion(objetivo):    
 
     logger.info("Escribiendo resultados en el logger...")
     logger.info(f"Sincronización completada en en {obtener_duracion_formateada()}\n")
-    logger.info("Resultado de la sincronización\n")    
+    logger.info(f"Resultado de la sincronización de {objetivo['nombre']}\n")    
     
     logger.info("Issues creadas:")
     logger.info("-----------------")
-    for issue in created_issues:
+    for issue in objetivo['created_issues']:
         logger.info(f"- {issue}")
 
     logger.info("IDs de tareas fallidas:")
     logger.info("------------------------")
-    for task_info in failed_tasks:
+    for task_info in objetivo['failed_tasks']:
         logger.info(f"- {task_info}")
 
     logger.info("Tareas modificadas:")
     logger.info("-------------------")
-    for taskinfo in modified_tasks:
+    for taskinfo in objetivo['modified_tasks']:
         logger.info(f"- {taskinfo}")
 
     logger.info("Tareas No modificadas:")
     logger.info("-------------------")
-    for taskinfo in none_modified_tasks:
+    for taskinfo in objetivo['none_modified_tasks']:
         logger.info(f"- {taskinfo}")
 
-def limpiar_archivos_html_antiguos():
-    # Ruta al directorio de resultados y al archivo data.json
-    directorio_resultados = 'docs/resultados'
-    data_json_path = 'docs/data.json'
-    
-    # Leer el contenido actual de data.json
+#region Historial de ejecuciones
+
+def resumir_ejecucion(ejecucion):
+    """
+    Entrada del feed de últimas ejecuciones: los totales de la ejecución sin el detalle de fases y endpoints,
+    que solo se guarda en el historial.
+    """
+    fases = ejecucion.get('fases') or {}
+    fase_mas_lenta = max(fases.items(), key=lambda fase: fase[1]) if fases else None
+    return {
+        "fechaHora": ejecucion['fechaHora'],
+        "tareasCreadas": ejecucion['tareasCreadas'],
+        "tareasModificadas": ejecucion['tareasModificadas'],
+        "tareasFallidas": ejecucion['tareasFallidas'],
+        "tareasNoModificadas": ejecucion['tareasNoModificadas'],
+        "estado": ejecucion['estado'],
+        "detalle": ejecucion.get('detalle'),
+        "duracionSegundos": ejecucion.get('duracionSegundos'),
+        "llamadasHttp": sum(datos['llamadas'] for datos in ejecucion['http'].values()) if 'http' in ejecucion else None,
+        "faseMasLenta": {"nombre": fase_mas_lenta[0], "segundos": fase_mas_lenta[1]} if fase_mas_lenta else None,
+    }
+
+def acumular_totales(totales, campo, clave, ejecucion):
+    """
+    Suma la ejecución al total de su día u hora (clave) en la lista de totales, ordenada de más reciente a más antiguo.
+    """
+    total = next((total for total in totales if total[campo] == clave), None)
+    if total is None:
+        total = {campo: clave, "ejecuciones": 0, "ejecucionesConErrores": 0, "tareasCreadas": 0, "tareasModificadas": 0,
+                 "tareasFallidas": 0, "tareasNoModificadas": 0, "duracionSegundos": 0, "llamadasHttp": 0}
+        totales.append(total)
+        totales.sort(key=lambda total: total[campo], reverse=True)
+    total['ejecuciones'] += 1
+    total['ejecucionesConErrores'] += 0 if ejecucion['estado'] == 'Con Éxito' else 1
+    for clave_total in ('tareasCreadas', 'tareasModificadas', 'tareasFallidas', 'tareasNoModificadas'):
+        total[clave_total] += ejecucion[clave_total]
+    total['duracionSegundos'] = round(total['duracionSegundos'] + (ejecucion.get('duracionSegundos') or 0), 3)
+    total['llamadasHttp'] += sum(datos['llamadas'] for datos in ejecucion.get('http', {}).values())
+
+def leer_feed(ruta):
     try:
-        with open(data_json_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
+        with open(ruta, 'r', encoding='utf-8') as file:
+            return json.load(file)
     except FileNotFoundError:
-        print("El archivo data.json no existe. No hay nada que limpiar.")
-        return
-    
-    # Obtener los nombres de archivo de los últimos 50 resultados
-    ultimos_50_archivos = {ejecucion['detalle'].split('/')[-1] for ejecucion in data}
-    
-    # Listar todos los archivos HTML en el directorio de resultados
-    archivos_en_directorio = [f for f in os.listdir(directorio_resultados) if f.endswith('.html')]
-    
-    # Eliminar archivos que no están en los últimos 50
-    for archivo in archivos_en_directorio:
-        if archivo not in ultimos_50_archivos:
-            os.remove(os.path.join(directorio_resultados, archivo))
-            print(f"Archivo eliminado: {archivo}")
+        return []
 
-def generar_resumen_html(total_parent_tasks, total_tasks, created_issues, modified_tasks, failed_tasks, none_modified_tasks, exito, mensaje_error = ''):       
+def guardar_feed(ruta, datos):
+    # index.html puede estar leyendo el feed, por eso se reemplaza de forma atómica
+    escribir_archivo_atomico(ruta, json.dumps(datos, indent=4, ensure_ascii=False))
+
+def guardar_feeds(ultimas, diarios, horarios):
+    fecha_minima = (datetime.datetime.now(zona_horaria_local) - datetime.timedelta(days=HISTORIAL_RETENCION_DIAS)).strftime("%Y-%m-%d")
+    guardar_feed(FEED_ULTIMAS_EJECUCIONES, ultimas[:ULTIMAS_EJECUCIONES])
+    guardar_feed(FEED_TOTALES_DIARIOS, [total for total in diarios if total['fecha'] >= fecha_minima])
+    guardar_feed(FEED_TOTALES_HORARIOS, horarios[:HORAS_TOTALES_HORARIOS])
+
+def actualizar_feeds(ejecucion):
+    """
+    Añade la ejecución a los feeds de docs/index.html. Son archivos pequeños (las últimas ejecuciones y los
+    totales por día y por hora), así que se actualizan sin leer el historial.
+    """
+    ultimas = leer_feed(FEED_ULTIMAS_EJECUCIONES)
+    ultimas.insert(0, resumir_ejecucion(ejecucion))
+    diarios = leer_feed(FEED_TOTALES_DIARIOS)
+    acumular_totales(diarios, 'fecha', ejecucion['fechaHora'][:10], ejecucion)
+    horarios = leer_feed(FEED_TOTALES_HORARIOS)
+    acumular_totales(horarios, 'hora', f"{ejecucion['fechaHora'][:13]}:00", ejecucion)
+    guardar_feeds(ultimas, diarios, horarios)
+
+def reconstruir_feeds(historial):
+    # El historial está en orden cronológico y los feeds van de más reciente a más antiguo
+    ultimas, diarios, horarios = [], [], []
+    for ejecucion in historial:
+        ultimas.insert(0, resumir_ejecucion(ejecucion))
+        acumular_totales(diarios, 'fecha', ejecucion['fechaHora'][:10], ejecucion)
+        acumular_totales(horarios, 'hora', f"{ejecucion['fechaHora'][:13]}:00", ejecucion)
+    guardar_feeds(ultimas, diarios, horarios)
+
+def leer_historial():
+    with open(HISTORIAL_EJECUCIONES_FILE, 'r', encoding='utf-8') as file:
+        return [json.loads(linea) for linea in file if linea.strip()]
+
+def escribir_historial(historial):
+    escribir_archivo_atomico(HISTORIAL_EJECUCIONES_FILE, ''.join(json.dumps(ejecucion, ensure_ascii=False) + '\n' for ejecucion in historial))
+
+def crear_historial():
+    """
+    Crea el historial a partir de las ejecuciones de docs/data.json, que hasta ahora guardaba las 50 últimas
+    con todo su detalle, y regenera los feeds.
+    """
+    historial = list(reversed(leer_feed(FEED_ULTIMAS_EJECUCIONES)))
+    escribir_historial(historial)
+    reconstruir_feeds(historial)
+    logger.info(f"Historial de ejecuciones creado en {HISTORIAL_EJECUCIONES_FILE} con {len(historial)} ejecuciones anteriores.")
+
+def historial_necesita_compactacion():
+    if os.path.getsize(HISTORIAL_EJECUCIONES_FILE) > HISTORIAL_TAMANO_MAXIMO:
+        return True
+    # Basta con mirar la primera línea, que es la ejecución más antigua
+    with open(HISTORIAL_EJECUCIONES_FILE, 'r', encoding='utf-8') as file:
+        primera = file.readline()
+    fecha_minima = (datetime.datetime.now(zona_horaria_local) - datetime.timedelta(days=HISTORIAL_RETENCION_DIAS + 1)).strftime("%Y-%m-%d")
+    return bool(primera.strip()) and json.loads(primera)['fechaHora'][:10] < fecha_minima
+
+def compactar_historial():
+    """
+    Reescribe el historial sin las ejecuciones de más de HISTORIAL_RETENCION_DIAS días y, si aun así ocupa más
+    de la mitad de HISTORIAL_TAMANO_MAXIMO, sin las más antiguas. Borra las páginas de detalle de las ejecuciones
+    descartadas. Los totales no se recalculan: se mantienen al añadir cada ejecución y tienen su propia retención.
+    """
+    historial = leer_historial()
+    fecha_minima = (datetime.datetime.now(zona_horaria_local) - datetime.timedelta(days=HISTORIAL_RETENCION_DIAS)).strftime("%Y-%m-%d")
+    conservadas = [ejecucion for ejecucion in historial if ejecucion['fechaHora'][:10] >= fecha_minima]
+    tamano = sum(len(json.dumps(ejecucion, ensure_ascii=False).encode('utf-8')) + 1 for ejecucion in conservadas)
+    while len(conservadas) > 1 and tamano > HISTORIAL_TAMANO_MAXIMO // 2:
+        tamano -= len(json.dumps(conservadas.pop(0), ensure_ascii=False).encode('utf-8')) + 1
+
+    detalles_conservados = {ejecucion.get('detalle') for ejecucion in conservadas}
+    detalles_eliminados = {ejecucion.get('detalle') for ejecucion in historial} - detalles_conservados - {None}
+    for detalle in detalles_eliminados:
+        ruta = os.path.join('docs', detalle)
+        if os.path.exists(ruta):
+            os.remove(ruta)
+            logger.info(f"Archivo eliminado: {os.path.basename(ruta)}")
+
+    escribir_historial(conservadas)
+    # Las últimas ejecuciones que sigan en el feed dejan de enlazar a las páginas borradas
+    ultimas = leer_feed(FEED_ULTIMAS_EJECUCIONES)
+    if any(ejecucion.get('detalle') in detalles_eliminados for ejecucion in ultimas):
+        for ejecucion in ultimas:
+            if ejecucion.get('detalle') in detalles_eliminados:
+                ejecucion['detalle'] = None
+        guardar_feed(FEED_ULTIMAS_EJECUCIONES, ultimas)
+    logger.info(f"Historial de ejecuciones compactado: {len(historial) - len(conservadas)} ejecuciones descartadas, {len(conservadas)} conservadas.")
+
+def registrar_ejecucion(ejecucion):
+    """
+    Añade la ejecución al final del historial (una línea, sin leer ni reescribir el resto), actualiza los feeds
+    y compacta el historial cuando supera la retención o el tamaño máximo.
+    """
+    if not os.path.exists(HISTORIAL_EJECUCIONES_FILE):
+        crear_historial()
+    with open(HISTORIAL_EJECUCIONES_FILE, 'a', encoding='utf-8') as file:
+        file.write(json.dumps(ejecucion, ensure_ascii=False) + '\n')
+    actualizar_feeds(ejecucion)
+    if historial_necesita_compactacion():
+        compactar_historial()
+
+#endregion Historial de ejecuciones
+
+def generar_resumen_html(objetivos, exito, mensaje_error = ''):       
     
-    limpiar_archivos_html_antiguos()
+    inicio_informe = time.monotonic()
+
+    # Totales de todos los objetivos; el detalle de tareas se muestra por objetivo
+    total_parent_tasks = sum(len(objetivo['azure_tasks'] or {}) for objetivo in objetivos)
+    total_tasks = sum(1 + len(US_info['children']) for objetivo in objetivos for US_info in (objetivo['azure_tasks'] or {}).values())
+    created_issues = [tarea for objetivo in objetivos for tarea in objetivo['created_issues']]
+    modified_tasks = [tarea for objetivo in objetivos for tarea in objetivo['modified_tasks']]
+    failed_tasks = [tarea for objetivo in objetivos for tarea in objetivo['failed_tasks']]
+    none_modified_tasks = [tarea for objetivo in objetivos for tarea in objetivo['none_modified_tasks']]
+    versiones = ', '.join(objetivo['version'].name if objetivo['version'] else objetivo['nombre_version'] for objetivo in objetivos)
+
+    # La fase de informe todavía no ha terminado: se añade tras escribir el historial
+    fases = {fase: round(segundos, 3) for fase, segundos in tiempos_fases.items()}
+    metricas = resumen_metricas_http()
+    duracion_segundos = round((datetime.datetime.now(zona_horaria_local) - tiempo_inicio).total_seconds(), 3)
+
+    # Solo se escribe la página de detalle de las ejecuciones que crean, modifican o fallan alguna tarea
+    nombre_archivo_html = None
+    if not exito or hay_cambios_en_objetivos():
+        nombre_archivo_html = escribir_detalle_html(objetivos, versiones, total_parent_tasks, total_tasks, created_issues, modified_tasks,
+                                                    failed_tasks, none_modified_tasks, fases, metricas)
+
+    # Registrar la ejecución en el historial y en los feeds de docs/index.html
+    nueva_ejecucion = {
+    "fechaHora": tiempo_inicio.strftime("%Y-%m-%d %H:%M"),
+    "tareasCreadas": len(created_issues),
+    "tareasModificadas": len(modified_tasks),
+    "tareasFallidas": len(failed_tasks),
+    "tareasNoModificadas": len(none_modified_tasks),
+    "estado": "Con Éxito" if exito else "Con Errores",
+    "detalle": f"resultados/{nombre_archivo_html}" if nombre_archivo_html else None,
+    "duracionSegundos": duracion_segundos,
+    "fases": fases,
+    "http": metricas,
+    "objetivos": [
+        {
+            "nombre": objetivo['nombre'],
+            "tareasCreadas": len(objetivo['created_issues']),
+            "tareasModificadas": len(objetivo['modified_tasks']),
+            "tareasFallidas": len(objetivo['failed_tasks']),
+            "tareasNoModificadas": len(objetivo['none_modified_tasks'])
+        }
+        for objetivo in objetivos
+    ]
+    }
+    registrar_ejecucion(nueva_ejecucion)
+    if not exito:
+        enviar_correo_resumen(objetivos, versiones, total_parent_tasks, total_tasks, nombre_archivo_html, mensaje_error)
+
+    # La fase de informe incluye la página de detalle, el historial y los feeds, así que solo llega al log y a Prometheus
+    registrar_tiempo_fase('informe', time.monotonic() - inicio_informe)
+    fases['informe'] = round(tiempos_fases['informe'], 3)
+    logger.info(f"Fase informe: {fases['informe']:.2f}s")
+    if PROMETHEUS_TEXTFILE:
+        escribir_metricas_prometheus(nueva_ejecucion)
+
+def escribir_detalle_html(objetivos, versiones, total_parent_tasks, total_tasks, created_issues, modified_tasks, failed_tasks,
+                          none_modified_tasks, fases, metricas):
+    """
+    Escribe la página de detalle de la ejecución en docs/resultados.
+
+    Returns:
+        str: El nombre del archivo HTML.
+    """
+    def titulo_objetivo(tipo, objetivo):
+        return f"Tareas {tipo} ({objetivo['nombre']})" if len(objetivos) > 1 else f"Tareas {tipo}"
 
     html_content = f"""
     <!DOCTYPE html>
@@ -876,7 +3332,7 @@ def generar_resumen_html(total_parent_tasks, total_tasks, created_issues, modifi
                     <h2>Detalles de Ejecución:</h2>
                     <p>Inicio: {tiempo_inicio}</p>
                     <p>Duración: {obtener_duracion_formateada()}</p>
-                    <p>Versión del Sprint: {version_sprint.name}</p>           
+                    <p>Versión del Sprint: {versiones}</p>           
                 </div>
                 <div class="flex-item summary">
                     <h2>Estadísticas:</h2>
@@ -887,16 +3343,31 @@ def generar_resumen_html(total_parent_tasks, total_tasks, created_issues, modifi
                     <p>Total de Issues No Modificadas: {len(none_modified_tasks)}</p>
                     <p>Total de Issues Fallidas: {len(failed_tasks)}</p>
                 </div>
+                <div class="flex-item summary">
+                    <h2>Tiempos por fase:</h2>
+                    {''.join(f"<p>{fase}: {segundos:.2f}s</p>" for fase, segundos in fases.items())}
+                </div>
+            </div>
+            <div class="summary">
+                <h2>Peticiones HTTP:</h2>
+                <table>
+                    <thead>
+                        <tr><th>Endpoint</th><th>Llamadas</th><th>Errores</th><th>Reintentos</th><th>p50 ms</th><th>p95 ms</th><th>p99 ms</th><th>Máx. ms</th><th>Bytes enviados</th><th>Bytes recibidos</th></tr>
+                    </thead>
+                    <tbody>
+                        {''.join(f"<tr><td>{endpoint}</td><td>{datos['llamadas']}</td><td>{datos['errores']}</td><td>{datos['reintentos']}</td><td>{datos['p50_ms']}</td><td>{datos['p95_ms']}</td><td>{datos['p99_ms']}</td><td>{datos['max_ms']}</td><td>{datos['bytes_enviados']}</td><td>{datos['bytes_recibidos']}</td></tr>" for endpoint, datos in metricas.items())}
+                    </tbody>
+                </table>
             </div>
             <!-- Cajas de tareas debajo -->
             {''.join(f"""
             <div class="summary">
-                <h2>Tareas {tipo}:</h2>
+                <h2>{titulo_objetivo(tipo, objetivo)}:</h2>
                 <ul class="task-list">
-                    {''.join(f"<li>{task}</li>" for task in tasks)}
+                    {''.join(f"<li>{task}</li>" for task in objetivo[clave])}
                 </ul>
             </div>
-            """ for tipo, tasks in (("Creadas", created_issues), ("Modificadas", modified_tasks), ("No Modificadas", none_modified_tasks), ("Fallidas", failed_tasks)) if tasks)}
+            """ for objetivo in objetivos for tipo, clave in (("Creadas", 'created_issues'), ("Modificadas", 'modified_tasks'), ("No Modificadas", 'none_modified_tasks'), ("Fallidas", 'failed_tasks')) if objetivo[clave])}
         </main>
         <footer>
             <a href="../index.html">Volver a la lista de ejecuciones</a>
@@ -905,25 +3376,14 @@ def generar_resumen_html(total_parent_tasks, total_tasks, created_issues, modifi
     </html>
     """
 
-    nombre_archivo_html = datetime.datetime.now(zona_horaria_local).strftime("resumen_ejecucion_%Y%m%d_%H%M%S.html")   
-    # Generar el nombre del archivo basado en la fecha y hora actual    
-    with open(nombre_archivo_html, 'w', encoding='utf-8') as file:
+    # Generar el nombre del archivo basado en la fecha y hora actual
+    nombre_archivo_html = datetime.datetime.now(zona_horaria_local).strftime("resumen_ejecucion_%Y%m%d_%H%M%S.html")
+    os.makedirs(DIRECTORIO_RESULTADOS, exist_ok=True)
+    with open(os.path.join(DIRECTORIO_RESULTADOS, nombre_archivo_html), 'w', encoding='utf-8') as file:
         file.write(html_content)
-    with open('nombre_archivo.txt', 'w') as f:
-        f.write(nombre_archivo_html)
-
-    # Actualizar el archivo data.json con los resultados de la ejecución
-    nueva_ejecucion = {
-    "fechaHora": tiempo_inicio.strftime("%Y-%m-%d %H:%M"),
-    "tareasCreadas": len(created_issues),
-    "tareasModificadas": len(modified_tasks),
-    "tareasFallidas": len(failed_tasks),
-    "tareasNoModificadas": len(none_modified_tasks),
-    "estado": "Con Éxito" if exito else "Con Errores",
-    "detalle": f"resultados/{nombre_archivo_html}"
-    }
-    actualizar_data_json(nueva_ejecucion)
+    return nombre_archivo_html
 
+def enviar_correo_resumen(objetivos, versiones, total_parent_tasks, total_tasks, nombre_archivo_html, mensaje_error):
     # Generar listados de tareas para el cuerpo del correo
     def generar_listado_tareas(tareas):
         if tareas:
@@ -936,23 +3396,27 @@ def generar_resumen_html(total_parent_tasks, total_tasks, created_issues, modifi
     detalles_ejecucion = f"""
     <h3>Detalles de la Ejecución:</h3>
     <p>Duración de la ejecución: {obtener_duracion_formateada()}</p>
-    <p>Versión del Sprint: {version_sprint.name}</p>
+    <p>Versión del Sprint: {versiones}</p>
     """
 
     estadisticas_tareas = f"""
     <h3>Resultado Proceasdo Tareas:</h3>
     <p>Total de HUs procesadas: {total_parent_tasks}</p>
     <p>Total de subtareas procesadas: {total_tasks}</p>
-    <p>Total de Issues Creadas: {len(created_issues)}</p>
-    {generar_listado_tareas(created_issues)}
-    <p>Total de Issues Modificadas: {len(modified_tasks)}</p>
-    {generar_listado_tareas(modified_tasks)}
-    <p>Total de Issues Fallidas: {len(failed_tasks)}</p>
-    {generar_listado_tareas(failed_tasks)}
+    """
+    for objetivo in objetivos:
+        if len(objetivos) > 1:
+            estadisticas_tareas += f"<h4>{objetivo['nombre']}</h4>"
+        estadisticas_tareas += f"""
+    <p>Total de Issues Creadas: {len(objetivo['created_issues'])}</p>
+    {generar_listado_tareas(objetivo['created_issues'])}
+    <p>Total de Issues Modificadas: {len(objetivo['modified_tasks'])}</p>
+    {generar_listado_tareas(objetivo['modified_tasks'])}
+    <p>Total de Issues Fallidas: {len(objetivo['failed_tasks'])}</p>
+    {generar_listado_tareas(objetivo['failed_tasks'])}
     """
     
-    if not exito:
-        estadisticas_tareas += f"<p>Error: {mensaje_error}</p>"
+    estadisticas_tareas += f"<p>Error: {mensaje_error}</p>"
 
     # Definir la base URL de GitHub Pages para tu proyecto
     base_url = "https://erueloi.github.io/syncAzureRedmine/"
@@ -975,10 +3439,56 @@ def generar_resumen_html(total_parent_tasks, total_tasks, created_issues, modifi
     </body></html>"""
 
     # Datos del correo    
-    asunto = 'Resumen de Ejecución de la Sincronización' + (' - Ejecutado correctamente' if exito else ' - Error')
-    
-    if not exito:
-        enviar_correo(asunto, cuerpo) 
+    asunto = 'Resumen de Ejecución de la Sincronización - Error'
+    # En modo daemon o con ejecuciones frecuentes los errores repetidos se agrupan en un resumen
+    enviar_correo(asunto, cuerpo, clave_digest='error_sincronizacion')
+
+def escribir_metricas_prometheus(ejecucion):
+    """
+    Escribe las métricas de la ejecución en PROMETHEUS_TEXTFILE con el formato de exposición de Prometheus,
+    para que las recoja el textfile collector de node_exporter.
+    """
+    def etiqueta(valor):
+        return str(valor).replace('\\', '\\\\').replace('"', '\\"')
+
+    lineas = [
+        '# HELP sync_azure_redmine_ultima_ejecucion_timestamp_segundos Inicio de la última ejecución (epoch).',
+        '# TYPE sync_azure_redmine_ultima_ejecucion_timestamp_segundos gauge',
+        f"sync_azure_redmine_ultima_ejecucion_timestamp_segundos {tiempo_inicio.timestamp():.0f}",
+        '# HELP sync_azure_redmine_exito 1 si la última ejecución terminó sin errores.',
+        '# TYPE sync_azure_redmine_exito gauge',
+        f"sync_azure_redmine_exito {1 if ejecucion['estado'] == 'Con Éxito' else 0}",
+        '# HELP sync_azure_redmine_duracion_segundos Duración de la última ejecución.',
+        '# TYPE sync_azure_redmine_duracion_segundos gauge',
+        f"sync_azure_redmine_duracion_segundos {ejecucion['duracionSegundos']}",
+        '# HELP sync_azure_redmine_tareas Tareas de la última ejecución por resultado.',
+        '# TYPE sync_azure_redmine_tareas gauge',
+    ]
+    for resultado, clave in (('creadas', 'tareasCreadas'), ('modificadas', 'tareasModificadas'), ('fallidas', 'tareasFallidas'), ('no_modificadas', 'tareasNoModificadas')):
+        lineas.append(f'sync_azure_redmine_tareas{{resultado="{resultado}"}} {ejecucion[clave]}')
+    lineas += ['# HELP sync_azure_redmine_fase_segundos Duración de cada fase de la última ejecución.', '# TYPE sync_azure_redmine_fase_segundos gauge']
+    for fase, segundos in ejecucion['fases'].items():
+        lineas.append(f'sync_azure_redmine_fase_segundos{{fase="{etiqueta(fase)}"}} {segundos}')
+    lineas += [
+        '# HELP sync_azure_redmine_http_peticiones Peticiones HTTP de la última ejecución por endpoint.',
+        '# TYPE sync_azure_redmine_http_peticiones gauge',
+        '# HELP sync_azure_redmine_http_errores Peticiones HTTP fallidas de la última ejecución por endpoint.',
+        '# TYPE sync_azure_redmine_http_errores gauge',
+        '# HELP sync_azure_redmine_http_latencia_segundos Percentiles de latencia HTTP de la última ejecución por endpoint.',
+        '# TYPE sync_azure_redmine_http_latencia_segundos gauge',
+        '# HELP sync_azure_redmine_http_bytes Bytes HTTP transferidos en la última ejecución por endpoint.',
+        '# TYPE sync_azure_redmine_http_bytes gauge',
+    ]
+    for endpoint, datos in ejecucion['http'].items():
+        endpoint = etiqueta(endpoint)
+        lineas.append(f'sync_azure_redmine_http_peticiones{{endpoint="{endpoint}"}} {datos["llamadas"]}')
+        lineas.append(f'sync_azure_redmine_http_errores{{endpoint="{endpoint}"}} {datos["errores"]}')
+        for cuantil, clave in (('0.5', 'p50_ms'), ('0.95', 'p95_ms'), ('0.99', 'p99_ms')):
+            lineas.append(f'sync_azure_redmine_http_latencia_segundos{{endpoint="{endpoint}",cuantil="{cuantil}"}} {datos[clave] / 1000}')
+        lineas.append(f'sync_azure_redmine_http_bytes{{endpoint="{endpoint}",direccion="enviados"}} {datos["bytes_enviados"]}')
+        lineas.append(f'sync_azure_redmine_http_bytes{{endpoint="{endpoint}",direccion="recibidos"}} {datos["bytes_recibidos"]}')
+    # node_exporter puede leer el archivo en cualquier momento, por eso se reemplaza de forma atómica
+    escribir_archivo_atomico(PROMETHEUS_TEXTFILE, '\n'.join(lineas) + '\n')
 
 def subir_index_html_a_github(ruta_archivo, usuario, token, repositorio, rama):
   """
@@ -1003,7 +3513,8 @@ def subir_index_html_a_github(ruta_archivo, usuario, token, repositorio, rama):
   auth = HTTPBasicAuthHandler(usuario, token)
 
   # Crea la solicitud para actualizar el archivo
-  response = requests.put(
+  response = peticion_http(
+      'PUT',
       url,
       auth=auth,
       data={"content": content, "message": "Actualizando index.html"},
@@ -1011,9 +3522,9 @@ def subir_index_html_a_github(ruta_archivo, usuario, token, repositorio, rama):
 
   # Verifica el estado de la solicitud
   if response.status_code == 200:
-    print("¡Index.html actualizado correctamente!")
+    logger.info("¡Index.html actualizado correctamente!")
   else:
-    print("Error al actualizar el archivo:", response.status_code)
+    logger.error(f"Error al actualizar el archivo: {response.status_code}")
 
     # Opción 1: Ruta fija
     ruta_archivo = "docs/index.html"
@@ -1026,25 +3537,156 @@ def subir_index_html_a_github(ruta_archivo, usuario, token, repositorio, rama):
 
     # ... Generación del index.html y otras rutinas del script
 
-def enviar_correo(asunto, cuerpo, archivo=None):
-    # Leer los destinatarios desde el archivo .env
-    destinatarios = os.getenv('DESTINATARIOS_EMAIL').split(',')
+#region Notificaciones
 
-    # Configuración del servidor SMTP y credenciales de acceso
-    servidor_smtp = os.getenv('SMTP_SERVER')
-    puerto_smtp = int(os.getenv('SMTP_PORT'))
-    usuario_smtp = os.getenv('SMTP_USER')
-    contraseña_smtp = os.getenv('SMTP_PASSWORD')
+def enviar_correo(asunto, cuerpo, archivo=None, clave_digest=None):
+    """
+    Encola un correo para que lo envíe el hilo de notificaciones, sin esperar al servidor SMTP.
+
+    Args:
+        asunto (str): Asunto del correo.
+        cuerpo (str): Cuerpo HTML.
+        archivo (str): Ruta de un archivo que adjuntar (opcional).
+        clave_digest (str): Los correos con la misma clave que llegan antes de NOTIFICACIONES_VENTANA_DIGEST
+                            segundos desde el último envío se agrupan en un único resumen.
+    """
+    if not os.getenv('SMTP_SERVER') or not os.getenv('DESTINATARIOS_EMAIL'):
+        logger.warning(f"No está configurado el envío de correo (SMTP_SERVER y DESTINATARIOS_EMAIL). No se envía '{asunto}'.")
+        return
+    cola_notificaciones.put({
+        'asunto': asunto,
+        'cuerpo': cuerpo,
+        'archivo': archivo,
+        'clave_digest': clave_digest,
+        'creado': datetime.datetime.now(zona_horaria_local).isoformat()
+    })
+
+def iniciar_notificaciones():
+    """
+    Carga los correos que no se pudieron entregar en ejecuciones anteriores y arranca el hilo de notificaciones.
+    Al terminar el proceso se esperan los envíos en curso como máximo NOTIFICACIONES_TIMEOUT_CIERRE segundos.
+    """
+    global hilo_notificaciones
+    try:
+        with open(NOTIFICACIONES_FILE, 'r', encoding='utf-8') as file:
+            notificaciones.update(json.load(file))
+    except FileNotFoundError:
+        pass
+    if notificaciones['pendientes']:
+        logger.info(f"Hay {len(notificaciones['pendientes'])} correos pendientes de ejecuciones anteriores.")
+    hilo_notificaciones = threading.Thread(target=procesar_notificaciones, name='notificaciones', daemon=True)
+    hilo_notificaciones.start()
+    atexit.register(cerrar_notificaciones)
+
+def cerrar_notificaciones():
+    parada_notificaciones.set()
+    # Despierta al hilo si está esperando nuevos correos
+    cola_notificaciones.put(None)
+    hilo_notificaciones.join(NOTIFICACIONES_TIMEOUT_CIERRE)
+    if hilo_notificaciones.is_alive():
+        # El servidor SMTP no responde: lo que no se ha enviado se guarda para la siguiente ejecución
+        with bloqueo_notificaciones:
+            recoger_cola_notificaciones()
+            guardar_notificaciones()
+        logger.error(f"El envío de correos no ha terminado en {NOTIFICACIONES_TIMEOUT_CIERRE:.0f}s. Los correos pendientes se guardan en {NOTIFICACIONES_FILE}.")
+
+def recoger_cola_notificaciones():
+    # Debe llamarse con bloqueo_notificaciones
+    recogidos = False
+    while True:
+        try:
+            mensaje = cola_notificaciones.get_nowait()
+        except queue.Empty:
+            return recogidos
+        if mensaje is not None:
+            notificaciones['pendientes'].append(mensaje)
+            recogidos = True
+
+def guardar_notificaciones():
+    # Debe llamarse con bloqueo_notificaciones
+    if notificaciones['pendientes'] or notificaciones['ultimos_envios'] or os.path.exists(NOTIFICACIONES_FILE):
+        escribir_archivo_atomico(NOTIFICACIONES_FILE, json.dumps(notificaciones, ensure_ascii=False))
+
+def procesar_notificaciones():
+    """
+    Hilo de notificaciones: envía los correos encolados por una única conexión SMTP, que se reutiliza entre correos
+    y se cierra tras SMTP_INACTIVIDAD segundos sin envíos. Los correos pendientes se guardan en NOTIFICACIONES_FILE
+    en cuanto llegan, así que los que no se consiguen entregar se reintentan en la siguiente ejecución.
+    """
+    conexion = {'smtp': None, 'ultimo_uso': 0.0, 'reintentar_en': 0.0}
+    while True:
+        try:
+            mensaje = cola_notificaciones.get(timeout=1)
+            with bloqueo_notificaciones:
+                if mensaje is not None:
+                    notificaciones['pendientes'].append(mensaje)
+                if recoger_cola_notificaciones() or mensaje is not None:
+                    guardar_notificaciones()
+        except queue.Empty:
+            pass
+
+        enviados = enviar_notificaciones_pendientes(conexion) if time.monotonic() >= conexion['reintentar_en'] else False
+        if conexion['smtp'] is not None and (parada_notificaciones.is_set() or time.monotonic() - conexion['ultimo_uso'] > SMTP_INACTIVIDAD):
+            cerrar_conexion_smtp(conexion)
+        # Al cerrar solo se intenta una vez más: lo que falle o esté agrupándose queda guardado para la siguiente ejecución
+        if parada_notificaciones.is_set() and cola_notificaciones.empty() and not enviados:
+            return
+
+def enviar_notificaciones_pendientes(conexion):
+    """
+    Envía los correos pendientes que tocan: los normales siempre y los de cada clave de digest, agrupados en un
+    solo correo, cuando ha pasado NOTIFICACIONES_VENTANA_DIGEST desde el último envío de esa clave.
+
+    Returns:
+        bool: True si se ha enviado algún correo.
+    """
+    ahora = time.time()
+    with bloqueo_notificaciones:
+        envios = []
+        grupos = {}
+        for mensaje in notificaciones['pendientes']:
+            if mensaje['clave_digest'] is None:
+                envios.append([mensaje])
+            else:
+                grupos.setdefault(mensaje['clave_digest'], []).append(mensaje)
+        for clave, mensajes in grupos.items():
+            if ahora - notificaciones['ultimos_envios'].get(clave, 0) >= NOTIFICACIONES_VENTANA_DIGEST:
+                envios.append(mensajes)
 
-    # Crear el mensaje
+    enviados = False
+    for mensajes in envios:
+        try:
+            enviar_mensaje_smtp(conexion, construir_mensaje(mensajes))
+        except (smtplib.SMTPException, OSError) as e:
+            logger.error(f"Error al enviar el correo '{mensajes[0]['asunto']}': {e}. Se reintentará en {NOTIFICACIONES_ESPERA_REINTENTO}s.")
+            cerrar_conexion_smtp(conexion)
+            conexion['reintentar_en'] = time.monotonic() + NOTIFICACIONES_ESPERA_REINTENTO
+            break
+        enviados = True
+        with bloqueo_notificaciones:
+            notificaciones['pendientes'] = [mensaje for mensaje in notificaciones['pendientes'] if mensaje not in mensajes]
+            if mensajes[0]['clave_digest'] is not None:
+                notificaciones['ultimos_envios'][mensajes[0]['clave_digest']] = ahora
+            guardar_notificaciones()
+        logger.info(f"Correo '{mensajes[0]['asunto']}' enviado correctamente" + (f" con {len(mensajes)} avisos agrupados." if len(mensajes) > 1 else "."))
+    return enviados
+
+def construir_mensaje(mensajes):
+    # Un correo normal, o el resumen de varios avisos con la misma clave de digest
+    destinatarios = os.getenv('DESTINATARIOS_EMAIL').split(',')
     mensaje = MIMEMultipart()
-    mensaje['From'] = usuario_smtp
+    mensaje['From'] = os.getenv('SMTP_USER') or destinatarios[0]
     mensaje['To'] = ", ".join(destinatarios)
-    mensaje['Subject'] = asunto
+    if len(mensajes) == 1:
+        mensaje['Subject'] = mensajes[0]['asunto']
+        cuerpo = mensajes[0]['cuerpo']
+    else:
+        mensaje['Subject'] = f"{mensajes[-1]['asunto']} ({len(mensajes)} avisos)"
+        cuerpo = ''.join(f"<h3>Aviso del {datos['creado'][:19].replace('T', ' ')}</h3>{datos['cuerpo']}<hr>" for datos in mensajes)
     mensaje.attach(MIMEText(cuerpo, 'html'))
 
-    # Verificar si hay un archivo para adjuntar
-    if archivo:
+    # Verificar si hay archivos para adjuntar
+    for archivo in [datos['archivo'] for datos in mensajes if datos['archivo']]:
         try:
             with open(archivo, 'rb') as f:
                 part = MIMEApplication(f.read(), Name=os.path.basename(archivo))
@@ -1052,17 +3694,47 @@ def enviar_correo(asunto, cuerpo, archivo=None):
             part['Content-Disposition'] = f'attachment; filename="{os.path.basename(archivo)}"'
             mensaje.attach(part)
         except Exception as e:
-            print(f'Ocurrió un error al adjuntar el archivo: {e}')
-            # Opcionalmente, podrías decidir retornar aquí o manejar el error de otra manera
-
-
-    # Enviar el correo
-    with smtplib.SMTP(servidor_smtp, puerto_smtp) as servidor:
-        servidor.starttls()
-        servidor.login(usuario_smtp, contraseña_smtp)
-        servidor.send_message(mensaje)
+            logger.error(f'Ocurrió un error al adjuntar el archivo: {e}')
+    return mensaje
+
+def enviar_mensaje_smtp(conexion, mensaje):
+    # Se reutiliza la conexión abierta; si el servidor la ha cerrado se abre otra y se reintenta una vez
+    for intento in range(2):
+        if conexion['smtp'] is None:
+            conexion['smtp'] = abrir_conexion_smtp()
+        try:
+            conexion['smtp'].send_message(mensaje)
+            conexion['ultimo_uso'] = time.monotonic()
+            return
+        except smtplib.SMTPServerDisconnected:
+            conexion['smtp'] = None
+            if intento == 1:
+                raise
+
+def abrir_conexion_smtp():
+    # Configuración del servidor SMTP y credenciales de acceso
+    servidor = smtplib.SMTP(os.getenv('SMTP_SERVER'), int(os.getenv('SMTP_PORT', 587)), timeout=SMTP_TIMEOUT)
+    try:
+        # SMTP_STARTTLS=false y sin SMTP_USER permite usar un servidor SMTP local de pruebas
+        if os.getenv('SMTP_STARTTLS', 'true').lower() not in ('false', '0', 'no'):
+            servidor.starttls()
+        if os.getenv('SMTP_USER'):
+            servidor.login(os.getenv('SMTP_USER'), os.getenv('SMTP_PASSWORD'))
+    except BaseException:
+        servidor.close()
+        raise
+    return servidor
+
+def cerrar_conexion_smtp(conexion):
+    if conexion['smtp'] is None:
+        return
+    try:
+        conexion['smtp'].quit()
+    except (smtplib.SMTPException, OSError):
+        conexion['smtp'].close()
+    conexion['smtp'] = None
 
-    print('Correo de resultados enviado correctamente.')
+#endregion Notificaciones
 
 if __name__ == "__main__":
     main()
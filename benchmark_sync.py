@@ -0,0 +1,365 @@
+"""
+Benchmark de la sincronización Azure > Redmine sin conexión con los servicios reales.
+
+Levanta en local un servidor HTTP que hace de Azure DevOps (WIQL, work items, workitemsbatch y feed de
+revisiones) y de Redmine (issues.json paginado, issue_statuses.json, miembros, versiones y GET/POST/PUT
+de issues), lo llena con un sprint sintético y ejecuta azure_to_redmine_sync.py de principio a fin.
+
+Para cada tamaño de sprint se hacen dos ejecuciones sobre el mismo directorio de trabajo:
+- inicial: la mitad de los work items ya existe en Redmine y una parte tiene cambios.
+- repeticion: nada ha cambiado desde la ejecución anterior.
+
+Se informa del tiempo total, las llamadas HTTP por servicio y el pico de memoria del proceso de
+sincronización. Con --salida se guardan los resultados en JSON y con --comparar se muestran las
+diferencias respecto a un resultado anterior.
+
+Uso:
+    python benchmark_sync.py --tamanos 100 1000 10000 --latencia 0.02 --salida benchmark.json
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+SCRIPT_SINCRONIZACION = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'azure_to_redmine_sync.py')
+PROYECTO_REDMINE = 1
+ID_CAMPO_IBER_IDCLIENTE = 100
+ID_CAMPO_HORAS_RESTANTES = 36
+AREA_PATH = 'Benchmark'
+ITERATION_PATH = 'Benchmark\\Sprint'
+NUMERO_SPRINT = 1
+ID_VERSION = 1
+ESTADOS_REDMINE = ['Nueva', 'En curso', 'Pendiente', 'Pendiente cliente', 'Cerrada', 'Resuelta', 'Desestimada']
+
+# region Datos sintéticos
+
+def crear_sprint_sintetico(total_items):
+    """
+    Crea los work items de Azure y las issues de Redmine de un sprint sintético: una HU cada 6 work items
+    con 5 subtareas, la primera mitad ya sincronizada en Redmine y una de cada diez de esas con cambios.
+    """
+    work_items = {}
+    issues = {}
+    for indice in range(total_items):
+        azure_id = 1000 + indice
+        campos = {
+            'System.Id': azure_id,
+            'System.WorkItemType': 'User Story' if indice % 6 == 0 else 'Task',
+            'System.State': 'Active',
+            'System.Title': f"Tarea sintética {azure_id}",
+            'System.AssignedTo': {'displayName': 'Ana García', 'uniqueName': 'ana@benchmark.local'},
+            'System.Description': descripcion_sintetica(azure_id),
+            'System.AreaPath': AREA_PATH,
+            'System.IterationPath': f"{ITERATION_PATH} {NUMERO_SPRINT}",
+            'System.Rev': 3,
+            'Microsoft.VSTS.Scheduling.OriginalEstimate': 8.0,
+            'Microsoft.VSTS.Scheduling.RemainingWork': 4.0,
+        }
+        if indice % 6:
+            campos['System.Parent'] = 1000 + indice - indice % 6
+        if indice < total_items // 2 and indice % 10 == 1:
+            campos['System.State'] = 'Closed'
+            campos['Microsoft.VSTS.Scheduling.RemainingWork'] = 2.0
+        work_items[azure_id] = {'id': azure_id, 'rev': 3, 'fields': campos}
+
+    for azure_id in list(work_items)[:total_items // 2]:
+        crear_issue(issues, azure_id)
+    return work_items, issues
+
+def descripcion_sintetica(azure_id):
+    return f"<p>Descripción de la tarea {azure_id}</p>" * 5
+
+def crear_issue(issues, azure_id, datos=None):
+    datos = datos or {}
+    issue_id = 5000 + len(issues)
+    issues[issue_id] = {
+        'id': issue_id,
+        'project': {'id': PROYECTO_REDMINE, 'name': 'Benchmark'},
+        'subject': datos.get('subject', f"{azure_id} - Tarea sintética {azure_id}"),
+        'description': datos.get('description', descripcion_sintetica(azure_id)),
+        'status': {'id': datos.get('status_id', 2)},
+        'fixed_version': {'id': ID_VERSION, 'name': f"Sprint {NUMERO_SPRINT}"},
+        'assigned_to': {'id': 7, 'name': 'Ana Garcia'},
+        'done_ratio': 50,
+        'estimated_hours': 8.0,
+        'custom_fields': [
+            {'id': ID_CAMPO_IBER_IDCLIENTE, 'name': 'Iber_IdCliente', 'value': str(azure_id)},
+            {'id': ID_CAMPO_HORAS_RESTANTES, 'name': 'Horas restantes', 'value': '4'},
+            {'id': 34, 'name': 'Versión solicitada', 'value': f"Sprint {NUMERO_SPRINT}"},
+        ],
+        'updated_on': datos.get('updated_on', '2024-01-01T00:00:00Z'),
+    }
+    return issue_id
+
+def ahora_utc():
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+# endregion Datos sintéticos
+
+# region Servidor de simulación
+
+class EstadoSimulacion:
+    """Datos del sprint sintético y contadores de llamadas compartidos por los hilos del servidor."""
+
+    def __init__(self, total_items, latencia):
+        self.work_items, self.issues = crear_sprint_sintetico(total_items)
+        self.latencia = latencia
+        self.llamadas = {}
+        self.bloqueo = threading.Lock()
+
+    def issues_por_azure_id(self):
+        return {issue['custom_fields'][0]['value']: issue for issue in self.issues.values()}
+
+class SimuladorAzureRedmine(BaseHTTPRequestHandler):
+    """Atiende en el mismo puerto las rutas de Azure DevOps (/azure/...) y de Redmine (el resto)."""
+
+    estado = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def registrar_llamada(self):
+        ruta = re.sub(r'\d+', '{id}', urlsplit(self.path).path)
+        with self.estado.bloqueo:
+            clave = f"{self.command} {ruta}"
+            self.estado.llamadas[clave] = self.estado.llamadas.get(clave, 0) + 1
+        if self.estado.latencia:
+            time.sleep(self.estado.latencia)
+
+    def responder(self, codigo, cuerpo=None):
+        contenido = json.dumps(cuerpo).encode('utf-8') if cuerpo is not None else b''
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(contenido)))
+        self.end_headers()
+        self.wfile.write(contenido)
+
+    def leer_cuerpo(self):
+        longitud = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(longitud) or b'null')
+
+    def do_GET(self):
+        self.registrar_llamada()
+        url = urlsplit(self.path)
+        parametros = parse_qs(url.query)
+        ruta = url.path
+        if ruta == '/issue_statuses.json':
+            return self.responder(200, {'issue_statuses': [{'id': indice + 1, 'name': nombre} for indice, nombre in enumerate(ESTADOS_REDMINE)]})
+        if ruta == f"/projects/{PROYECTO_REDMINE}/memberships.json":
+            miembros = [{'id': 1, 'project': {'id': PROYECTO_REDMINE}, 'user': {'id': 7, 'name': 'Ana Garcia'}, 'roles': []}]
+            return self.responder(200, {'memberships': miembros, 'total_count': 1, 'offset': 0, 'limit': 25})
+        if ruta == f"/projects/{PROYECTO_REDMINE}.json":
+            return self.responder(200, {'project': {'id': PROYECTO_REDMINE, 'name': 'Benchmark', 'identifier': 'benchmark'}})
+        if ruta == f"/projects/{PROYECTO_REDMINE}/versions.json":
+            version = {'id': ID_VERSION, 'name': f"Sprint {NUMERO_SPRINT}", 'project': {'id': PROYECTO_REDMINE}}
+            return self.responder(200, {'versions': [version], 'total_count': 1})
+        if ruta in ('/issues.json', f"/projects/{PROYECTO_REDMINE}/issues.json"):
+            return self.responder(200, self.listar_issues(parametros))
+        coincidencia = re.fullmatch(r'/issues/(\d+)\.json', ruta)
+        if coincidencia:
+            issue = self.estado.issues.get(int(coincidencia.group(1)))
+            return self.responder(200, {'issue': issue}) if issue else self.responder(404)
+        coincidencia = re.fullmatch(r'/azure/_apis/wit/workitems/(\d+)', ruta)
+        if coincidencia:
+            work_item = self.estado.work_items.get(int(coincidencia.group(1)))
+            if work_item is None:
+                return self.responder(404)
+            return self.responder(200, dict(work_item, _links={'html': {'href': f"http://azure.local/{work_item['id']}"}}))
+        if ruta == '/azure/_apis/wit/reporting/workitemrevisions':
+            # Todo el sprint en una sola página; la siguiente petición con el token ya no devuelve cambios
+            if parametros.get('continuationToken'):
+                return self.responder(200, {'values': [], 'continuationToken': 'fin', 'isLastBatch': True})
+            return self.responder(200, {'values': list(self.estado.work_items.values()), 'continuationToken': 'fin', 'isLastBatch': True})
+        self.responder(404)
+
+    def listar_issues(self, parametros):
+        # Con --streaming las consultas llegan mientras se crean issues
+        with self.estado.bloqueo:
+            issues = list(self.estado.issues.values())
+            por_azure_id = self.estado.issues_por_azure_id()
+        filtro_azure_ids = parametros.get(f"cf_{ID_CAMPO_IBER_IDCLIENTE}")
+        if filtro_azure_ids:
+            issues = [por_azure_id[azure_id] for azure_id in filtro_azure_ids[0].split('|') if azure_id in por_azure_id]
+        if 'fixed_version_id' in parametros:
+            issues = [issue for issue in issues if str(issue['fixed_version']['id']) == parametros['fixed_version_id'][0]]
+        if 'updated_on' in parametros:
+            # Solo se usa el filtro '>=fecha' con fechas ISO en UTC, que se pueden comparar como texto
+            desde = parametros['updated_on'][0].removeprefix('>=')
+            issues = [issue for issue in issues if issue['updated_on'] >= desde]
+        offset = int(parametros.get('offset', ['0'])[0])
+        limit = int(parametros.get('limit', ['25'])[0])
+        return {'issues': issues[offset:offset + limit], 'total_count': len(issues), 'offset': offset, 'limit': limit}
+
+    def do_POST(self):
+        self.registrar_llamada()
+        ruta = urlsplit(self.path).path
+        cuerpo = self.leer_cuerpo()
+        if ruta == '/azure/_apis/wit/wiql':
+            return self.responder(200, {'workItems': [{'id': azure_id} for azure_id in self.estado.work_items]})
+        if ruta == '/azure/_apis/wit/workitemsbatch':
+            campos = set(cuerpo.get('fields') or [])
+            resultado = []
+            for azure_id in cuerpo['ids']:
+                work_item = self.estado.work_items.get(azure_id)
+                if work_item is not None:
+                    resultado.append({'id': azure_id, 'rev': work_item['rev'], 'fields': {campo: valor for campo, valor in work_item['fields'].items() if not campos or campo in campos}})
+            return self.responder(200, {'count': len(resultado), 'value': resultado})
+        if ruta == '/issues.json':
+            datos = cuerpo['issue']
+            azure_id = next(campo['value'] for campo in datos['custom_fields'] if campo['id'] == ID_CAMPO_IBER_IDCLIENTE)
+            with self.estado.bloqueo:
+                issue_id = crear_issue(self.estado.issues, azure_id, dict(datos, updated_on=ahora_utc()))
+            return self.responder(201, {'issue': self.estado.issues[issue_id]})
+        self.responder(404)
+
+    def do_PUT(self):
+        self.registrar_llamada()
+        coincidencia = re.fullmatch(r'/issues/(\d+)\.json', urlsplit(self.path).path)
+        issue = self.estado.issues.get(int(coincidencia.group(1))) if coincidencia else None
+        if issue is None:
+            return self.responder(404)
+        datos = self.leer_cuerpo()['issue']
+        with self.estado.bloqueo:
+            issue['updated_on'] = ahora_utc()
+            if 'status_id' in datos:
+                issue['status'] = {'id': datos['status_id']}
+            if 'done_ratio' in datos:
+                issue['done_ratio'] = datos['done_ratio']
+            if 'estimated_hours' in datos:
+                issue['estimated_hours'] = datos['estimated_hours']
+            if 'description' in datos:
+                issue['description'] = datos['description']
+            for campo in datos.get('custom_fields', []):
+                for campo_issue in issue['custom_fields']:
+                    if campo_issue['id'] == int(campo['id']):
+                        campo_issue['value'] = campo['value']
+        self.responder(204)
+
+def iniciar_simulador(total_items, latencia):
+    SimuladorAzureRedmine.estado = EstadoSimulacion(total_items, latencia)
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), SimuladorAzureRedmine)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+# endregion Servidor de simulación
+
+# region Ejecución del benchmark
+
+def preparar_entorno(puerto):
+    base = f"http://127.0.0.1:{puerto}"
+    entorno = dict(os.environ)
+    entorno.update({
+        'AZURE_DEVOPS_PROJECT_BASE': f"{base}/azure/",
+        'AZURE_TEAM': '',
+        'AZURE_TOKEN': 'benchmark',
+        'AREA_PATH': AREA_PATH,
+        'ITERATION_PATH': ITERATION_PATH,
+        'REDMINE_URL': f"{base}/",
+        'REDMINE_TOKEN': 'benchmark',
+        'PROJECT_ID': str(PROYECTO_REDMINE),
+        'ID_CAMPO_HORAS_RESTANTES': str(ID_CAMPO_HORAS_RESTANTES),
+        'ID_CAMPO_IBER_IDCLIENTE': str(ID_CAMPO_IBER_IDCLIENTE),
+    })
+    return entorno
+
+def ejecutar_sincronizacion(directorio, entorno, argumentos_sync):
+    """
+    Ejecuta azure_to_redmine_sync.py en un proceso hijo.
+
+    Returns:
+        tuple: (código de salida, segundos, pico de memoria en MB)
+    """
+    inicio = time.perf_counter()
+    with open(os.path.join(directorio, 'salida_sync.log'), 'a', encoding='utf-8') as salida:
+        proceso = subprocess.Popen([sys.executable, SCRIPT_SINCRONIZACION, str(NUMERO_SPRINT), *argumentos_sync],
+                                   cwd=directorio, env=entorno, stdout=salida, stderr=subprocess.STDOUT)
+        # wait4 devuelve el consumo de recursos de este proceso hijo en concreto
+        _, estado_salida, uso = os.wait4(proceso.pid, 0)
+        proceso.returncode = os.waitstatus_to_exitcode(estado_salida)
+    segundos = time.perf_counter() - inicio
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    pico_memoria = uso.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return proceso.returncode, segundos, pico_memoria
+
+def ejecutar_escenarios(total_items, latencia, argumentos_sync):
+    servidor = iniciar_simulador(total_items, latencia)
+    directorio = tempfile.mkdtemp(prefix='benchmark_sync_')
+    os.makedirs(os.path.join(directorio, 'docs', 'resultados'))
+    entorno = preparar_entorno(servidor.server_address[1])
+    resultados = []
+    try:
+        for escenario in ('inicial', 'repeticion'):
+            SimuladorAzureRedmine.estado.llamadas = {}
+            codigo, segundos, pico_memoria = ejecutar_sincronizacion(directorio, entorno, argumentos_sync)
+            llamadas = dict(sorted(SimuladorAzureRedmine.estado.llamadas.items()))
+            resultados.append({
+                'items': total_items,
+                'escenario': escenario,
+                'codigo_salida': codigo,
+                'segundos': round(segundos, 3),
+                'llamadas_azure': sum(total for ruta, total in llamadas.items() if ' /azure/' in ruta),
+                'llamadas_redmine': sum(total for ruta, total in llamadas.items() if ' /azure/' not in ruta),
+                'pico_memoria_mb': round(pico_memoria, 1),
+                'llamadas': llamadas,
+            })
+            if codigo != 0:
+                print(f"La sincronización de {total_items} items ({escenario}) ha terminado con código {codigo}. Salida en {directorio}/salida_sync.log")
+                return resultados
+        shutil.rmtree(directorio, ignore_errors=True)
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+    return resultados
+
+def mostrar_resultados(resultados, anteriores=None):
+    anteriores = {(resultado['items'], resultado['escenario']): resultado for resultado in anteriores or []}
+    print(f"{'items':>7} {'escenario':<11} {'segundos':>9} {'azure':>7} {'redmine':>8} {'memoria MB':>11}")
+    for resultado in resultados:
+        linea = (f"{resultado['items']:>7} {resultado['escenario']:<11} {resultado['segundos']:>9.2f} "
+                 f"{resultado['llamadas_azure']:>7} {resultado['llamadas_redmine']:>8} {resultado['pico_memoria_mb']:>11.1f}")
+        anterior = anteriores.get((resultado['items'], resultado['escenario']))
+        if anterior:
+            linea += (f"   (antes {anterior['segundos']:.2f}s, {anterior['llamadas_azure']}+{anterior['llamadas_redmine']} llamadas, "
+                      f"{anterior['pico_memoria_mb']:.1f} MB)")
+        print(linea)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de la sincronización Azure > Redmine contra servicios simulados en local.')
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[100, 1000, 10000], help='Número de work items de cada sprint sintético')
+    parser.add_argument('--latencia', type=float, default=0.0, help='Segundos de latencia añadidos a cada petición HTTP')
+    parser.add_argument('--salida', help='Archivo JSON donde guardar los resultados')
+    parser.add_argument('--comparar', help='Archivo JSON de una ejecución anterior del benchmark con el que comparar')
+    parser.add_argument('args_sync', nargs=argparse.REMAINDER, help='Argumentos adicionales para azure_to_redmine_sync.py (tras --)')
+    args = parser.parse_args()
+    argumentos_sync = [argumento for argumento in args.args_sync if argumento != '--']
+
+    resultados = []
+    for total_items in args.tamanos:
+        print(f"Ejecutando benchmark con {total_items} work items y {args.latencia}s de latencia...")
+        resultados.extend(ejecutar_escenarios(total_items, args.latencia, argumentos_sync))
+
+    anteriores = None
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as file:
+            anteriores = json.load(file)['resultados']
+    mostrar_resultados(resultados, anteriores)
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as file:
+            json.dump({'latencia': args.latencia, 'argumentos_sync': argumentos_sync, 'resultados': resultados}, file, indent=4, ensure_ascii=False)
+    if any(resultado['codigo_salida'] != 0 for resultado in resultados):
+        sys.exit(1)
+
+# endregion Ejecución del benchmark
+
+if __name__ == '__main__':
+    main()
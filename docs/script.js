@@ -1,34 +1,89 @@
-// Función para cargar o recargar los datos
-function loadData() {
-  fetch('data.json')
+// Las ejecuciones anteriores al historial guardan las métricas completas en lugar de los totales
+function llamadasHttp(execution) {
+  if (execution.llamadasHttp !== undefined && execution.llamadasHttp !== null) {
+    return execution.llamadasHttp;
+  }
+  return execution.http
+    ? Object.values(execution.http).reduce((total, endpoint) => total + endpoint.llamadas, 0)
+    : '-';
+}
+
+function faseMasLenta(execution) {
+  if (execution.faseMasLenta) {
+    return `${execution.faseMasLenta.nombre} (${execution.faseMasLenta.segundos.toFixed(1)}s)`;
+  }
+  if (execution.fases && Object.keys(execution.fases).length > 0) {
+    const fase = Object.entries(execution.fases).reduce((maxima, fase) => (fase[1] > maxima[1] ? fase : maxima));
+    return `${fase[0]} (${fase[1].toFixed(1)}s)`;
+  }
+  return '-';
+}
+
+function cargarUltimasEjecuciones() {
+  return fetch('data.json')
     .then(response => response.json())
     .then(data => {
-      const tbody = document.querySelector('tbody');
+      const tbody = document.getElementById('ultimas-ejecuciones');
       tbody.innerHTML = ''; // Limpiar la tabla antes de volver a llenarla
       let ultimaActualizacion = '';
 
       if (data.length > 0) {
-        // Asumiendo que el primer elemento es la ejecución más reciente
+        // El primer elemento es la ejecución más reciente
         ultimaActualizacion = data[0].fechaHora;
       }
 
       data.forEach(execution => {
         const row = document.createElement('tr');
+        // Solo las ejecuciones que crean, modifican o fallan alguna tarea tienen página de detalle
         row.innerHTML = `
           <td>${execution.fechaHora}</td>
           <td>${execution.tareasCreadas}</td>
           <td>${execution.tareasModificadas}</td>
           <td>${execution.tareasFallidas}</td>
           <td>${execution.tareasNoModificadas}</td>
+          <td>${execution.duracionSegundos !== undefined && execution.duracionSegundos !== null ? execution.duracionSegundos.toFixed(1) : '-'}</td>
+          <td>${llamadasHttp(execution)}</td>
+          <td>${faseMasLenta(execution)}</td>
           <td>${execution.estado}</td>
-          <td><a href="${execution.detalle}">Detalle</a></td>
+          <td>${execution.detalle ? `<a href="${execution.detalle}">Detalle</a>` : '-'}</td>
         `;
         tbody.appendChild(row);
       });
 
       document.getElementById('last-update').textContent = ultimaActualizacion;
-    })
-    .catch(error => console.error('Error al cargar los datos: ', error));
+    });
+}
+
+function cargarTotales(archivo, idTabla, campo) {
+  return fetch(archivo)
+    .then(response => (response.ok ? response.json() : []))
+    .then(totales => {
+      const tbody = document.getElementById(idTabla);
+      tbody.innerHTML = '';
+
+      totales.forEach(total => {
+        const row = document.createElement('tr');
+        row.innerHTML = `
+          <td>${total[campo]}</td>
+          <td>${total.ejecuciones}</td>
+          <td>${total.ejecucionesConErrores}</td>
+          <td>${total.tareasCreadas}</td>
+          <td>${total.tareasModificadas}</td>
+          <td>${total.tareasFallidas}</td>
+          <td>${total.llamadasHttp}</td>
+        `;
+        tbody.appendChild(row);
+      });
+    });
+}
+
+// Función para cargar o recargar los datos
+function loadData() {
+  Promise.all([
+    cargarUltimasEjecuciones(),
+    cargarTotales('totales_horarios.json', 'totales-horarios', 'hora'),
+    cargarTotales('totales_diarios.json', 'totales-diarios', 'fecha')
+  ]).catch(error => console.error('Error al cargar los datos: ', error));
 }
 
 document.addEventListener('DOMContentLoaded', function() {